@@ -0,0 +1,150 @@
+"""AI answers for /api/ai/*.
+
+Questions go to an OpenAI-compatible chat completions endpoint (OPENAI_BASE_URL,
+so tests can point it at a local mock) over the shared keep-alive session,
+always with `stream: true`:
+
+- Answers are cached in an LRU keyed on the normalized question and the KPI
+  context it was asked in, so a new import or sync changes the key rather
+  than serving an answer about yesterday's numbers.
+- Identical questions in flight share one upstream call. The call runs on a
+  small thread pool and appends tokens to a Flight; the asking request and
+  any latecomers replay the Flight from the start while it fills, so a
+  browser disconnect never cancels an answer someone else is waiting on.
+- stats() reports cache hits, coalesced requests and upstream latency.
+
+Upstream calls are blocking requests on a thread pool rather than an async
+client, on purpose: the app is served by sync WSGI workers (and asgi.py runs
+it on threads too), so an event loop would need a thread of its own. The
+pooled keep-alive session gives the connection reuse an async client would,
+and the pool size caps concurrent upstream calls per process.
+"""
+import hashlib, json, os, re, threading, time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from backend.cache import LRU
+from backend.httpclient import session
+
+BASE_URL = os.environ.get("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")
+MODEL = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
+TIMEOUT = float(os.environ.get("AI_TIMEOUT", 30))
+WORKERS = int(os.environ.get("AI_WORKERS", 8))
+CACHE_SIZE = int(os.environ.get("AI_CACHE_SIZE", 512))
+
+SYSTEM = "You are a sharp performance marketing analyst that gives concise, practical recommendations."
+FALLBACK = "Lead with a bold 2s hook, add price anchor + social proof, and ship 3 creative variants to A/B."
+
+class AIError(Exception):
+    pass
+
+def normalize(q):
+    """Case, whitespace and trailing punctuation don't make a new question."""
+    return re.sub(r"\s+", " ", q).strip().lower().rstrip("?!. ")
+
+class Flight:
+    """Tokens of one upstream answer, readable by any number of waiters while it streams."""
+    def __init__(self):
+        self.chunks, self.done, self.error = [], False, None
+        self.cond = threading.Condition()
+
+    def add(self, text):
+        with self.cond: self.chunks.append(text); self.cond.notify_all()
+
+    def finish(self, error=None):
+        with self.cond: self.done, self.error = True, error; self.cond.notify_all()
+
+    def __iter__(self):
+        i = 0
+        while True:
+            with self.cond:
+                if not self.cond.wait_for(lambda: i < len(self.chunks) or self.done, timeout=TIMEOUT):
+                    raise AIError("timeout")
+                new = self.chunks[i:]
+                if not new and self.error: raise AIError(self.error)
+                if not new: return
+            i += len(new)
+            yield from new
+
+class AIService:
+    def __init__(self, base_url=None, api_key=None, model=None, cache_size=CACHE_SIZE, workers=WORKERS):
+        self.base_url = (base_url or BASE_URL).rstrip("/")
+        self.api_key = api_key if api_key is not None else os.environ.get("OPENAI_API_KEY")
+        self.model = model or MODEL
+        self.pid = os.getpid()
+        self.cache = LRU(cache_size)
+        self.inflight, self.lock = {}, threading.Lock()
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix="ai")
+        self.requests = self.coalesced = self.upstream = self.errors = 0
+        self.latency, self.first_token = deque(maxlen=1000), deque(maxlen=1000)
+
+    def stream(self, q, context=None):
+        """Yield answer text as it arrives (one chunk for cached answers)."""
+        if not self.api_key:
+            yield FALLBACK; return
+        ctx = json.dumps(context or {}, sort_keys=True)
+        key = (normalize(q), hashlib.sha1(ctx.encode()).hexdigest())
+        with self.lock:
+            self.requests += 1
+            hit = self.cache.get(key)
+            if hit is None:
+                flight = self.inflight.get(key)
+                if flight is None:
+                    flight = self.inflight[key] = Flight()
+                    self.pool.submit(self._call, key, q, ctx, flight)
+                else:
+                    self.coalesced += 1
+        if hit is not None:
+            yield hit; return
+        yield from flight
+
+    def ask(self, q, context=None):
+        return "".join(self.stream(q, context))
+
+    def _call(self, key, q, ctx, flight):
+        t = time.perf_counter(); error = None
+        messages = [{"role": "system", "content": SYSTEM}]
+        if ctx != "{}": messages.append({"role": "system", "content": f"Current account KPIs: {ctx}"})
+        messages.append({"role": "user", "content": q})
+        try:
+            with session().post(f"{self.base_url}/chat/completions", stream=True, timeout=TIMEOUT,
+                                headers={"Authorization": f"Bearer {self.api_key}"},
+                                json={"model": self.model, "messages": messages, "stream": True}) as r:
+                if r.status_code >= 400: raise AIError(f"upstream {r.status_code}")
+                for line in r.iter_lines():
+                    if not line.startswith(b"data:"): continue
+                    data = line[5:].strip()
+                    if data == b"[DONE]": break
+                    delta = (json.loads(data).get("choices") or [{}])[0].get("delta", {}).get("content")
+                    if delta:
+                        if not flight.chunks: self.first_token.append(time.perf_counter() - t)
+                        flight.add(delta)
+            answer = "".join(flight.chunks)
+            if answer: self.cache.put(key, answer)
+            else: flight.add("No answer")
+        except Exception as e:
+            error = str(e) or e.__class__.__name__
+        finally:
+            with self.lock:
+                self.inflight.pop(key, None)
+                self.upstream += 1; self.errors += error is not None
+                self.latency.append(time.perf_counter() - t)
+            flight.finish(error)
+
+    def stats(self):
+        def pct(xs, p):
+            xs = sorted(xs); return round(xs[min(len(xs) - 1, int(p * len(xs)))] * 1000, 1) if xs else None
+        return {"requests": self.requests, "cache_hits": self.cache.hits, "coalesced": self.coalesced,
+                "upstream_calls": self.upstream, "upstream_errors": self.errors,
+                "upstream_p50_ms": pct(self.latency, 0.5), "upstream_p95_ms": pct(self.latency, 0.95),
+                "first_token_p50_ms": pct(self.first_token, 0.5), "cached_answers": len(self.cache.data)}
+
+_service = None
+_service_lock = threading.Lock()
+
+def service():
+    """Process-wide AIService (recreated after fork, like the HTTP session)."""
+    global _service
+    with _service_lock:
+        if _service is None or _service.pid != os.getpid():
+            _service = AIService()
+        return _service
@@ -0,0 +1,98 @@
+"""Columnar campaign analytics.
+
+Per-campaign totals of the weekly rollups (see backend/timeseries.py) are
+summed in SQL and loaded once into flat typed arrays, so the KPI and
+top-campaign views only ever read the pre-aggregated vectors. Time series for /api/trends
+come from the rollup tables directly. A sharded store is read shard by shard
+and the per-shard arrays are concatenated (campaign ids are unique across
+shards).
+"""
+import heapq, os, threading, time
+from array import array
+from backend import cache, shards
+
+TTL = float(os.environ.get("ANALYTICS_TTL", 300))
+METRICS = ("spend", "impressions", "clicks", "conversions", "revenue")
+
+def _load(con, batch):
+    """Campaign names and one metric row per campaign (indices into names) of one database."""
+    names, index = [], {}
+    for cid, name in con.execute("SELECT id,name FROM campaigns ORDER BY id"):
+        index[cid] = len(names); names.append(name)
+    campaign = array("q")
+    cols = {m: array("d") for m in METRICS}
+    # campaign_weekly is keyed (campaign_id, week), so this group-by streams in key order
+    cur = con.execute("""SELECT campaign_id,SUM(spend),SUM(impressions),SUM(clicks),SUM(conversions),SUM(revenue)
+                         FROM campaign_weekly GROUP BY campaign_id""")
+    while True:
+        chunk = cur.fetchmany(batch)
+        if not chunk: break
+        for cid, *vals in chunk:
+            if cid not in index: continue
+            campaign.append(index[cid])
+            for m, v in zip(METRICS, vals): cols[m].append(v or 0.0)
+    if not len(campaign):
+        # no daily history yet: use the campaign snapshots
+        for cid, spend, imps, clicks, conv, roas in con.execute(
+                "SELECT id,spend,impressions,clicks,conversions,roas FROM campaigns"):
+            campaign.append(index[cid])
+            for m, v in zip(METRICS, (spend, imps, clicks, conv, (spend or 0) * (roas or 0))):
+                cols[m].append(v or 0.0)
+    return names, campaign, cols
+
+class CampaignFrame:
+    """Per-campaign totals as parallel arrays (at most one row per campaign) plus their sums."""
+
+    def __init__(self, names, campaign, **metrics):
+        self.names = names
+        self.rows = len(campaign)
+        self.by_campaign = {m: [0.0] * len(names) for m in METRICS}
+        for m in METRICS:
+            out = self.by_campaign[m]
+            for i, v in zip(campaign, metrics[m]): out[i] = v
+        self.totals = {m: sum(self.by_campaign[m]) for m in METRICS}
+
+    @classmethod
+    def from_db(cls, con=None, batch=10000):
+        parts = [_load(con, batch)] if con is not None else shards.fan_out(lambda c: _load(c, batch))
+        names, campaign, cols = [], array("q"), {m: array("d") for m in METRICS}
+        for n, c, vals in parts:
+            off = len(names); names += n
+            campaign.extend(array("q", (i + off for i in c)) if off else c)
+            for m in METRICS: cols[m].extend(vals[m])
+        return cls(names, campaign, **cols)
+
+    # ---------- endpoint views ----------
+    def kpis(self):
+        t = self.totals
+        return {"total_spend": round(t["spend"]),
+                "avg_roas": round(t["revenue"] / t["spend"], 2) if t["spend"] else 0,
+                "avg_cpa": round(t["spend"] / t["conversions"]) if t["conversions"] else 0,
+                "conversions": int(t["conversions"])}
+
+    def top(self, n=4, by="clicks"):
+        vals = self.by_campaign[by]
+        return heapq.nlargest(n, range(len(vals)), key=vals.__getitem__)
+
+    def top_clicks(self, n=4):
+        idx = self.top(n, "clicks")
+        return {"labels": [self.names[i] for i in idx], "clicks": [int(self.by_campaign["clicks"][i]) for i in idx]}
+
+_engine = None
+_loaded_at = 0.0
+_generation = None
+_lock = threading.Lock()
+
+def engine():
+    """Process-wide frame, reloaded when campaign data changes (cache generation),
+    after invalidate(), or once TTL expires."""
+    global _engine, _loaded_at, _generation
+    gen = cache.generations()[0]
+    with _lock:
+        if _engine is None or gen != _generation or time.monotonic() - _loaded_at > TTL:
+            _engine = CampaignFrame.from_db(); _loaded_at = time.monotonic(); _generation = gen
+        return _engine
+
+def invalidate():
+    global _engine
+    with _lock: _engine = None
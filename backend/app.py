@@ -1,66 +1,54 @@
-import os, json, sqlite3, time, secrets
+import os, json, sqlite3, time, secrets, tempfile
 from datetime import datetime
-from flask import Flask, request, jsonify, redirect
-from flask_bcrypt import Bcrypt
+from urllib.parse import urlencode
+from flask import Blueprint, Flask, Response, request, jsonify, redirect, make_response
 from flask_login import LoginManager, UserMixin, login_user, logout_user, current_user, login_required
+from backend import ai, analytics, cache, feed, httpclient, jobs, metrics, passwords, schema, search, shards, timeseries
+from backend.core import get_db  # noqa: F401 - benchmarks reach the database through the app module
+from backend.ingest import import_csv, CSVImportError, ImportBusy
+from backend.recommendations import top_insights
+from backend.playbook import build_plan, DAILY_EFFORT
 from backend.oauth_providers import OAUTH
+from backend.store import ROOT, db, transaction
 
-APP_DIR = os.path.dirname(os.path.abspath(__file__))
-ROOT = os.path.dirname(APP_DIR)
-DB_PATH = os.path.join(ROOT, "admind.db")
-
-app = Flask(__name__, static_folder=os.path.join(ROOT,"static"), static_url_path="/static")
-app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY","dev-secret")
-app.config["SESSION_COOKIE_SAMESITE"] = "Lax"
-app.config["SESSION_COOKIE_SECURE"] = os.environ.get("SESSION_COOKIE_SECURE","0") == "1"
-
-bcrypt = Bcrypt(app)
-login_manager = LoginManager(app)
-
-def db():
-    con = sqlite3.connect(DB_PATH)
-    con.row_factory = sqlite3.Row
-    return con
-
-def init_db():
-    con = db(); cur = con.cursor()
-    cur.execute("""CREATE TABLE IF NOT EXISTS users(
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        email TEXT UNIQUE NOT NULL,
-        password_hash TEXT NOT NULL,
-        created_at TEXT NOT NULL
-    )""")
-    cur.execute("""CREATE TABLE IF NOT EXISTS tokens(
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER,
-        platform TEXT,
-        access_token TEXT,
-        refresh_token TEXT,
-        expires_at INTEGER,
-        raw TEXT,
-        created_at TEXT DEFAULT CURRENT_TIMESTAMP
-    )""")
-    cur.execute("""CREATE TABLE IF NOT EXISTS posts(
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER,
-        platform TEXT,
-        title TEXT,
-        caption TEXT,
-        metrics TEXT,
-        created_at TEXT
-    )""")
-    cur.execute("""CREATE TABLE IF NOT EXISTS contacts(
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT,email TEXT,company TEXT,phone TEXT,message TEXT,created_at TEXT
-    )""")
-    con.commit(); con.close()
-
-init_db()
+bp = Blueprint("web", __name__)
+login_manager = LoginManager()
+
+def create_app():
+    """Build the web app. gunicorn calls this once in the preload master, so
+    the schema check and warm-up happen there and every worker inherits them."""
+    schema.ensure()
+    app = Flask(__name__, static_folder=os.path.join(ROOT,"static"), static_url_path="/static")
+    app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY","dev-secret")
+    app.config["SESSION_COOKIE_SAMESITE"] = "Lax"
+    app.config["SESSION_COOKIE_SECURE"] = os.environ.get("SESSION_COOKIE_SECURE","0") == "1"
+    login_manager.init_app(app)
+    metrics.init_app(app)
+    app.register_blueprint(bp)
+    warm_up(app)
+    return app
+
+def warm_up(app):
+    """First-request work done up front: the pinned index.html and static
+    hashes, and the compiled URL matcher. Heavy libraries (requests, bcrypt)
+    are already imported at module level for the same reason."""
+    cache.versioned_index()
+    app.url_map.bind("localhost").match("/health")
+
+_app = None
+
+def __getattr__(name):
+    # `from backend.app import app` builds the default app on first use
+    global _app
+    if name != "app": raise AttributeError(name)
+    if _app is None: _app = create_app()
+    return _app
 
 class User(UserMixin):
     def __init__(self, row): self.id=row["id"]; self.email=row["email"]
 
 @login_manager.user_loader
+@metrics.timed("load_user")
 def load_user(uid):
     con=db(); cur=con.cursor()
     cur.execute("SELECT id,email FROM users WHERE id=?",(uid,))
@@ -69,92 +57,175 @@ def load_user(uid):
 
 def ok(**k): k.setdefault("ok",True); return jsonify(k)
 def err(message, **k): k.update({"ok":False,"error":message}); return jsonify(k)
+def busy():
+    r = err("busy"); r.headers["Retry-After"] = "1"
+    return r, 429
 
-@app.after_request
-def no_cache(resp):
-    resp.headers["Cache-Control"] = "no-store"
+@bp.after_app_request
+def cache_headers(resp):
+    if request.path.startswith("/static/"): return cache.static_cache_control(resp)
+    resp.headers.setdefault("Cache-Control", "no-store")
     return resp
 
-@app.get("/")
+@bp.get("/")
 def root():
-    return app.send_static_file("index.html")
+    html, etag = cache.versioned_index()
+    resp = make_response(html)
+    resp.set_etag(etag); resp.headers["Cache-Control"] = "no-cache"
+    return resp.make_conditional(request)
 
-@app.get("/health")
-def health(): return ok(status="healthy")
+@bp.get("/api/cache/stats")
+def cache_stats(): return ok(**cache.lru.stats())
 
-@app.get("/api/me")
+@bp.get("/health")
+def health():
+    t=time.perf_counter()
+    con=None
+    try: con=db(); con.execute("SELECT 1").fetchone()
+    except sqlite3.Error as e: return err("db_unavailable", status="unhealthy", detail=str(e)), 503
+    finally:
+        if con is not None: con.close()
+    return ok(status="healthy", db_ms=round((time.perf_counter()-t)*1000,3), pid=os.getpid(), uptime_s=round(time.time()-metrics.STARTED))
+
+@bp.get("/api/me")
 def me():
     if current_user.is_authenticated: return ok(auth=True,email=current_user.email)
     return ok(auth=False)
 
-@app.post("/api/register")
+@bp.post("/api/register")
 def register():
     p = request.get_json(silent=True) or {}
     email = (p.get("email") or "").strip().lower()
     pw = p.get("password") or ""
     if not email or not pw: return err("missing_fields"), 400
-    con=db(); cur=con.cursor()
-    cur.execute("SELECT id FROM users WHERE email=?",(email,))
-    if cur.fetchone(): con.close(); return err("email_exists"), 400
-    ph = bcrypt.generate_password_hash(pw).decode()
-    cur.execute("INSERT INTO users(email,password_hash,created_at) VALUES(?,?,?)",(email,ph,datetime.utcnow().isoformat()))
-    con.commit()
-    cur.execute("SELECT id,email FROM users WHERE email=?",(email,))
-    u=cur.fetchone(); con.close()
+    # a taken email is answered without spending a bcrypt hash on it
+    con=db(); taken=con.execute("SELECT 1 FROM users WHERE email=?",(email,)).fetchone(); con.close()
+    if taken: return err("email_exists"), 400
+    try: ph = passwords.hash_password(pw)
+    except passwords.Busy: return busy()
+    with transaction() as con:
+        cur=con.cursor()
+        cur.execute("SELECT id FROM users WHERE email=?",(email,))  # taken by a concurrent registration meanwhile
+        if cur.fetchone(): return err("email_exists"), 400
+        cur.execute("INSERT INTO users(email,password_hash,created_at) VALUES(?,?,?)",(email,ph,datetime.utcnow().isoformat()))
+        cur.execute("SELECT id,email FROM users WHERE email=?",(email,))
+        u=cur.fetchone()
+    shards.add_user(u["id"], u["email"])
     login_user(User(u))
     return ok()
 
-@app.post("/api/login")
+@bp.post("/api/login")
 def login():
     p = request.get_json(silent=True) or {}
     email = (p.get("email") or "").strip().lower()
     pw = p.get("password") or ""
     con=db(); cur=con.cursor()
-    cur.execute("SELECT id,email,password_hash FROM users WHERE email=?",(email,))
+    cur.execute("SELECT id,email,password_hash,pw_hash FROM users WHERE email=?",(email,))
     u=cur.fetchone(); con.close()
-    if not u or not bcrypt.check_password_hash(u["password_hash"], pw):
-        return err("invalid_credentials"), 401
+    if not u: return err("invalid_credentials"), 401
+    try: valid, new_hash = passwords.verify(pw, u["password_hash"], u["pw_hash"])
+    except passwords.Busy: return busy()
+    if not valid: return err("invalid_credentials"), 401
+    if new_hash:
+        with transaction() as con:
+            con.execute("UPDATE users SET password_hash=?, pw_hash=NULL WHERE id=?", (new_hash, u["id"]))
     login_user(User(u))
     return ok()
 
-@app.post("/api/logout")
+@bp.post("/api/logout")
 def logout():
     logout_user(); return ok()
 
-# ---------- Mock KPIs/Trends/Insights ----------
-@app.get("/api/kpis")
+# ---------- KPIs/Trends/Insights (demo values until campaign data exists) ----------
+@bp.get("/api/kpis")
+@cache.cached()
 def kpis():
-    return ok(total_spend=4720, avg_roas=1.83, avg_cpa=29, conversions=515)
+    e = analytics.engine()
+    if not e.rows: return ok(total_spend=4720, avg_roas=1.83, avg_cpa=29, conversions=515)
+    return ok(**e.kpis())
 
-@app.get("/api/trends")
+@bp.get("/api/trends")
+@cache.cached()
 def trends():
+    e = analytics.engine()
+    if e.rows:
+        a = request.args
+        try: out = timeseries.series(start=a.get("start"), end=a.get("end"), grain=a.get("grain","week"), n=a.get("weeks", 7, type=int))
+        except ValueError as ex: return err(str(ex)), 400
+        except OverflowError: return err("bad_window"), 400  # a date arithmetic result before year 1
+        return ok(**out, top=e.top_clicks())
     labels=[f"W-{i}" for i in range(1,8)]
     spend=[520,560,600,640,610,650,690]
     roas=[1.55,1.62,1.68,1.70,1.73,1.78,1.82]
     top={"labels":["Search - Brand","RMK - 7d","Prospecting - Broad","UGC Creators"],"clicks":[1000,780,740,360]}
     return ok(labels=labels, series={"spend":spend,"roas":roas}, top=top)
 
-@app.get("/api/insights")
+DEMO_INSIGHTS = [
+    {"id":1,"title":"Lift ROAS on Prospecting - Broad","campaign_name":"Prospecting - Broad","kpi":"ROAS","severity":"high","priority_score":1.86,"evidence":{"roas":"0.72","spend":1250,"target_roas":"1.00"},"actions":["Add price anchor (MSRP vs Now) + guarantee top-of-frame","Swap first frame to strongest review (stars + count)","Send traffic to highest-CVR LP; strip header nav"],"expected_impact":0.75},
+    {"id":2,"title":"Cut CPA on RMK - 7d","campaign_name":"RMK - 7d","kpi":"CPA","severity":"med","priority_score":1.32,"evidence":{"cpa":"$42","avg_cpa":"$29","delta":"+45%"},"actions":["Narrow audience","Update hook + objection","Bid cap -10%"],"expected_impact":0.55}
+]
+
+@bp.get("/api/insights")
+@cache.cached()
 def insights():
-    return ok(insights=[
-        {"id":1,"title":"Lift ROAS on Prospecting - Broad","campaign_name":"Prospecting - Broad","kpi":"ROAS","severity":"high","priority_score":1.86,"evidence":{"roas":"0.72","spend":1250,"target_roas":"1.00"},"actions":["Add price anchor (MSRP vs Now) + guarantee top-of-frame","Swap first frame to strongest review (stars + count)","Send traffic to highest-CVR LP; strip header nav"],"expected_impact":0.75},
-        {"id":2,"title":"Cut CPA on RMK - 7d","campaign_name":"RMK - 7d","kpi":"CPA","severity":"med","priority_score":1.32,"evidence":{"cpa":"$42","avg_cpa":"$29","delta":"+45%"},"actions":["Narrow audience","Update hook + objection","Bid cap -10%"],"expected_impact":0.55}
-    ])
+    recs = top_insights(limit=request.args.get("limit", 10, type=int))
+    return ok(insights=recs or DEMO_INSIGHTS)
+
+@bp.post("/api/campaigns/import")
+@login_required
+def campaigns_import():
+    f = request.files.get("file")
+    if not f: return err("missing_file"), 400
+    fd, path = tempfile.mkstemp(suffix=".csv"); os.close(fd)
+    con = db()
+    try:
+        f.save(path)
+        stats = import_csv(path, account=request.form.get("account") or "Default", day=request.form.get("date") or None, con=con)
+    except (CSVImportError, ValueError) as e:
+        return err("bad_csv", detail=str(e)), 400
+    except ImportBusy as e:
+        return err("import_in_progress", detail=str(e)), 409
+    finally:
+        con.close(); os.unlink(path)
+    analytics.invalidate()
+    # the rebuild runs on a job worker; poll /api/jobs/<id> for its counts
+    job = jobs.enqueue("recs.rebuild", key=f"recs:import:{stats['import_id']}", user_id=current_user.id)
+    return ok(imported=stats, recommendations_job=job)
 
-@app.post("/api/playbook")
+@bp.post("/api/playbook")
 def playbook():
+    """Best 7/14-day plan for the selected insights (or all of them) under
+    daily_hours of effort per day and an optional total media budget."""
     d=request.get_json(silent=True) or {}
-    selected = set(d.get("insight_ids") or [])
-    conns = ["Day 1","Day 2","Day 3","Day 4","Day 5","Day 6","Day 7"]
-    ins = insights().get_json()["insights"]
-    chosen = [i for i in ins if not selected or i["id"] in selected][:7]
-    plan=[]
-    for i, it in enumerate(chosen):
-        plan.append({"day":conns[i],"title":it["title"],"kpi":it["kpi"],"severity":it["severity"],"what_to_ship":it["actions"],"how_to_measure":[f"Primary KPI: {it['kpi']}", f"Expected impact: +{int((it.get('expected_impact') or 0)*100)}%","Review after 48h"]})
-    return ok(plan=plan)
+    try:
+        out = build_plan(ids=d.get("insight_ids") or None, days=int(d.get("days") or 7),
+                         daily_effort=float(d.get("daily_hours") or DAILY_EFFORT),
+                         budget=float(d["budget"]) if d.get("budget") is not None else None, fallback=DEMO_INSIGHTS)
+    except (TypeError, ValueError) as e:
+        return err("bad_request", detail=str(e)), 400
+    return ok(**out)
+
+# ---------- Search ----------
+@bp.get("/api/search")
+@login_required
+def search_api():
+    """?q=&types=posts,contacts&platform=&since=&until=&page=&limit= (contacts need ADMIN_EMAILS)"""
+    a = request.args
+    types = [t for t in a.get("types", ",".join(search.TYPES)).split(",") if t in search.TYPES]
+    if "contacts" in types and current_user.email.lower() not in search.ADMIN_EMAILS: types.remove("contacts")
+    con, contacts = shards.user_db(current_user.id), db()
+    try:
+        hits, more = search.search(con, a.get("q",""), current_user.id, types=types, contacts_con=contacts,
+                                   platforms=[p for p in a.get("platform","").split(",") if p], since=a.get("since"), until=a.get("until"),
+                                   page=a.get("page", 1, type=int), limit=a.get("limit", 20, type=int))
+    except search.BadQuery as e:
+        return err(str(e)), 400
+    finally:
+        con.close(); contacts.close()
+    return ok(results=hits, page=a.get("page", 1, type=int), has_more=more)
 
 # ---------- Social OAuth ----------
-@app.get("/api/oauth/<platform>")
+@bp.get("/api/oauth/<platform>")
 @login_required
 def oauth_start(platform):
     cfg = OAUTH.get(platform)
@@ -167,33 +238,35 @@ def oauth_start(platform):
         "scope": cfg["scope"],
         "state": state
     }
-    from urllib.parse import urlencode
     return ok(auth_url=f"{cfg['auth_url']}?{urlencode(params)}")
 
-@app.get("/oauth/callback/<platform>")
+@bp.get("/oauth/callback/<platform>")
 @login_required
 def oauth_callback(platform):
-    import requests as rq
     cfg = OAUTH.get(platform)
     if not cfg: return err("bad_provider"), 400
     code = request.args.get("code")
     if not code: return err("missing_code"), 400
     data = {"client_id":cfg["client_id"],"client_secret":cfg["client_secret"],"redirect_uri":cfg["redirect_uri"],"grant_type":"authorization_code","code":code}
-    r = rq.post(cfg["token_url"], data=data, headers={"Accept":"application/json"})
+    r = httpclient.session().post(cfg["token_url"], data=data, headers={"Accept":"application/json"}, timeout=httpclient.TIMEOUT)
     tok = r.json()
     access = tok.get("access_token")
     if not access: return err("token_exchange_failed", detail=tok), 400
     exp = int(time.time()) + int(tok.get("expires_in",3600))
-    con = db(); cur = con.cursor()
-    cur.execute("INSERT INTO tokens(user_id,platform,access_token,refresh_token,expires_at,raw) VALUES(?,?,?,?,?,?)",
-                (current_user.id, platform, access, tok.get("refresh_token"), exp, json.dumps(tok)))
-    con.commit(); con.close()
+    with shards.user_tx(current_user.id) as con:
+        con.execute("""INSERT INTO tokens(user_id,platform,access_token,refresh_token,expires_at,raw) VALUES(?,?,?,?,?,?)
+                       ON CONFLICT(user_id,platform) DO UPDATE SET access_token=excluded.access_token,
+                         refresh_token=COALESCE(excluded.refresh_token, tokens.refresh_token),
+                         expires_at=excluded.expires_at, raw=excluded.raw""",
+                    (current_user.id, platform, access, tok.get("refresh_token"), exp, json.dumps(tok)))
+    cache.invalidate(current_user.id)
     return redirect("/")
 
-@app.get("/api/social/connections")
+@bp.get("/api/social/connections")
 @login_required
+@cache.cached("user")
 def social_connections():
-    con=db(); cur=con.cursor()
+    con=shards.user_db(current_user.id); cur=con.cursor()
     cur.execute("SELECT platform, COUNT(1) as c FROM tokens WHERE user_id=? GROUP BY platform",(current_user.id,))
     rows=cur.fetchall(); con.close()
     have=set([r["platform"] for r in rows if r["c"]>0])
@@ -201,67 +274,123 @@ def social_connections():
     return ok(connections=[{"platform":p.capitalize(), "connected": p in have} for p in allp])
 
 # ---------- Posts (demo + "connected" badge) ----------
-@app.get("/api/posts")
+@bp.get("/api/posts")
+@cache.cached("user")
 def posts():
+    """Keyset-paginated feed: ?platform=a,b&since=&until=&sort=recent|likes|comments|plays|views&limit=&cursor="""
     uid = getattr(current_user,"id",None)
-    con=db(); cur=con.cursor()
+    a = request.args
+    rows, nxt, plats = [], None, set()
     if uid:
-        cur.execute("SELECT platform,title,caption,metrics FROM posts WHERE user_id=? ORDER BY id DESC LIMIT 200",(uid,))
-        rows = [dict(r) for r in cur.fetchall()]
-        # if tokens exist, show connected label
-        cur.execute("SELECT DISTINCT platform FROM tokens WHERE user_id=?",(uid,))
-        plats = [r["platform"] for r in cur.fetchall()]
-    else:
-        rows = []
-        plats = []
-    if not rows:
+        con = shards.user_db(uid)
+        try:
+            rows, nxt = feed.page(con, uid, platforms=[p for p in a.get("platform","").split(",") if p],
+                                  since=a.get("since"), until=a.get("until"), sort=a.get("sort","recent"),
+                                  limit=a.get("limit", 50, type=int), cursor=a.get("cursor"))
+            # only label the first page; tokens(user_id, platform) is unique, so this is an index range scan
+            if not a.get("cursor"):
+                plats = {r["platform"] for r in con.execute("SELECT platform FROM tokens WHERE user_id=?",(uid,))}
+        except feed.BadRequest as e:
+            return err(str(e)), 400
+        finally:
+            con.close()
+    if not rows and not a.get("cursor"):
         rows = [
-            {"platform":"Instagram","title":"Spring Drop","caption":"New arrivals","metrics":"{\"likes\":1200}"},
-            {"platform":"TikTok","title":"Behind the scenes","caption":"BTS shoot","metrics":"{\"plays\":9000}"},
-            {"platform":"YouTube","title":"How we scale ROAS","caption":"Case study","metrics":"{\"views\":18000}"}
+            {"platform":"Instagram","title":"Spring Drop","caption":"New arrivals","metrics":{"likes":1200}},
+            {"platform":"TikTok","title":"Behind the scenes","caption":"BTS shoot","metrics":{"plays":9000}},
+            {"platform":"YouTube","title":"How we scale ROAS","caption":"Case study","metrics":{"views":18000}}
         ]
     for r in rows:
         if r["platform"].lower() in plats: r["platform"] += " (connected)"
-    return ok(posts=rows)
+    return ok(posts=rows, next_cursor=nxt)
 
-@app.post("/api/social/mock_pull")
+@bp.get("/api/posts/<int:post_id>/metrics")
+@login_required
+def post_metrics(post_id):
+    con = shards.user_db(current_user.id)
+    try:
+        if not con.execute("SELECT 1 FROM posts WHERE id=? AND user_id=?",(post_id,current_user.id)).fetchone():
+            return err("not_found"), 404
+        return ok(**timeseries.post_series(con, post_id, request.args.get("start"), request.args.get("end")))
+    finally:
+        con.close()
+
+@bp.post("/api/social/mock_pull")
 @login_required
 def mock_pull():
     now=datetime.utcnow().isoformat()
     data=[("Instagram","UGC Hook","Try-on haul","{\"likes\":310,\"comments\":11}"),
           ("TikTok","Test 3 hooks","3 cuts A/B","{\"plays\":9000,\"likes\":600}")]
-    con=db(); cur=con.cursor()
-    for p in data:
-        cur.execute("INSERT INTO posts(user_id,platform,title,caption,metrics,created_at) VALUES(?,?,?,?,?,?)",
-                    (current_user.id,p[0],p[1],p[2],p[3],now))
-    con.commit(); con.close()
+    with shards.user_tx(current_user.id) as con:
+        con.executemany("INSERT INTO posts(user_id,platform,title,caption,metrics,created_at) VALUES(?,?,?,?,?,?)",
+                        [(current_user.id,p[0],p[1],p[2],p[3],now) for p in data])
+    cache.invalidate(current_user.id)
     return ok(added=len(data))
 
+@bp.post("/api/social/sync")
+@login_required
+def social_sync():
+    # one sync per user per minute, however often the button is pressed
+    job = jobs.enqueue("sync.user", {"user_id": current_user.id}, key=f"sync:{current_user.id}:{int(time.time() // 60)}", user_id=current_user.id)
+    return ok(job=job), 202
+
+# ---------- Jobs ----------
+@bp.get("/api/jobs/<int:job_id>")
+@login_required
+def job_status(job_id):
+    j = jobs.get(job_id)
+    if j is None or j["user_id"] != current_user.id: return err("not_found"), 404
+    return ok(job={k: j[k] for k in ("id", "kind", "status", "attempts", "result", "error", "created_at", "finished_at", "wait_ms", "run_ms")})
+
+@bp.get("/api/jobs/stats")
+def job_stats():
+    return ok(**jobs.stats())
+
 # ---------- AI ----------
-@app.post("/api/ai/ask")
+def ai_context():
+    """KPIs the answer should be grounded in; part of the AI cache key."""
+    e = analytics.engine()
+    return e.kpis() if e.rows else {}
+
+@bp.post("/api/ai/ask")
 def ai_ask():
     q=(request.get_json(silent=True) or {}).get("q","").strip()
     if not q: return ok(answer="Ask about your posts, competitors, or KPIs.")
-    key=os.environ.get("OPENAI_API_KEY")
-    if not key:
-        tip="Lead with a bold 2s hook, add price anchor + social proof, and ship 3 creative variants to A/B."
-        return ok(answer=tip)
-    import requests as rq
-    headers={"Authorization":f"Bearer {key}","Content-Type":"application/json"}
-    body={"model":"gpt-4o-mini","messages":[{"role":"system","content":"You are a sharp performance marketing analyst that gives concise, practical recommendations."},{"role":"user","content":q}]}
-    res=rq.post("https://api.openai.com/v1/chat/completions",headers=headers,json=body,timeout=30).json()
-    ans=(res.get("choices") or [{}])[0].get("message",{}).get("content","")
+    try: ans = ai.service().ask(q, ai_context())
+    except ai.AIError as e: return err("ai_unavailable", detail=str(e)), 502
     return ok(answer=ans or "No answer")
 
+@bp.get("/api/ai/stream")
+def ai_stream():
+    """Server-sent events: `data: {"delta": ...}` per chunk, then `data: [DONE]`."""
+    q=request.args.get("q","").strip()
+    tokens = ai.service().stream(q, ai_context()) if q else iter(["Ask about your posts, competitors, or KPIs."])
+    def events():
+        try:
+            for t in tokens: yield f"data: {json.dumps({'delta': t})}\n\n"
+        except ai.AIError as e:
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+        yield "data: [DONE]\n\n"
+    return Response(events(), mimetype="text/event-stream", headers={"Cache-Control":"no-cache","X-Accel-Buffering":"no"})
+
+@bp.get("/api/ai/stats")
+@login_required
+def ai_stats():
+    return ok(**ai.service().stats())
+
 # ---------- Contact ----------
-@app.post("/api/contact")
+@bp.post("/api/contact")
 def contact():
     p=request.get_json(silent=True) or {}
-    con=db(); cur=con.cursor()
-    cur.execute("INSERT INTO contacts(name,email,company,phone,message,created_at) VALUES(?,?,?,?,?,?)",
-                (p.get("name"),p.get("email"),p.get("company"),p.get("phone"),p.get("message"),datetime.utcnow().isoformat()))
-    con.commit(); con.close()
-    return ok(emailed=False)
+    with transaction() as con:
+        cid = con.execute("INSERT INTO contacts(name,email,company,phone,message,created_at) VALUES(?,?,?,?,?,?)",
+                          (p.get("name"),p.get("email"),p.get("company"),p.get("phone"),p.get("message"),datetime.utcnow().isoformat())).lastrowid
+        # committed with the contact, so a saved message always gets its notification
+        job = jobs.enqueue("contact.notify", {"contact_id": cid}, key=f"contact:{cid}", con=con)
+    return ok(job=job)
 
 if __name__ == "__main__":
+    schema.AUTO_MIGRATE = True  # the dev server owns its database: bring a checked-out admind.db up to date
+    app = create_app()
+    jobs.start_embedded(jobs.EMBEDDED or 1)  # the dev server runs its jobs in-process
     app.run(host="0.0.0.0", port=int(os.environ.get("PORT",5050)))
@@ -0,0 +1,112 @@
+"""ASGI entry point for the uvicorn serving mode.
+
+    WEB_WORKER_CLASS=uvicorn gunicorn -c gunicorn.conf.py   # serves backend.asgi:app
+
+WsgiToAsgi runs each Flask request on a thread pool of ASGI_THREADS while the
+event loop keeps accepting connections. The body is relayed chunk by chunk
+as the view yields it, so /api/ai/stream still streams. A thread waiting on
+an upstream (OAuth token exchange, AI answer, platform fetch) costs a pool
+slot, not a worker: one uvicorn worker holds ASGI_THREADS slow requests
+and keeps answering fast ones. Every route behaves exactly as under WSGI.
+"""
+import asyncio, os, sys, tempfile
+from concurrent.futures import ThreadPoolExecutor
+from backend.app import create_app
+
+THREADS = int(os.environ.get("ASGI_THREADS", 64))
+SPOOL = 1 << 20  # request bodies above 1 MB (CSV uploads) go to a temp file
+
+class WsgiToAsgi:
+    def __init__(self, wsgi_app, threads=THREADS):
+        self.wsgi_app = wsgi_app
+        self.pool = ThreadPoolExecutor(threads, thread_name_prefix="asgi")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan": return await self.lifespan(receive, send)
+        if scope["type"] != "http": return
+        body = tempfile.SpooledTemporaryFile(SPOOL)
+        while True:
+            msg = await receive()
+            if msg["type"] == "http.disconnect": return
+            body.write(msg.get("body", b""))
+            if not msg.get("more_body"): break
+        body.seek(0)
+        loop = asyncio.get_running_loop()
+        queue, gone = asyncio.Queue(), []
+        put = lambda item: loop.call_soon_threadsafe(queue.put_nowait, item)
+        fut = loop.run_in_executor(self.pool, self.run, environ(scope, body), put, gone)
+        watcher = asyncio.ensure_future(self.watch(receive, gone))
+        try:
+            while True:
+                kind, data = await queue.get()
+                if kind == "start":
+                    await send({"type": "http.response.start", "status": data[0], "headers": data[1]})
+                elif kind == "body":
+                    await send({"type": "http.response.body", "body": data, "more_body": True})
+                else:
+                    await send({"type": "http.response.body", "body": b""}); break
+        except BaseException:
+            gone.append(True); raise
+        finally:
+            watcher.cancel(); await fut; body.close()
+
+    @staticmethod
+    async def watch(receive, gone):
+        """Flag a client disconnect so a streaming view stops at its next chunk."""
+        while (await receive())["type"] != "http.disconnect": pass
+        gone.append(True)
+
+    def run(self, environ, put, gone):
+        """Drive the WSGI app in a worker thread, handing events to the loop."""
+        head, sent = [], []
+        def start_response(status, headers, exc_info=None):
+            if exc_info and sent: raise exc_info[1].with_traceback(exc_info[2])
+            head[:] = [(int(status.split(" ", 1)[0]), [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers])]
+            return write
+        def write(data):
+            if not sent: put(("start", head[0])); sent.append(True)
+            if data: put(("body", data))
+        result = None
+        try:
+            result = self.wsgi_app(environ, start_response)
+            for data in result:
+                if gone: break
+                if data: write(data)
+            if not sent: write(b"")
+        except Exception:
+            if not sent: put(("start", (500, [(b"content-type", b"text/plain")]))); put(("body", b"Internal Server Error"))
+            raise
+        finally:
+            if hasattr(result, "close"): result.close()
+            put(("end", None))
+
+    async def lifespan(self, receive, send):
+        while True:
+            msg = await receive()
+            if msg["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif msg["type"] == "lifespan.shutdown":
+                self.pool.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"}); return
+
+def environ(scope, body):
+    """PEP 3333 environ for one ASGI HTTP scope."""
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    # scope["path"] is already percent-decoded, as PEP 3333 wants PATH_INFO; raw_path is not
+    path, root = scope["path"], scope.get("root_path", "")
+    if root and path.startswith(root): path = path[len(root):]
+    env = {"REQUEST_METHOD": scope["method"], "SCRIPT_NAME": root.encode().decode("latin-1"),
+           "PATH_INFO": path.encode().decode("latin-1"), "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+           "SERVER_NAME": server[0], "SERVER_PORT": str(server[1] or ""), "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+           "REMOTE_ADDR": client[0], "REMOTE_PORT": str(client[1]),
+           "wsgi.version": (1, 0), "wsgi.url_scheme": scope.get("scheme", "http"), "wsgi.input": body, "wsgi.errors": sys.stderr,
+           "wsgi.multithread": True, "wsgi.multiprocess": True, "wsgi.run_once": False}
+    for k, v in scope.get("headers", []):
+        k, v = k.decode("latin-1"), v.decode("latin-1")
+        name = {"content-type": "CONTENT_TYPE", "content-length": "CONTENT_LENGTH"}.get(k) or "HTTP_" + k.upper().replace("-", "_")
+        if name in env: v = env[name] + ("; " if name == "HTTP_COOKIE" else ",") + v
+        env[name] = v
+    return env
+
+app = WsgiToAsgi(create_app())
@@ -1,22 +1,13 @@
-import os, sqlite3, hashlib, hmac
 from flask import Blueprint, request, session
+from backend import passwords, shards
+from backend.core import get_db as db
 
 bp = Blueprint("auth", __name__)
 
-def db():
-    con = sqlite3.connect(os.path.join(os.path.dirname(__file__), "..", "admind.db"))
-    con.row_factory = sqlite3.Row
-    return con
 
 def init():
-    con=db(); cur=con.cursor()
-    cur.execute("""CREATE TABLE IF NOT EXISTS users(
-        id INTEGER PRIMARY KEY, email TEXT UNIQUE, pw_hash TEXT, created_at TEXT)""")
-    con.commit(); con.close()
-
-def _hash(pw:str)->str:
-    salt = os.getenv("SECRET_KEY","salt").encode()
-    return hashlib.sha256(salt + pw.encode()).hexdigest()
+    # users is owned by backend/schema.py (pw_hash is the legacy column there)
+    db().close()
 
 @bp.post("/api/register")
 def register():
@@ -25,10 +16,15 @@ def register():
     email=(j.get("email") or "").strip().lower()
     pw=j.get("password") or ""
     if not email or not pw: return {"ok":False,"error":"missing email/password"},400
+    con=db(); taken=con.execute("SELECT 1 FROM users WHERE email=?",(email,)).fetchone(); con.close()
+    if taken: return {"ok":False,"error":"email already registered"},409
+    try: ph=passwords.hash_password(pw)
+    except passwords.Busy: return {"ok":False,"error":"busy"},429
     try:
         con=db(); cur=con.cursor()
-        cur.execute("INSERT INTO users(email,pw_hash,created_at) VALUES(?,?,datetime('now'))",(email,_hash(pw)))
+        cur.execute("INSERT INTO users(email,password_hash,created_at) VALUES(?,?,datetime('now'))",(email,ph))
         con.commit(); user_id=cur.lastrowid; con.close()
+        shards.add_user(user_id, email)
         session["uid"]=user_id; session["email"]=email
         return {"ok":True,"email":email}
     except Exception:
@@ -41,10 +37,14 @@ def login():
     email=(j.get("email") or "").strip().lower()
     pw=j.get("password") or ""
     con=db(); cur=con.cursor()
-    cur.execute("SELECT id,pw_hash FROM users WHERE email=?",(email,))
+    cur.execute("SELECT id,password_hash,pw_hash FROM users WHERE email=?",(email,))
     row=cur.fetchone(); con.close()
     if not row: return {"ok":False,"error":"not found"},404
-    if not hmac.compare_digest(row["pw_hash"], _hash(pw)): return {"ok":False,"error":"bad password"},401
+    try: valid, new_hash = passwords.verify(pw, row["password_hash"], row["pw_hash"])
+    except passwords.Busy: return {"ok":False,"error":"busy"},429
+    if not valid: return {"ok":False,"error":"bad password"},401
+    if new_hash:
+        con=db(); con.execute("UPDATE users SET password_hash=?, pw_hash=NULL WHERE id=?",(new_hash,row["id"])); con.commit(); con.close()
     session["uid"]=row["id"]; session["email"]=email
     return {"ok":True,"email":email}
 
@@ -0,0 +1,133 @@
+"""HTTP response caching.
+
+- Static assets get content-hashed URLs (`/static/app.js?v=<sha1>`) that are
+  served `immutable` for a year; unversioned requests still revalidate.
+- JSON endpoints wrapped in @cached carry a strong ETag and answer
+  If-None-Match with 304.
+- Rendered bodies live in an in-process LRU keyed by endpoint, query, user and
+  data generation. Generations are counters in the `cache_generations` table
+  (one global scope for campaign data, one per user). Any process that writes
+  (web worker, sync, import or refresh script) bumps the counter, so every
+  gunicorn worker stops serving stale entries on its next request.
+"""
+import functools, hashlib, os, re, threading
+from collections import OrderedDict
+from backend.store import ROOT, db, with_retry
+
+SIZE = int(os.environ.get("CACHE_SIZE", 1024))
+STATIC_DIR = os.path.join(ROOT, "static")
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+class LRU:
+    def __init__(self, size):
+        self.size, self.data, self.lock = size, OrderedDict(), threading.Lock()
+        self.hits = self.misses = self.not_modified = 0
+
+    def get(self, key):
+        with self.lock:
+            v = self.data.get(key)
+            if v is None: self.misses += 1; return None
+            self.data.move_to_end(key); self.hits += 1
+            return v
+
+    def put(self, key, value):
+        with self.lock:
+            self.data[key] = value; self.data.move_to_end(key)
+            while len(self.data) > self.size: self.data.popitem(last=False)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"entries": len(self.data), "hits": self.hits, "misses": self.misses,
+                "not_modified": self.not_modified, "hit_ratio": round(self.hits / total, 3) if total else 0.0}
+
+lru = LRU(SIZE)
+
+# ---------- generations / invalidation ----------
+def generations(user_id=None):
+    scopes = ("global", f"user:{user_id}")
+    con = db()
+    got = dict(con.execute("SELECT scope, gen FROM cache_generations WHERE scope IN (?,?)", scopes).fetchall())
+    con.close()
+    return tuple(got.get(s, 0) for s in scopes)
+
+def invalidate(user_id=None):
+    """Drop cached responses for one user, or for shared campaign data when user_id is None."""
+    scope = "global" if user_id is None else f"user:{user_id}"
+    def bump():
+        con = db()
+        with con:
+            con.execute("INSERT INTO cache_generations(scope,gen) VALUES(?,1) ON CONFLICT(scope) DO UPDATE SET gen=gen+1", (scope,))
+        con.close()
+    with_retry(bump)
+
+# ---------- JSON endpoints ----------
+def cached(scope="global"):
+    """Cache a GET JSON view. scope="user" keys entries by the signed-in user."""
+    def deco(fn):
+        # flask is imported here, not at module level, so scripts that only invalidate don't load it
+        from flask import request, make_response, Response
+        from flask_login import current_user
+        @functools.wraps(fn)
+        def wrapper(*a, **k):
+            uid = current_user.id if scope == "user" and current_user.is_authenticated else None
+            key = (request.path, request.query_string, uid, generations(uid))
+            hit = lru.get(key)
+            if hit is None:
+                resp = make_response(fn(*a, **k))
+                if resp.status_code != 200 or not resp.is_json: return resp
+                body = resp.get_data()
+                hit = (hashlib.sha1(body).hexdigest()[:20], body)
+                lru.put(key, hit)
+            etag, body = hit
+            resp = Response(body, mimetype="application/json")
+            resp.set_etag(etag)
+            resp.headers["Cache-Control"] = "private, no-cache"
+            resp = resp.make_conditional(request)
+            if resp.status_code == 304: lru.not_modified += 1
+            return resp
+        return wrapper
+    return deco
+
+# ---------- static assets ----------
+_hashes = None
+_hash_lock = threading.Lock()
+
+def static_hashes():
+    """Content hash of every file under static/, computed once per process."""
+    global _hashes
+    with _hash_lock:
+        if _hashes is None:
+            out = {}
+            for base, _, files in os.walk(STATIC_DIR):
+                for f in files:
+                    p = os.path.join(base, f)
+                    with open(p, "rb") as fh: out[os.path.relpath(p, STATIC_DIR).replace(os.sep, "/")] = hashlib.sha1(fh.read()).hexdigest()[:12]
+            _hashes = out
+        return _hashes
+
+_asset_ref = re.compile(r'(["\'])/static/([^"\'?]+)(\?v=[^"\']*)?\1')
+
+_index = None
+
+def versioned_index():
+    """index.html with every /static/ reference pinned to its content hash, plus its ETag."""
+    global _index
+    if _index is None:
+        hashes = static_hashes()
+        with open(os.path.join(STATIC_DIR, "index.html"), encoding="utf-8") as f: html = f.read()
+        def pin(m):
+            h = hashes.get(m.group(2))
+            return f'{m.group(1)}/static/{m.group(2)}?v={h}{m.group(1)}' if h else m.group(0)
+        html = _asset_ref.sub(pin, html)
+        _index = (html, hashlib.sha1(html.encode()).hexdigest()[:20])
+    return _index
+
+def static_cache_control(resp):
+    """Immutable caching for URLs carrying the current content hash, revalidation otherwise."""
+    from flask import request
+    name = request.path[len("/static/"):]
+    if resp.status_code in (200, 304) and request.args.get("v") and request.args.get("v") == static_hashes().get(name):
+        resp.headers["Cache-Control"] = IMMUTABLE
+    else:
+        resp.headers["Cache-Control"] = "no-cache"
+    return resp
@@ -0,0 +1,16 @@
+"""What CLI scripts need from the backend, without the web app.
+
+    from backend.core import get_db
+
+Importing backend.app builds the Flask app: its extensions, every route
+module, and the warm-up. Scripts only need a connection to a database whose
+schema is current, so they import this module. It pulls in the store and
+the schema, not Flask.
+"""
+from backend import schema
+from backend.store import db
+
+def get_db(path=None):
+    """Pooled connection for this thread; the schema version is checked once per process."""
+    schema.ensure(path)
+    return db(path)
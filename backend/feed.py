@@ -0,0 +1,66 @@
+"""Keyset-paginated posts feed.
+
+Engagement counters are VIRTUAL generated columns extracted from the `metrics`
+JSON and indexed together with user_id, so sorting by likes/plays/views never
+parses JSON per row. Pages continue from an opaque cursor holding the
+(sort value, id) of the last row, so page N costs the same as page 1.
+"""
+import base64, json
+
+METRICS = ("likes", "comments", "plays", "views")
+SORTS = ("recent",) + METRICS
+MAX_LIMIT = 200
+
+# canonical display labels, as stored in posts.platform
+LABELS = {"instagram": "Instagram", "tiktok": "TikTok", "youtube": "YouTube", "facebook": "Facebook", "linkedin": "LinkedIn"}
+
+def metric_column(name):
+    return f"INTEGER GENERATED ALWAYS AS (CASE WHEN json_valid(metrics) THEN COALESCE(json_extract(metrics,'$.{name}'),0) ELSE 0 END) VIRTUAL"
+
+class BadRequest(ValueError):
+    pass
+
+def encode_cursor(value, id):
+    return base64.urlsafe_b64encode(json.dumps([value, id]).encode()).decode().rstrip("=")
+
+def _bindable(v, types):
+    # bool is an int, and SQLite integers are 64-bit
+    return isinstance(v, types) and not isinstance(v, bool) and (not isinstance(v, int) or -2**63 <= v < 2**63)
+
+def decode_cursor(s):
+    """(sort value, id) from a cursor; anything but a number/string value and an integer id is a BadRequest."""
+    try: value, id = json.loads(base64.urlsafe_b64decode(s + "=" * (-len(s) % 4)))
+    except (ValueError, TypeError): raise BadRequest("bad_cursor")
+    if not (_bindable(value, (int, float, str)) and _bindable(id, int)): raise BadRequest("bad_cursor")
+    return value, id
+
+def query(user_id, platforms=None, since=None, until=None, sort="recent", limit=50, cursor=None):
+    """(sql, args) for one page; fetches limit+1 rows to tell whether another page exists."""
+    if sort not in SORTS: raise BadRequest("bad_sort")
+    col = "id" if sort == "recent" else sort
+    where, args = ["user_id=?"], [user_id]
+    if platforms:
+        labels = [LABELS.get(p.lower(), p) for p in platforms]
+        where.append(f"platform IN ({','.join('?' * len(labels))})"); args += labels
+    if since: where.append("created_at>=?"); args.append(since)
+    if until: where.append("created_at<?"); args.append(until)
+    if cursor:
+        value, last_id = decode_cursor(cursor)
+        if col == "id": where.append("id<?"); args.append(last_id)
+        else: where.append(f"({col}, id) < (?, ?)"); args += [value, last_id]
+    sql = f"""SELECT id, platform, title, caption, metrics, created_at, {col} AS sort_value FROM posts
+              WHERE {' AND '.join(where)} ORDER BY {col} DESC, id DESC LIMIT ?"""
+    return sql, args + [limit + 1]
+
+def page(con, user_id, limit=50, **filters):
+    """One page of a user's posts plus the cursor for the next page (None at the end)."""
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    rows = con.execute(*query(user_id, limit=limit, **filters)).fetchall()
+    nxt = encode_cursor(rows[limit - 1]["sort_value"], rows[limit - 1]["id"]) if len(rows) > limit else None
+    return [_post(r) for r in rows[:limit]], nxt
+
+def _post(r):
+    try: metrics = json.loads(r["metrics"] or "{}")
+    except ValueError: metrics = {}
+    return {"id": r["id"], "platform": r["platform"], "title": r["title"], "caption": r["caption"],
+            "metrics": metrics, "created_at": r["created_at"]}
@@ -0,0 +1,41 @@
+"""Shared outbound HTTP session.
+
+All calls to provider and AI APIs go through one keep-alive connection pool per
+process instead of a fresh TCP/TLS handshake per `requests.post`.
+"""
+import os, threading, time
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from backend import metrics
+
+POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", 32))
+TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", 15))
+
+class TimedAdapter(HTTPAdapter):
+    """Times each outbound request up to its response headers."""
+    def send(self, request, **kw):
+        t = time.perf_counter(); status = "error"
+        try:
+            resp = super().send(request, **kw); status = str(resp.status_code)
+            return resp
+        finally:
+            secs = time.perf_counter() - t
+            metrics.observe("admind_http_client_duration_seconds", (("host", urlsplit(request.url).hostname or ""), ("status", status)), secs)
+            r = metrics.current()
+            if r is not None: r.http_n += 1; r.http_s += secs
+
+_lock = threading.Lock()
+_session = None
+_pid = None
+
+def session():
+    """Process-wide pooled session (recreated after fork)."""
+    global _session, _pid
+    with _lock:
+        if _session is None or _pid != os.getpid():
+            s = requests.Session()
+            adapter = (TimedAdapter if metrics.ENABLED else HTTPAdapter)(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=0)
+            s.mount("http://", adapter); s.mount("https://", adapter)
+            _session, _pid = s, os.getpid()
+        return _session
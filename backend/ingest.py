@@ -0,0 +1,210 @@
+"""Streaming CSV import of campaign-day metrics.
+
+Exports shaped like data/sample_campaigns.csv are read incrementally, coerced in
+chunks, and upserted with executemany into campaign_stats keyed by
+(account, campaign, day). Each chunk commits together with the byte offset it
+reached in the `imports` table, so a crashed import resumes from the last
+committed chunk and re-running a finished file is a no-op. A file is known by
+a hash of its full contents, so a corrected re-export imports again. The upload running
+an import holds its row under a lease renewed per chunk: a concurrent upload
+of the same file gets ImportBusy instead of replaying it from the same offset,
+and one that outlives the lease of a crashed upload takes over.
+
+With a sharded store the accounts directory and the `imports` row stay in
+DB_PATH and each account's rows go to its shard. A chunk then commits shard by
+shard and records its offset last; a crash in between replays the chunk,
+which rewrites the same values.
+"""
+import csv, hashlib, os, resource, secrets, time
+from datetime import date, datetime
+from backend import cache, shards
+from backend.store import db, with_retry
+
+CHUNK = int(os.environ.get("IMPORT_CHUNK", 20000))
+LEASE = float(os.environ.get("IMPORT_LEASE", 120))  # seconds a claim outlives its last chunk
+NUMERIC = ("spend", "roas", "impressions", "clicks", "conversions")
+REQUIRED = ("name",) + NUMERIC  # cpa/ctr are derived from these on the snapshot
+
+class CSVImportError(ValueError):
+    """Raised when a file can't be imported at all (bad header, unreadable)."""
+
+class ImportBusy(Exception):
+    """Raised when another upload of the same file holds the import."""
+
+def fingerprint(path, account="Default", day=None):
+    """Identify an import by the file's full contents and the account/day its rows default to,
+    so re-uploads of the same export resume and a corrected re-export, or the same file for
+    another account or day, imports. Pass day=None when the file carries its own dates."""
+    h = hashlib.sha1(f"{account}\0{day or ''}\0".encode())
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""): h.update(block)
+    return h.hexdigest()
+
+def _num(v):
+    try: return float(v)
+    except ValueError:
+        v = v.strip().replace(",", "").lstrip("$").rstrip("%")
+        return float(v) if v else 0.0
+
+def _parser(cols, default_day, default_account):
+    """Build a record -> (account, name, status, day, spend, imps, clicks, conv, revenue) coercer
+    with the header lookups resolved once per file."""
+    i_name, i_acct, i_status = cols["name"], cols.get("account"), cols.get("status")
+    i_day = cols.get("date", cols.get("day"))
+    i_spend, i_roas, i_imps, i_clicks, i_conv = (cols[k] for k in NUMERIC)
+    days = {}
+    def parse(rec):
+        name = rec[i_name].strip()
+        if not name: raise ValueError("missing campaign name")
+        d = (rec[i_day].strip() if i_day is not None else "") or default_day
+        day = days.get(d)
+        if day is None: day = days[d] = date.fromisoformat(d[:10]).isoformat()
+        spend = _num(rec[i_spend])
+        return ((rec[i_acct].strip() if i_acct is not None else "") or default_account, name,
+                (rec[i_status].strip() if i_status is not None else "") or "active", day,
+                spend, int(_num(rec[i_imps])), int(_num(rec[i_clicks])), int(_num(rec[i_conv])), spend * _num(rec[i_roas]))
+    return parse
+
+def _rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def import_csv(path, account="Default", day=None, chunk=CHUNK, con=None):
+    """Import one CSV export; returns throughput and memory stats."""
+    con = con or db()
+    with open(path, "rb") as f:
+        # validated before claiming, so a rejected file leaves no import row behind
+        header = f.readline()
+        cols = {h.strip().lower(): i for i, h in enumerate(next(csv.reader([header.decode("utf-8-sig")]), []))}
+        missing = [k for k in REQUIRED if k not in cols]
+        if missing: raise CSVImportError(f"missing columns: {', '.join(missing)}")
+        # a dated file's rows don't depend on the default day, so neither does its identity
+        day = day or date.today().isoformat()
+        fp = fingerprint(path, account, None if "date" in cols or "day" in cols else day)
+        owner = secrets.token_hex(8)
+        job = with_retry(_claim, con, fp, os.path.basename(path), owner)
+        if job["status"] == "done":
+            return {"rows": 0, "skipped": 0, "status": "already_imported", "import_id": job["id"]}
+        resumed_from = job["byte_offset"]
+        total, skipped, errors = job["rows"], 0, []
+        accounts, campaigns = {}, {}
+        t0 = time.perf_counter(); n = 0
+        pos = max(resumed_from, len(header)); f.seek(pos)
+        def lines():
+            nonlocal pos
+            for raw in f:
+                pos += len(raw)
+                yield raw.decode("utf-8", "replace")
+        parse = _parser(cols, day, account)
+        batch = []
+        for rec in csv.reader(lines()):
+            if not rec: continue
+            try: batch.append(parse(rec))
+            except (ValueError, IndexError) as e:
+                skipped += 1
+                if len(errors) < 10: errors.append(f"{type(e).__name__}: {e}")
+            if len(batch) >= chunk:
+                total += len(batch); n += len(batch)
+                with_retry(_write_chunk, con, batch, accounts, campaigns, job["id"], owner, pos, total); batch = []
+        total += len(batch); n += len(batch)
+        with_retry(_write_chunk, con, batch, accounts, campaigns, job["id"], owner, pos, total, done=True)
+    secs = time.perf_counter() - t0
+    if n: cache.invalidate()
+    return {"import_id": job["id"], "status": "done", "rows": n, "total_rows": total, "skipped": skipped,
+            "errors": errors, "resumed_from": resumed_from, "seconds": round(secs, 2),
+            "rows_per_sec": round(n / secs) if secs else n, "peak_rss_mb": round(_rss_mb(), 1)}
+
+def _claim(con, fp, source, owner):
+    """Create or take the file's import row; ImportBusy while another upload's lease runs."""
+    now = time.time()
+    with con:
+        con.execute("""INSERT INTO imports(fingerprint,source,byte_offset,rows,status,started_at) VALUES(?,?,0,0,'running',?)
+                       ON CONFLICT(fingerprint) DO NOTHING""", (fp, source, datetime.utcnow().isoformat()))
+        job = con.execute("""UPDATE imports SET owner=?, lease_until=?
+                             WHERE fingerprint=? AND status!='done' AND (lease_until IS NULL OR lease_until<?)
+                             RETURNING id,byte_offset,rows,status""", (owner, now + LEASE, fp, now)).fetchone()
+        if job: return job
+        job = con.execute("SELECT id,status FROM imports WHERE fingerprint=?", (fp,)).fetchone()
+    if job["status"] == "done": return job
+    raise ImportBusy(f"import {job['id']} is running in another upload")
+
+def _accounts(con, batch, accounts):
+    """Directory ids for the batch's account names, created on first sight."""
+    for acct in dict.fromkeys(r[0] for r in batch):
+        if acct in accounts: continue
+        r = con.execute("SELECT id FROM accounts WHERE name=?", (acct,)).fetchone()
+        accounts[acct] = r[0] if r else con.execute("INSERT INTO accounts(name) VALUES(?)", (acct,)).lastrowid
+
+def _ids(con, batch, accounts, campaigns):
+    _accounts(con, batch, accounts)
+    for acct, name, status, *_ in batch:
+        aid = accounts[acct]
+        if (aid, name) not in campaigns:
+            con.execute("""INSERT INTO campaigns(account_id,name,status) VALUES(?,?,?)
+                           ON CONFLICT(account_id,name) DO UPDATE SET status=excluded.status""", (aid, name, status))
+            campaigns[(aid, name)] = con.execute("SELECT id FROM campaigns WHERE account_id=? AND name=?", (aid, name)).fetchone()[0]
+        yield campaigns[(aid, name)]
+
+def _write_chunk(con, batch, accounts, campaigns, import_id, owner, offset, total, done=False):
+    # cache entries created inside a rolled-back attempt would point at missing rows
+    acc0, camp0 = dict(accounts), dict(campaigns)
+    def progress():
+        # fenced on the claim: after a lapsed lease the import belongs to the upload that took it over
+        n = con.execute("""UPDATE imports SET byte_offset=?, rows=?, status=?, finished_at=?, owner=?, lease_until=?
+                           WHERE id=? AND owner=?""",
+                        (offset, total, "done" if done else "running", datetime.utcnow().isoformat() if done else None,
+                         None if done else owner, None if done else time.time() + LEASE, import_id, owner)).rowcount
+        if not n: raise ImportBusy(f"import {import_id} was taken over by another upload")
+    try:
+        if not shards.enabled():
+            with con:
+                _write_rows(con, batch, accounts, campaigns, import_id)
+                if done: _finish(con, import_id)
+                progress()
+            return
+        with con: _accounts(con, batch, accounts)
+        job = tuple(con.execute("SELECT id,fingerprint,source,started_at FROM imports WHERE id=?", (import_id,)).fetchone())
+        parts = {}
+        for r in batch: parts.setdefault(shards.account_shard(accounts[r[0]]), []).append(r)
+        for k, rows in parts.items():
+            with shards.shard_tx(k) as s:
+                # parents of the shard's campaigns and import_campaigns rows
+                shards.adopt_accounts(s, [(accounts[a], a) for a in {r[0] for r in rows}])
+                s.execute("INSERT OR IGNORE INTO imports(id,fingerprint,source,started_at) VALUES(?,?,?,?)", job)
+                _write_rows(s, rows, accounts, campaigns, import_id)
+        if done:
+            for k in shards.shard_ids():
+                with shards.shard_tx(k) as s:
+                    _finish(s, import_id); s.execute("DELETE FROM imports WHERE id=?", (import_id,))
+        with con: progress()
+    except BaseException:
+        accounts.clear(); accounts.update(acc0); campaigns.clear(); campaigns.update(camp0); raise
+
+def _write_rows(con, batch, accounts, campaigns, import_id):
+    ids = list(_ids(con, batch, accounts, campaigns))
+    con.executemany("""INSERT INTO campaign_stats(campaign_id,day,spend,impressions,clicks,conversions,revenue)
+                       VALUES(?,?,?,?,?,?,?)
+                       ON CONFLICT(campaign_id,day) DO UPDATE SET spend=excluded.spend, impressions=excluded.impressions,
+                         clicks=excluded.clicks, conversions=excluded.conversions, revenue=excluded.revenue""",
+                    [(cid, *r[3:]) for cid, r in zip(ids, batch)])
+    # snapshots are rebuilt once at the end; the touched set survives a crash
+    con.executemany("INSERT OR IGNORE INTO import_campaigns(import_id,campaign_id) VALUES(?,?)",
+                    [(import_id, cid) for cid in set(ids)])
+
+def _finish(con, import_id):
+    ids = [r[0] for r in con.execute("SELECT campaign_id FROM import_campaigns WHERE import_id=?", (import_id,))]
+    refresh_snapshots(con, ids)
+    con.execute("DELETE FROM import_campaigns WHERE import_id=?", (import_id,))
+
+def refresh_snapshots(con, campaign_ids):
+    """Recompute the campaigns snapshot columns from their weekly rollups (which outlive pruned daily rows)."""
+    ids = list(campaign_ids)
+    for i in range(0, len(ids), 500):
+        part = ids[i:i + 500]; marks = ",".join("?" * len(part))
+        con.execute(f"""UPDATE campaigns SET spend=t.spend, impressions=t.imps, clicks=t.clicks, conversions=t.conv,
+                          cpa=CASE WHEN t.conv>0 THEN t.spend/t.conv END,
+                          roas=CASE WHEN t.spend>0 THEN t.rev/t.spend END,
+                          ctr=CASE WHEN t.imps>0 THEN 100.0*t.clicks/t.imps END
+                        FROM (SELECT campaign_id, SUM(spend) spend, SUM(impressions) imps, SUM(clicks) clicks,
+                                     SUM(conversions) conv, SUM(revenue) rev
+                              FROM campaign_weekly WHERE campaign_id IN ({marks}) GROUP BY campaign_id) t
+                        WHERE campaigns.id=t.campaign_id""", part)
@@ -0,0 +1,261 @@
+"""Durable background jobs in SQLite.
+
+enqueue() adds a row to `jobs` in DB_PATH and returns its id, so a request
+handler can hand work off and answer right away. A Pool of worker threads
+(python -m backend.scripts.worker, or JOBS_EMBEDDED threads in each web
+worker) claims the next job with one UPDATE ... RETURNING, runs its
+handler and records the outcome.
+- Priority: higher runs first; within a priority, oldest run_at first.
+- Retries: a handler that raises is rescheduled with exponential backoff
+  plus jitter, until max_attempts; then the job is `failed` with the error.
+- Idempotency: enqueueing a key that is already in the table returns that
+  job instead of adding another. A key lasts as long as its row (KEEP).
+- Leases: a claimed job carries lease_until. The pool's heartbeat extends
+  it, up to the handler's timeout. If the worker dies, or the handler
+  overruns, the lease runs out and recover() in any pool requeues the job.
+  Outcomes are written only for the attempt that was claimed, so a late
+  finisher can't overwrite its retry.
+- Timing: wait_ms (ready to claimed) and run_ms per job, also exported as
+  admind_job_wait_seconds / admind_job_duration_seconds.
+
+Delivery is at least once: a handler can run again after a crash, so it
+must be safe to repeat. Handlers are registered with @handler(kind, ...),
+take the payload dict and return something JSON-serializable; the
+application's handlers are in backend/tasks.py.
+"""
+import importlib, json, os, random, socket, threading, time
+from backend import metrics
+from backend.store import db, transaction, with_retry
+
+LEASE = float(os.environ.get("JOBS_LEASE", 60))
+POLL = float(os.environ.get("JOBS_POLL", 0.5))
+BACKOFF = float(os.environ.get("JOBS_BACKOFF", 5))            # first retry delay, doubled per attempt
+MAX_BACKOFF = float(os.environ.get("JOBS_MAX_BACKOFF", 3600))
+KEEP = float(os.environ.get("JOBS_KEEP_DAYS", 7)) * 86400     # finished jobs (and their keys) are kept this long
+WORKERS = int(os.environ.get("JOBS_WORKERS", 4))
+EMBEDDED = int(os.environ.get("JOBS_EMBEDDED", 0))            # worker threads inside each web worker
+
+HANDLERS = {}  # kind -> Handler
+_wake = threading.Event()  # set by enqueue() so idle threads in this process don't wait out POLL
+
+class Handler:
+    __slots__ = ("fn", "priority", "attempts", "timeout", "every")
+    def __init__(self, fn, priority, attempts, timeout, every):
+        self.fn, self.priority, self.attempts, self.timeout, self.every = fn, priority, attempts, timeout, every
+
+def handler(kind, priority=0, attempts=5, timeout=300, every=None):
+    """Register fn(payload) for `kind`. `every` (seconds) also enqueues it on that period from running pools."""
+    def wrap(fn):
+        HANDLERS[kind] = Handler(fn, priority, attempts, timeout, every); return fn
+    return wrap
+
+def _load(check_schema=True):
+    """Register the application's handlers and check the schema (both once per process)."""
+    importlib.import_module("backend.tasks")
+    if not check_schema: return
+    from backend import schema  # imported here: modules that schema imports enqueue jobs
+    schema.ensure(None)
+
+def _backoff(attempt):
+    return min(BACKOFF * 2 ** (attempt - 1), MAX_BACKOFF) * (0.5 + random.random())
+
+# ---------- producer side ----------
+def enqueue(kind, payload=None, key=None, user_id=None, priority=None, delay=0, attempts=None, timeout=None, con=None):
+    """Queue a job; returns its id (the existing job's when `key` is taken).
+
+    With `con`, the row is written in the caller's open transaction, so it
+    commits or rolls back with the rows the job is about. The caller's
+    connection already has the schema, and checking it here would open a
+    second use of that pooled connection mid-transaction."""
+    _load(check_schema=con is None)
+    h = HANDLERS.get(kind)
+    if h is None: raise KeyError(f"no handler for job kind {kind!r}")
+    now = time.time()
+    row = (kind, json.dumps(payload or {}), key, user_id, h.priority if priority is None else priority,
+           h.attempts if attempts is None else attempts, h.timeout if timeout is None else timeout, now + delay, now)
+    def put(c):
+        r = c.execute("""INSERT INTO jobs(kind,payload,key,user_id,priority,max_attempts,timeout,run_at,created_at)
+                         VALUES(?,?,?,?,?,?,?,?,?) ON CONFLICT(key) DO NOTHING RETURNING id""", row).fetchone()
+        return r[0] if r else c.execute("SELECT id FROM jobs WHERE key=?", (key,)).fetchone()[0]
+    if con is not None: jid = put(con)
+    else:
+        def run():
+            with transaction() as c: return put(c)
+        jid = with_retry(run)
+    _wake.set()
+    return jid
+
+def get(job_id):
+    con = db()
+    r = con.execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone()
+    con.close()
+    if r is None: return None
+    out = dict(r)
+    out["payload"] = json.loads(out["payload"]); out["result"] = json.loads(out["result"]) if out["result"] else None
+    return out
+
+def stats(since=3600):
+    """Queue depth by kind and status, and run-time percentiles of jobs finished in the last `since` seconds."""
+    con = db()
+    depth = {}
+    for r in con.execute("SELECT kind, status, COUNT(*) n FROM jobs GROUP BY kind, status"):
+        depth.setdefault(r["kind"], {})[r["status"]] = r["n"]
+    timing = {}
+    for r in con.execute("""SELECT kind, run_ms, wait_ms FROM jobs WHERE finished_at>=? AND status='done'""", (time.time() - since,)):
+        t = timing.setdefault(r["kind"], {"run": [], "wait": []}); t["run"].append(r["run_ms"]); t["wait"].append(r["wait_ms"])
+    con.close()
+    pct = lambda xs, q: round(sorted(xs)[min(len(xs) - 1, int(len(xs) * q))], 1)
+    return {"depth": depth, "timing": {k: {"done": len(t["run"]), "run_p50_ms": pct(t["run"], 0.5), "run_p95_ms": pct(t["run"], 0.95),
+                                           "wait_p50_ms": pct(t["wait"], 0.5), "wait_p95_ms": pct(t["wait"], 0.95)}
+                                       for k, t in timing.items()}}
+
+# ---------- worker side ----------
+def claim(owner, kinds=None, now=None):
+    """Take the next ready job (highest priority, then oldest), or None."""
+    now = now or time.time()
+    only, args = ("AND kind IN (%s)" % ",".join("?" * len(kinds)), list(kinds)) if kinds else ("", [])
+    with transaction() as con:
+        r = con.execute(f"""UPDATE jobs SET status='running', owner=?, attempts=attempts+1, started_at=?,
+                               lease_until=?+MIN(timeout, ?), wait_ms=(?-run_at)*1000
+                            WHERE id=(SELECT id FROM jobs WHERE status='queued' AND run_at<=? {only}
+                                      ORDER BY priority DESC, run_at, id LIMIT 1)
+                            RETURNING id, kind, payload, attempts, max_attempts, timeout, wait_ms, started_at""",
+                        [owner, now, now, LEASE, now, now] + args).fetchone()
+    return dict(r) if r else None
+
+def run(job):
+    """Run a claimed job's handler and record the outcome; returns the status written."""
+    t = time.perf_counter()
+    h = HANDLERS.get(job["kind"])
+    try:
+        if h is None: raise KeyError(f"no handler for job kind {job['kind']!r}")
+        result, error = h.fn(json.loads(job["payload"])), None
+    except Exception as e:
+        result, error = None, f"{type(e).__name__}: {e}"
+    secs = time.perf_counter() - t
+    status = with_retry(_finish, job, result, error, secs * 1000)
+    if metrics.ENABLED:
+        metrics.observe("admind_job_duration_seconds", (("kind", job["kind"]), ("status", status or "lost")), secs)
+        metrics.observe("admind_job_wait_seconds", (("kind", job["kind"]),), (job["wait_ms"] or 0) / 1000)
+    return status
+
+def _finish(job, result, error, run_ms):
+    now = time.time()
+    # only the attempt that was claimed may write: after a lease expiry the job belongs to its retry
+    fence = "WHERE id=? AND attempts=? AND status='running'"
+    with transaction() as con:
+        if error is None:
+            n = con.execute(f"""UPDATE jobs SET status='done', result=?, error=NULL, finished_at=?, run_ms=?, owner=NULL, lease_until=NULL
+                                {fence}""", (json.dumps(result), now, run_ms, job["id"], job["attempts"])).rowcount
+            return "done" if n else None
+        failed = job["attempts"] >= job["max_attempts"]
+        n = con.execute(f"""UPDATE jobs SET status=?, error=?, run_ms=?, owner=NULL, lease_until=NULL, run_at=?, finished_at=?
+                            {fence}""", ("failed" if failed else "queued", error[:2000], run_ms, now + (0 if failed else _backoff(job["attempts"])),
+                                         now if failed else None, job["id"], job["attempts"])).rowcount
+        return ("failed" if failed else "retry") if n else None
+
+def heartbeat(jobs_running, now=None):
+    """Extend the leases of jobs this process is still running, never past started_at + timeout."""
+    now = now or time.time()
+    with transaction() as con:
+        con.executemany("UPDATE jobs SET lease_until=MIN(?, started_at+timeout) WHERE id=? AND attempts=? AND status='running'",
+                        [(now + LEASE, j["id"], j["attempts"]) for j in jobs_running])
+
+def recover(now=None):
+    """Requeue (or fail, when out of attempts) running jobs whose lease ran out."""
+    now = now or time.time()
+    with transaction() as con:
+        return con.execute("""UPDATE jobs SET status=CASE WHEN attempts>=max_attempts THEN 'failed' ELSE 'queued' END,
+                                error='lease expired', owner=NULL, lease_until=NULL, run_at=?,
+                                finished_at=CASE WHEN attempts>=max_attempts THEN ? END
+                              WHERE status='running' AND lease_until<?""", (now, now, now)).rowcount
+
+def schedule(now=None):
+    """Enqueue periodic handlers for the current period; the key makes every pool agree on one job."""
+    _load()
+    now = now or time.time()
+    for kind, h in HANDLERS.items():
+        if h.every: enqueue(kind, key=f"{kind}@{int(now // h.every)}")
+
+def purge(now=None, keep=KEEP):
+    """Delete jobs finished more than `keep` seconds ago; returns how many."""
+    now = now or time.time()
+    with transaction() as con:
+        return con.execute("DELETE FROM jobs WHERE finished_at<?", (now - keep,)).rowcount
+
+def drain(kinds=None, owner=None):
+    """Run ready jobs in this thread until none are left; returns {status: count}. For scripts and checks."""
+    _load()
+    owner = owner or f"{socket.gethostname()}:{os.getpid()}:drain"
+    out = {}
+    while True:
+        job = claim(owner, kinds)
+        if job is None: return out
+        st = run(job); out[st] = out.get(st, 0) + 1
+
+class Pool:
+    """Worker threads over the queue, plus one keeper thread for leases, recovery and schedules."""
+
+    def __init__(self, workers=WORKERS, kinds=None, periodic=True):
+        _load()
+        self.workers, self.kinds, self.periodic = workers, kinds, periodic
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.running = {}   # thread name -> claimed job
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.threads = []
+        self.stats = {"done": 0, "retry": 0, "failed": 0, "lost": 0}
+
+    def start(self):
+        for i in range(self.workers):
+            t = threading.Thread(target=self._work, name=f"job-{i}", daemon=True); t.start(); self.threads.append(t)
+        t = threading.Thread(target=self._keep, name="job-keeper", daemon=True); t.start(); self.threads.append(t)
+        return self
+
+    def stop(self, wait=True):
+        self.stop_event.set(); _wake.set()
+        if wait:
+            for t in self.threads: t.join()
+
+    def _work(self):
+        name = threading.current_thread().name
+        while not self.stop_event.is_set():
+            try: job = claim(self.owner, self.kinds)
+            except Exception:
+                job = None  # database busy past the retries; try again after the poll interval
+            if job is None:
+                _wake.wait(POLL); _wake.clear(); continue
+            with self.lock: self.running[name] = job
+            try: st = run(job)
+            finally:
+                with self.lock: self.running.pop(name, None)
+            with self.lock: self.stats[st or "lost"] += 1
+
+    def _keep(self):
+        last_purge = 0
+        while not self.stop_event.wait(min(LEASE / 3, 10)):
+            try:
+                with self.lock: mine = list(self.running.values())
+                if mine: with_retry(heartbeat, mine)
+                with_retry(recover)
+                if self.periodic: schedule()
+                if time.time() - last_purge > 3600: with_retry(purge); last_purge = time.time()
+                if metrics.ENABLED: metrics.flush()
+            except Exception:
+                pass  # keep the keeper alive; the next tick retries
+
+    def run_forever(self):
+        self.start()
+        try:
+            while not self.stop_event.wait(1): pass
+        except KeyboardInterrupt:
+            pass
+        self.stop()
+
+_embedded = None
+
+def start_embedded(workers=EMBEDDED):
+    """Job threads inside this (web) process; called after fork so each worker gets its own."""
+    global _embedded
+    if workers and _embedded is None: _embedded = Pool(workers).start()
+    return _embedded
@@ -0,0 +1,281 @@
+"""Request instrumentation.
+
+- Every request is timed (before/after_request) into a latency histogram per
+  route, method and status. The response carries a Server-Timing header with
+  the request's SQL, outbound HTTP and span (load_user, bcrypt) time.
+- SQL: connections from backend.store use a Connection/Cursor subclass that
+  times execute()/executemany(). For a SELECT this covers preparing the statement
+  and stepping to the first row, not later fetches.
+- Outbound HTTP: the shared session's adapter (backend.httpclient) times each
+  send() by host.
+- GET /metrics serves Prometheus text. Under gunicorn each worker writes a
+  snapshot to METRICS_DIR at most once a second, and /metrics merges them,
+  so a scrape sees the whole server, whichever worker answers it. The
+  master drops a worker's snapshot when the worker exits.
+- PROFILE_SLOW_MS=<ms> turns on a sampling profiler. It reads the stacks of
+  threads serving requests every PROFILE_INTERVAL_MS (50; lower it to resolve
+  shorter requests, at more overhead). A request slower than the threshold
+  is written to PROFILE_DIR as a collapsed-stack .folded file, which
+  flamegraph.pl or speedscope can render. It samples OS threads, so it
+  sees sync, gthread and uvicorn workers but not gevent greenlets.
+
+METRICS=0 turns all of it off. bench_metrics measures the overhead.
+"""
+import bisect, functools, glob, json, os, re, sqlite3, sys, tempfile, threading, time
+from collections import Counter
+
+ENABLED = os.environ.get("METRICS", "1") != "0"
+METRICS_DIR = os.environ.get("METRICS_DIR")
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+FLUSH_SECS = 1.0
+PROFILE_SLOW_MS = float(os.environ.get("PROFILE_SLOW_MS", 0))
+PROFILE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL_MS", 50)) / 1000
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "admind-profiles"))
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+HELP = {
+    "admind_http_request_duration_seconds": ("histogram", "Request latency by route, method and status."),
+    "admind_db_query_duration_seconds": ("histogram", "SQLite execute() time by statement kind."),
+    "admind_http_client_duration_seconds": ("histogram", "Outbound HTTP time to response headers by host and status."),
+    "admind_span_duration_seconds": ("histogram", "Time in instrumented calls (load_user, bcrypt)."),
+    "admind_request_db_queries_total": ("counter", "SQL statements executed while serving a route."),
+    "admind_db_connections_opened_total": ("counter", "SQLite connections opened."),
+    "admind_slow_request_profiles_total": ("counter", "Slow requests written to PROFILE_DIR."),
+    "admind_job_duration_seconds": ("histogram", "Background job run time by kind and outcome status (backend/jobs.py)."),
+    "admind_job_wait_seconds": ("histogram", "Time background jobs waited between ready and claimed, by kind."),
+}
+STARTED = time.time()
+
+_lock = threading.Lock()
+_hists = {}     # (name, labels) -> [count per bucket..., +Inf count, sum]
+_counters = {}  # (name, labels) -> value
+_local = threading.local()
+_flushed = 0.0
+
+# ---------- aggregation ----------
+def series(name, labels):
+    """The histogram row for one label set, created on first use; hot callers keep a reference."""
+    with _lock:
+        h = _hists.get((name, labels))
+        if h is None: h = _hists[(name, labels)] = [0] * (len(BUCKETS) + 2)
+        return h
+
+def _add(h, seconds):
+    i = bisect.bisect_left(BUCKETS, seconds)
+    with _lock: h[i] += 1; h[-1] += seconds
+
+def observe(name, labels, seconds):
+    _add(series(name, labels), seconds)
+
+def count(name, labels=(), n=1):
+    with _lock: _counters[(name, labels)] = _counters.get((name, labels), 0) + n
+
+def snapshot():
+    with _lock:
+        return {"hists": [[n, l, list(h)] for (n, l), h in _hists.items()],
+                "counters": [[n, l, v] for (n, l), v in _counters.items()]}
+
+def _merged():
+    """This process's series plus every other worker's last snapshot."""
+    hists, counters = {}, {}
+    snaps = [snapshot()]
+    if METRICS_DIR:
+        flush(force=True); snaps = []
+        for path in glob.glob(os.path.join(METRICS_DIR, "*.json")):
+            try:
+                with open(path) as f: snaps.append(json.load(f))
+            except (OSError, ValueError): pass  # a worker is mid-replace
+    for s in snaps:
+        for n, l, h in s["hists"]:
+            acc = hists.setdefault((n, tuple(map(tuple, l))), [0] * len(h))
+            for i, v in enumerate(h): acc[i] += v
+        for n, l, v in s["counters"]:
+            k = (n, tuple(map(tuple, l))); counters[k] = counters.get(k, 0) + v
+    return hists, counters
+
+def flush(force=False):
+    """Write this worker's snapshot to METRICS_DIR (rate-limited unless forced)."""
+    global _flushed
+    now = time.monotonic()
+    if not METRICS_DIR or (not force and now - _flushed < FLUSH_SECS): return
+    _flushed = now
+    path = os.path.join(METRICS_DIR, f"{os.getpid()}.json")
+    tmp = f"{path}.{threading.get_ident()}.tmp"  # threads of one worker can flush at once
+    with open(tmp, "w") as f: json.dump(snapshot(), f)
+    os.replace(tmp, path)
+
+def forget(pid):
+    """Drop a dead worker's snapshot (and any temp file it left) so /metrics stops merging it."""
+    if not METRICS_DIR: return
+    for path in glob.glob(os.path.join(METRICS_DIR, f"{pid}.json*")):
+        try: os.remove(path)
+        except OSError: pass
+
+def _fmt(labels, extra=()):
+    parts = [f'{k}="{str(v)}"' for k, v in tuple(labels) + tuple(extra)]
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def render():
+    """Prometheus text exposition format."""
+    hists, counters = _merged(); out = []
+    for name, (kind, text) in HELP.items():
+        out += [f"# HELP {name} {text}", f"# TYPE {name} {kind}"]
+        if kind == "histogram":
+            for (n, labels), h in sorted(hists.items()):
+                if n != name: continue
+                cum = 0
+                for le, c in zip(BUCKETS + ("+Inf",), h[:-1]):
+                    cum += c; out.append(f"{name}_bucket{_fmt(labels, [('le', le)])} {cum}")
+                out += [f"{name}_sum{_fmt(labels)} {h[-1]:.6f}", f"{name}_count{_fmt(labels)} {cum}"]
+        else:
+            out += [f"{name}{_fmt(labels)} {v}" for (n, labels), v in sorted(counters.items()) if n == name]
+    out += ["# HELP admind_process_start_time_seconds Start time of this worker.", "# TYPE admind_process_start_time_seconds gauge",
+            f"admind_process_start_time_seconds {STARTED:.0f}"]
+    return "\n".join(out) + "\n"
+
+# ---------- per-request state ----------
+class _Req:
+    __slots__ = ("start", "db_n", "db_s", "http_n", "http_s", "spans")
+    def __init__(self):
+        self.start = time.perf_counter(); self.db_n = self.http_n = 0; self.db_s = self.http_s = 0.0; self.spans = {}
+
+def current():
+    return getattr(_local, "req", None)
+
+_KINDS = {"SELECT", "INSERT", "UPDATE", "DELETE", "REPLACE", "BEGIN", "COMMIT", "ROLLBACK", "WITH", "PRAGMA", "CREATE"}
+_by_sql = {}  # statement text -> its histogram row; statements are mostly literals, so this stays small
+
+def _sql(sql, seconds):
+    h = _by_sql.get(sql)
+    if h is None:
+        kind = sql.lstrip()[:8].split(None, 1)
+        kind = kind[0].upper() if kind else ""
+        h = series("admind_db_query_duration_seconds", (("op", kind if kind in _KINDS else "OTHER"),))
+        if len(_by_sql) < 4096: _by_sql[sql] = h
+    _add(h, seconds)
+    r = getattr(_local, "req", None)
+    if r is not None: r.db_n += 1; r.db_s += seconds
+
+class Cursor(sqlite3.Cursor):
+    def execute(self, sql, params=()):
+        t = time.perf_counter()
+        try: return super().execute(sql, params)
+        finally: _sql(sql, time.perf_counter() - t)
+
+    def executemany(self, sql, rows):
+        t = time.perf_counter()
+        try: return super().executemany(sql, rows)
+        finally: _sql(sql, time.perf_counter() - t)
+
+class Connection(sqlite3.Connection):
+    """sqlite3 connection whose statements are timed; store.connect() uses it when ENABLED."""
+    def cursor(self, factory=None):
+        return super().cursor(factory or Cursor)
+
+    # Connection.execute() builds a plain cursor internally, so route it through ours
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, rows):
+        return self.cursor().executemany(sql, rows)
+
+def timed(span):
+    """Decorator recording a call's duration under `span`."""
+    def wrap(fn):
+        if not ENABLED: return fn
+        @functools.wraps(fn)
+        def inner(*a, **k):
+            t = time.perf_counter()
+            try: return fn(*a, **k)
+            finally:
+                secs = time.perf_counter() - t
+                observe("admind_span_duration_seconds", (("span", span),), secs)
+                r = current()
+                if r is not None: r.spans[span] = r.spans.get(span, 0.0) + secs
+        return inner
+    return wrap
+
+# ---------- slow-request profiler ----------
+class Profiler:
+    """Samples the stacks of threads that are serving a request."""
+    def __init__(self, slow_ms, interval, out):
+        self.slow, self.interval, self.out = slow_ms / 1000, interval, out
+        self.active, self.pid, self.lock = {}, None, threading.Lock()
+
+    def begin(self):
+        if self.pid != os.getpid():
+            with self.lock:  # the sampler thread doesn't survive a fork
+                if self.pid != os.getpid():
+                    self.active = {}; self.pid = os.getpid()
+                    threading.Thread(target=self.run, name="profiler", daemon=True).start()
+        self.active[threading.get_ident()] = Counter()
+
+    def end(self, seconds, method, path):
+        samples = self.active.pop(threading.get_ident(), None)
+        if not samples or seconds < self.slow: return
+        os.makedirs(self.out, exist_ok=True)
+        name = re.sub(r"[^\w.-]+", "_", f"{method}{path}").strip("_")[:80]
+        with open(os.path.join(self.out, f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{name}-{seconds * 1000:.0f}ms.folded"), "w") as f:
+            f.writelines(f"{_folded(stack)} {n}\n" for stack, n in samples.most_common())
+        count("admind_slow_request_profiles_total")
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            if not self.active: continue
+            frames = sys._current_frames()
+            for ident, samples in list(self.active.items()):
+                f = frames.get(ident)
+                if f is not None: samples[_stack(f)] += 1
+
+def _stack(f):
+    # cheap to build and hash while sampling; formatted only when a profile is written
+    out = []
+    while f is not None: out.append((f.f_code, f.f_lineno)); f = f.f_back
+    return tuple(out)
+
+def _folded(stack):
+    return ";".join(f"{c.co_name} ({os.path.basename(c.co_filename)}:{line})" for c, line in reversed(stack))
+
+profiler = Profiler(PROFILE_SLOW_MS, PROFILE_INTERVAL, PROFILE_DIR) if ENABLED and PROFILE_SLOW_MS > 0 else None
+
+# ---------- Flask hooks ----------
+def init_app(app):
+    if not ENABLED: return
+    from flask import Response, request
+
+    @app.before_request
+    def _start():
+        _local.req = _Req()
+        if profiler: profiler.begin()
+
+    @app.after_request
+    def _finish(resp):
+        r = current()
+        if r is None: return resp
+        _local.req = None
+        secs = time.perf_counter() - r.start
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        observe("admind_http_request_duration_seconds", (("route", route), ("method", request.method), ("status", str(resp.status_code))), secs)
+        if r.db_n: count("admind_request_db_queries_total", (("route", route),), r.db_n)
+        if profiler: profiler.end(secs, request.method, request.path)
+        timing = [f'db;dur={r.db_s * 1000:.2f};desc="{r.db_n} queries"'] if r.db_n else []
+        if r.http_n: timing.append(f'http;dur={r.http_s * 1000:.2f};desc="{r.http_n} calls"')
+        timing += [f"{k};dur={v * 1000:.2f}" for k, v in r.spans.items()]
+        timing.append(f"total;dur={secs * 1000:.2f}")
+        resp.headers["Server-Timing"] = ", ".join(timing)
+        flush()
+        return resp
+
+    @app.teardown_request
+    def _teardown(exc):
+        # after_request is skipped when a response can't be built; don't leak state into the next request
+        if current() is not None:
+            _local.req = None
+            if profiler: profiler.active.pop(threading.get_ident(), None)
+
+    @app.get("/metrics")
+    def metrics_endpoint():
+        if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+            return Response("unauthorized\n", 401, mimetype="text/plain")
+        return Response(render(), mimetype="text/plain; version=0.0.4")
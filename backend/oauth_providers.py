@@ -47,3 +47,7 @@ OAUTH = {
         "api_base": "https://api.linkedin.com/v2"
     }
 }
+
+# one token endpoint for every provider's code exchange and refresh, e.g. a local fake in benchmarks
+if os.environ.get("OAUTH_TOKEN_URL"):
+    for _cfg in OAUTH.values(): _cfg["token_url"] = os.environ["OAUTH_TOKEN_URL"]
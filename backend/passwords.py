@@ -0,0 +1,88 @@
+"""Password hashing off the request workers.
+
+bcrypt runs in a small process pool so a burst of logins can't take every
+CPU the web workers need. At most QUEUE hashes may be queued or running per
+web process; beyond that hash_password()/verify() raise Busy and the handler
+answers 429 straight away instead of piling requests up behind the pool. A
+hash that takes longer than HASH_TIMEOUT raises Busy too.
+
+The cost factor comes from BCRYPT_LOG_ROUNDS. A hash made with a different
+cost, or a legacy salted SHA-256 `pw_hash` from the old auth blueprint, is
+upgraded on the next successful login the pool has room for.
+"""
+import hashlib, hmac, multiprocessing, os, threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+import bcrypt
+from backend import metrics
+
+ROUNDS = int(os.environ.get("BCRYPT_LOG_ROUNDS", 12))
+WORKERS = int(os.environ.get("HASH_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+QUEUE = int(os.environ.get("HASH_QUEUE", 2 * WORKERS))
+POOL_ENABLED = os.environ.get("HASH_POOL", "1") != "0"
+TIMEOUT = float(os.environ.get("HASH_TIMEOUT", 10))
+
+class Busy(Exception):
+    """Too many hashes in flight; caller should answer 429."""
+
+def _hash(pw, rounds):
+    return bcrypt.hashpw(pw.encode()[:72], bcrypt.gensalt(rounds)).decode()
+
+def _check(pw, hashed):
+    return bcrypt.checkpw(pw.encode()[:72], hashed.encode())
+
+def legacy_sha256(pw):
+    salt = os.getenv("SECRET_KEY", "salt").encode()
+    return hashlib.sha256(salt + pw.encode()).hexdigest()
+
+def rounds_of(hashed):
+    """Cost factor encoded in a bcrypt hash ($2b$12$...)."""
+    try: return int(hashed.split("$")[2])
+    except (IndexError, ValueError): return None
+
+_pool = None
+_pid = None
+_slots = threading.BoundedSemaphore(QUEUE)
+_lock = threading.Lock()
+
+def pool():
+    global _pool, _pid
+    with _lock:
+        if _pool is None or _pid != os.getpid():
+            # spawn, not fork: web workers are threaded and forking them is unsafe
+            _pool = ProcessPoolExecutor(WORKERS, mp_context=multiprocessing.get_context("spawn"))
+            _pid = os.getpid()
+        return _pool
+
+@metrics.timed("bcrypt")
+def _run(fn, *args):
+    if not POOL_ENABLED: return fn(*args)
+    if not _slots.acquire(blocking=False): raise Busy()
+    try: job = pool().submit(fn, *args)
+    except BaseException: _slots.release(); raise
+    # the slot is held until the hash finishes, not just while this request waits for it
+    job.add_done_callback(lambda _: _slots.release())
+    try: return job.result(timeout=TIMEOUT)
+    except FutureTimeout: raise Busy()  # the pool is backed up past HASH_TIMEOUT: same answer as a full queue
+
+def hash_password(pw):
+    return _run(_hash, pw, ROUNDS)
+
+def verify(pw, password_hash=None, legacy_hash=None):
+    """Check a password. Returns (ok, new_hash) where new_hash is set when the
+    stored hash should be replaced (cost changed or legacy SHA-256)."""
+    if password_hash:
+        if not _run(_check, pw, password_hash): return False, None
+        return True, (_rehash(pw) if rounds_of(password_hash) != ROUNDS else None)
+    if legacy_hash and hmac.compare_digest(legacy_hash, legacy_sha256(pw)):
+        return True, _rehash(pw)
+    return False, None
+
+def _rehash(pw):
+    """The upgraded hash, or None when the pool is busy: the password was right,
+    so the login goes through and the upgrade waits for a later one."""
+    try: return hash_password(pw)
+    except Busy: return None
+
+def warm_up():
+    """Start the pool's processes ahead of the first login."""
+    if POOL_ENABLED: pool().submit(rounds_of, "").result()
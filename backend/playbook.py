@@ -0,0 +1,110 @@
+"""Playbook scheduler.
+
+Turns recommendations into a 7- or 14-day plan under a daily effort budget
+(hours) and an optional total media budget. Each insight is worth
+priority_score x expected_impact. Insights come off a max-heap by value per
+hour of effort. Each one goes on the day where it costs the least effort
+and still fits, earliest day first on ties. Shipping an action already
+scheduled that day for another campaign costs only MARGINAL of its effort,
+so the same change across many campaigns is batched instead of repeated.
+
+Plans are memoized per (selection, constraints, recommendations generation),
+so repeated requests for the same selection are a dict lookup until the
+recommendations are rebuilt.
+"""
+import heapq, json, os
+from backend import cache, shards
+from backend.cache import LRU
+
+DAILY_EFFORT = float(os.environ.get("PLAYBOOK_DAILY_HOURS", 6))
+MAX_CANDIDATES = int(os.environ.get("PLAYBOOK_CANDIDATES", 10000))
+MARGINAL = 0.25
+HORIZONS = (7, 14)
+
+# hours to ship each action once; unknown actions cost DEFAULT_EFFORT
+EFFORT = {
+    "Add price anchor (MSRP vs Now) + guarantee top-of-frame": 2, "Swap first frame to strongest review (stars + count)": 1,
+    "Send traffic to highest-CVR LP; strip header nav": 3, "Narrow audience": 1, "Update hook + objection": 2,
+    "Bid cap -10%": 0.5, "Refresh first 2s hook": 2, "Test 3 new thumbnails": 1.5,
+    "Tighten audience to high-intent segments": 1, "Raise budget +20% while CTR holds": 0.5,
+    "Clone winning creative to sibling ad sets": 1,
+}
+DEFAULT_EFFORT = 1.0
+# extra media spend an action commits, as a share of the campaign's spend
+BUDGET_SHARE = {"Raise budget +20% while CTR holds": 0.2, "Test 3 new thumbnails": 0.05,
+                "Clone winning creative to sibling ad sets": 0.1}
+
+_plans = LRU(int(os.environ.get("PLAYBOOK_CACHE", 256)))
+
+def candidates(con=None, ids=None, limit=MAX_CANDIDATES):
+    """Recommendations joined with campaign spend, highest priority first (merged across shards)."""
+    if con is not None: return _candidates(con, ids, limit)
+    parts = shards.fan_out(lambda c: _candidates(c, ids, limit), ks=shards.group_by_shard(ids) if ids else None)
+    if ids: return [r for part in parts for r in part]
+    return list(heapq.merge(*parts, key=lambda r: -r["priority_score"]))[:limit]
+
+def _candidates(con, ids, limit):
+    q = """SELECT r.id, r.title, r.campaign_name, r.kpi, r.severity, r.priority_score, r.expected_impact, r.actions,
+                  COALESCE(c.spend, 0) spend
+           FROM recommendations r LEFT JOIN campaigns c ON c.id=r.campaign_id"""
+    if ids:
+        ids = list(ids); rows = []
+        for i in range(0, len(ids), 500):
+            part = ids[i:i + 500]
+            rows += con.execute(f"{q} WHERE r.id IN ({','.join('?' * len(part))})", part).fetchall()
+    else:
+        rows = con.execute(f"{q} ORDER BY r.priority_score DESC LIMIT ?", (limit,)).fetchall()
+    return [dict(r, actions=json.loads(r["actions"])) for r in rows]
+
+def schedule(items, days=7, daily_effort=DAILY_EFFORT, budget=None):
+    """Pick and place insights; returns (plan rows, per-day summary, skipped count)."""
+    used, spent = [0.0] * days, 0.0
+    shipped = [set() for _ in range(days)]
+    heap, efforts = [], []
+    for n, it in enumerate(items):
+        eff = [(a, EFFORT.get(a, DEFAULT_EFFORT)) for a in it["actions"]]
+        effort = sum(e for _, e in eff) or DEFAULT_EFFORT
+        value = (it.get("priority_score") or 0) * (it.get("expected_impact") or 0.1)
+        efforts.append((eff, MARGINAL * effort))
+        heap.append((-value / effort, n))
+    heapq.heapify(heap)
+    placed, skipped = [], 0
+    while heap:
+        _, n = heapq.heappop(heap); it = items[n]
+        eff, least = efforts[n]
+        if daily_effort - min(used) < least: skipped += 1; continue  # can't fit even fully batched
+        cost = sum(BUDGET_SHARE.get(a, 0) for a in it["actions"]) * (it.get("spend") or 0)
+        if budget is not None and spent + cost > budget: skipped += 1; continue
+        best = None
+        for d in range(days):
+            e = sum(h * MARGINAL if a in shipped[d] else h for a, h in eff)
+            if used[d] + e <= daily_effort and (best is None or e < best[1]): best = (d, e)
+        if best is None: skipped += 1; continue
+        d, e = best
+        batched = [a for a in it["actions"] if a in shipped[d]]
+        used[d] += e; spent += cost; shipped[d].update(it["actions"])
+        placed.append((d, n, e, cost, batched))
+    placed.sort()
+    plan = []
+    for d, n, e, cost, batched in placed:
+        it = items[n]
+        plan.append({"day": f"Day {d + 1}", "insight_id": it["id"], "title": it["title"], "campaign_name": it["campaign_name"],
+                     "kpi": it["kpi"], "severity": it["severity"],
+                     "what_to_ship": [f"{a} (batched)" if a in batched else a for a in it["actions"]],
+                     "how_to_measure": [f"Primary KPI: {it['kpi']}", f"Expected impact: +{int((it.get('expected_impact') or 0) * 100)}%", "Review after 48h"],
+                     "effort_hours": round(e, 2), "budget": round(cost, 2)})
+    summary = [{"day": f"Day {d + 1}", "effort_hours": round(used[d], 2), "items": sum(1 for p in placed if p[0] == d)} for d in range(days)]
+    return plan, summary, skipped
+
+def build_plan(ids=None, days=7, daily_effort=DAILY_EFFORT, budget=None, con=None, fallback=None):
+    """Memoized plan for a selection of insight ids (None = all recommendations)."""
+    if days not in HORIZONS: raise ValueError("bad_days")
+    key = (frozenset(ids) if ids else None, days, daily_effort, budget, cache.generations()[0])
+    hit = _plans.get(key)
+    if hit is not None: return hit
+    items = candidates(con, ids) or [i for i in (fallback or []) if not ids or i["id"] in ids]
+    plan, summary, skipped = schedule(items, days, daily_effort, budget)
+    out = {"plan": plan, "days": summary, "candidates": len(items), "skipped": skipped,
+           "budget_used": round(sum(p["budget"] for p in plan), 2)}
+    _plans.put(key, out)
+    return out
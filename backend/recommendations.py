@@ -0,0 +1,149 @@
+"""Incremental campaign recommendation scorer.
+
+Every campaign snapshot is scored against its account: ROAS below the account
+target, CPA above the account average, and CTR outliers (|z| >= 2 within the
+account). Results live in the indexed `recommendations` table, so /api/insights
+is a top-k read on priority_score.
+
+A signature of the inputs a campaign was scored with is kept in
+`campaign_scores`; a refresh walks campaigns in id-ordered batches and only
+re-scores those whose signature changed, which keeps both time and memory
+bounded on large accounts. A sharded store is scored shard by shard: an
+account and all its campaigns share a shard, so its baselines are complete.
+"""
+import heapq, json, math, os, zlib
+from datetime import datetime
+from backend import cache, shards
+from backend.store import with_retry
+
+TARGET_ROAS = float(os.environ.get("TARGET_ROAS", 1.0))
+BATCH = int(os.environ.get("RECS_BATCH", 5000))
+KPIS = ("ROAS", "CPA", "CTR")
+MAX_LIMIT = 100  # most insights one /api/insights response carries
+
+ACTIONS = {
+    "ROAS": ["Add price anchor (MSRP vs Now) + guarantee top-of-frame",
+             "Swap first frame to strongest review (stars + count)",
+             "Send traffic to highest-CVR LP; strip header nav"],
+    "CPA": ["Narrow audience", "Update hook + objection", "Bid cap -10%"],
+    "CTR-low": ["Refresh first 2s hook", "Test 3 new thumbnails", "Tighten audience to high-intent segments"],
+    "CTR-high": ["Raise budget +20% while CTR holds", "Clone winning creative to sibling ad sets"],
+}
+
+def account_stats(con):
+    """Per-account aggregates the rules compare against, rounded so small drifts
+    in an account's averages don't force a re-score of all its campaigns."""
+    out = {}
+    for r in con.execute("""SELECT c.account_id, SUM(c.spend) spend, SUM(c.conversions) conv,
+                                   AVG(c.ctr) ctr, AVG(c.ctr*c.ctr) ctr2, COUNT(*) n, a.target_roas
+                            FROM campaigns c LEFT JOIN accounts a ON a.id=c.account_id
+                            GROUP BY c.account_id"""):
+        var = max((r["ctr2"] or 0) - (r["ctr"] or 0) ** 2, 0)
+        out[r["account_id"]] = (
+            _round(r["spend"] / r["conv"]) if r["conv"] else 0.0,
+            _round(r["ctr"] or 0.0), _round(math.sqrt(var)),
+            r["target_roas"] or TARGET_ROAS,
+        )
+    return out
+
+def _round(x):
+    """Two significant digits: 29.4 -> 29.0, 0.734 -> 0.73."""
+    return float(f"{x:.2g}") if x else 0.0
+
+def score_campaign(c, stats):
+    """Yield (kpi, gap, priority, evidence, actions) for one campaign row."""
+    avg_cpa, ctr_mean, ctr_std, target = stats
+    spend, roas, cpa, ctr = c["spend"] or 0, c["roas"], c["cpa"], c["ctr"]
+    if not spend: return
+    weight = 1 + math.log1p(spend / 1000)
+    if roas is not None and roas < target:
+        gap = (target - roas) / target
+        yield "ROAS", gap, min(gap, 1) * weight, {"roas": f"{roas:.2f}", "spend": round(spend), "target_roas": f"{target:.2f}"}, ACTIONS["ROAS"]
+    if avg_cpa and cpa and cpa > avg_cpa * 1.2:
+        gap = (cpa - avg_cpa) / avg_cpa
+        yield "CPA", gap, min(gap, 1) * weight, {"cpa": f"${cpa:.0f}", "avg_cpa": f"${avg_cpa:.0f}", "delta": f"+{gap:.0%}"}, ACTIONS["CPA"]
+    if ctr_std and ctr is not None:
+        z = (ctr - ctr_mean) / ctr_std
+        if abs(z) >= 2:
+            gap = min(abs(z) / 4, 1)
+            yield "CTR", gap, gap * weight, {"ctr": f"{ctr:.2f}%", "avg_ctr": f"{ctr_mean:.2f}%", "z": f"{z:+.1f}"}, ACTIONS["CTR-low" if z < 0 else "CTR-high"]
+
+def _title(kpi, name, evidence):
+    if kpi == "ROAS": return f"Lift ROAS on {name}"
+    if kpi == "CPA": return f"Cut CPA on {name}"
+    return f"{'Lift' if evidence['z'].startswith('-') else 'Scale'} CTR on {name}"
+
+def _sig(c, stats):
+    key = (c["name"], c["spend"], c["roas"], c["cpa"], c["ctr"], c["conversions"], stats)
+    return zlib.crc32(repr(key).encode())
+
+def build_recommendations(con=None, batch=BATCH, full=False):
+    """Re-score changed campaigns and persist their recommendations.
+
+    Returns counts of scored and unchanged campaigns. Deleting a campaign
+    deletes its recommendations and score (ON DELETE CASCADE).
+    """
+    parts = [_build(con, batch, full)] if con is not None else shards.fan_out(lambda c: _build(c, batch, full))
+    out = {k: sum(p[k] for p in parts) for k in ("scored", "unchanged")}
+    if out["scored"]: cache.invalidate()
+    return out
+
+def _build(con, batch, full):
+    stats = account_stats(con)
+    now = datetime.utcnow().isoformat()
+    scored = unchanged = 0
+    last = 0
+    while True:
+        rows = con.execute("""SELECT c.id,c.account_id,c.name,c.spend,c.roas,c.cpa,c.ctr,c.conversions,s.sig
+                              FROM campaigns c LEFT JOIN campaign_scores s ON s.campaign_id=c.id
+                              WHERE c.id>? ORDER BY c.id LIMIT ?""", (last, batch)).fetchall()
+        if not rows: break
+        last = rows[-1]["id"]
+        upserts, deletes, sigs = [], [], []
+        for c in rows:
+            st = stats.get(c["account_id"], (0.0, 0.0, 0.0, TARGET_ROAS))
+            sig = _sig(c, st)
+            if not full and sig == c["sig"]:
+                unchanged += 1; continue
+            scored += 1
+            produced = set()
+            for kpi, gap, prio, evidence, actions in score_campaign(c, st):
+                produced.add(kpi)
+                upserts.append((c["id"], c["account_id"], kpi, _title(kpi, c["name"], evidence), c["name"],
+                                "high" if gap >= 0.3 else "med" if gap >= 0.1 else "low", round(prio, 2),
+                                json.dumps(evidence), json.dumps(actions), round(min(0.9, gap), 2), now))
+            deletes.extend((c["id"], k) for k in KPIS if k not in produced)
+            sigs.append((c["id"], sig, now))
+        if sigs: with_retry(_write_batch, con, upserts, deletes, sigs)
+    return {"scored": scored, "unchanged": unchanged}
+
+def _write_batch(con, upserts, deletes, sigs):
+    with con:
+        con.executemany("""INSERT INTO recommendations(campaign_id,account_id,kpi,title,campaign_name,severity,
+                                   priority_score,evidence,actions,expected_impact,created_at)
+                           VALUES(?,?,?,?,?,?,?,?,?,?,?)
+                           ON CONFLICT(campaign_id,kpi) DO UPDATE SET
+                             account_id=excluded.account_id, title=excluded.title, campaign_name=excluded.campaign_name,
+                             severity=excluded.severity, priority_score=excluded.priority_score, evidence=excluded.evidence,
+                             actions=excluded.actions, expected_impact=excluded.expected_impact, created_at=excluded.created_at""",
+                        upserts)
+        con.executemany("DELETE FROM recommendations WHERE campaign_id=? AND kpi=?", deletes)
+        con.executemany("INSERT OR REPLACE INTO campaign_scores(campaign_id,sig,scored_at) VALUES(?,?,?)", sigs)
+
+def top_insights(con=None, limit=10, ids=None):
+    """Highest-priority recommendations in the /api/insights shape (merged across shards)."""
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    if con is not None: rows = _insight_rows(con, limit, ids)
+    else:
+        parts = shards.fan_out(lambda c: _insight_rows(c, limit, ids), ks=shards.group_by_shard(ids) if ids else None)
+        rows = list(heapq.merge(*parts, key=lambda r: -r["priority_score"]))
+        if not ids: rows = rows[:limit]
+    return [{"id": r["id"], "title": r["title"], "campaign_name": r["campaign_name"], "kpi": r["kpi"],
+             "severity": r["severity"], "priority_score": r["priority_score"], "evidence": json.loads(r["evidence"]),
+             "actions": json.loads(r["actions"]), "expected_impact": r["expected_impact"]} for r in rows]
+
+def _insight_rows(con, limit, ids):
+    if ids:
+        marks = ",".join("?" * len(ids))
+        return con.execute(f"SELECT * FROM recommendations WHERE id IN ({marks}) ORDER BY priority_score DESC", list(ids)).fetchall()
+    return con.execute("SELECT * FROM recommendations ORDER BY priority_score DESC LIMIT ?", (limit,)).fetchall()
@@ -0,0 +1,511 @@
+"""Versioned schema migrations.
+
+The schema version is SQLite's PRAGMA user_version. MIGRATIONS is
+append-only, and each step runs in its own write transaction that also bumps
+the version, so a database is migrated exactly once. That happens out of band,
+in `python -m backend.scripts.migrate` (the Procfile release step). Workers and
+scripts only read user_version (ensure()) and refuse to start on an
+out-of-date database. Two exceptions: a new, empty database file is created at
+the latest version (as a new shard is), and AUTO_MIGRATE=1 migrates in
+whichever process checks first, for local development (`python -m
+backend.app` always does). Version 1 is the
+schema init_db() used to re-apply on every import; it is idempotent, so it
+also adopts databases created before versioning. Version 2 (unify) folds the legacy auth/social tables into it and
+adds foreign keys by rebuilding tables online, in batches. Version 3
+recreates the post snapshot triggers as explicit upserts; version 4 adds
+the background job queue (backend/jobs.py); version 5 adds the import leases
+(backend/ingest.py); version 6 indexes each post's owner in posts_fts.
+
+A step never calls into the modules that own the tables now (feed, search,
+timeseries): the DDL it needs is frozen here as it stood when the step
+shipped, so migrating an old database replays the schemas that were tested.
+Their create_schema() helpers describe the current schema for new code.
+"""
+import os, threading, time
+from contextlib import contextmanager
+from backend.store import DB_PATH, connect, db, with_retry
+
+AUTO_MIGRATE = os.environ.get("AUTO_MIGRATE", "0") == "1"
+
+class SchemaOutOfDate(RuntimeError):
+    pass
+
+MIGRATIONS = []
+
+def migration(fn):
+    MIGRATIONS.append(fn); return fn
+
+def add_column(cur, table, column, decl):
+    # table_xinfo also lists generated columns
+    if column not in [r[1] for r in cur.execute(f"PRAGMA table_xinfo({table})")]:
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+# ---------- frozen DDL ----------
+# copies of feed/timeseries/search definitions as of version 1; never edit them, add a migration
+_POST_METRICS = ("likes", "comments", "plays", "views")
+_STATS = ("spend", "impressions", "clicks", "conversions", "revenue")
+_LABELS = {"instagram": "Instagram", "tiktok": "TikTok", "youtube": "YouTube", "facebook": "Facebook", "linkedin": "LinkedIn"}
+
+def _metric_column(name):
+    return f"INTEGER GENERATED ALWAYS AS (CASE WHEN json_valid(metrics) THEN COALESCE(json_extract(metrics,'$.{name}'),0) ELSE 0 END) VIRTUAL"
+
+def _week(expr):
+    return f"date({expr}, 'weekday 0', '-6 days')"
+
+def _rollup(row, sign):
+    # one campaign_stats row added to (sign '') or taken from (sign '-') the three rollups
+    acct = f"COALESCE((SELECT account_id FROM campaigns WHERE id={row}.campaign_id), 0)"
+    vals = ", ".join(f"{sign}COALESCE({row}.{m}, 0)" for m in _STATS)
+    cols, upd = ", ".join(_STATS), ", ".join(f"{m}={m}+excluded.{m}" for m in _STATS)
+    return " ".join(f"INSERT INTO {table}({key}, {cols}) VALUES({keyvals}, {vals}) ON CONFLICT({key}) DO UPDATE SET {upd};"
+                    for table, key, keyvals in (("stats_daily", "day, account_id", f"{row}.day, {acct}"),
+                                                ("stats_weekly", "week, account_id", f"{_week(row + '.day')}, {acct}"),
+                                                ("campaign_weekly", "campaign_id, week", f"{row}.campaign_id, {_week(row + '.day')}")))
+
+def _fts(cur, fts, table, cols):
+    # external-content FTS5 index over table(cols), its sync triggers and a first build
+    fresh = not cur.execute("SELECT 1 FROM sqlite_master WHERE name=?", (fts,)).fetchone()
+    c = ", ".join(cols); new = ", ".join(f"new.{x}" for x in cols); old = ", ".join(f"old.{x}" for x in cols)
+    cur.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({c}, content='{table}', content_rowid='id', tokenize='unicode61 remove_diacritics 2')")
+    cur.execute(f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN INSERT INTO {fts}(rowid, {c}) VALUES(new.id, {new}); END")
+    cur.execute(f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN INSERT INTO {fts}({fts}, rowid, {c}) VALUES('delete', old.id, {old}); END")
+    cur.execute(f"""CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {c} ON {table} BEGIN
+                          INSERT INTO {fts}({fts}, rowid, {c}) VALUES('delete', old.id, {old});
+                          INSERT INTO {fts}(rowid, {c}) VALUES(new.id, {new}); END""")
+    if fresh: cur.execute(f"INSERT INTO {fts}({fts}) VALUES('rebuild')")
+
+@migration
+def baseline(cur):
+    cur.execute("""CREATE TABLE IF NOT EXISTS users(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        email TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        created_at TEXT NOT NULL
+    )""")
+    # databases created by backend/auth.py only have the legacy pw_hash column
+    add_column(cur, "users", "password_hash", "TEXT")
+    add_column(cur, "users", "pw_hash", "TEXT")
+    cur.execute("""CREATE TABLE IF NOT EXISTS tokens(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        platform TEXT,
+        access_token TEXT,
+        refresh_token TEXT,
+        expires_at INTEGER,
+        raw TEXT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )""")
+    if not cur.execute("SELECT 1 FROM sqlite_master WHERE name='idx_tokens_user_platform'").fetchone():
+        # repeated OAuth callbacks used to insert a new row each time; keep the newest
+        cur.execute("DELETE FROM tokens WHERE id NOT IN (SELECT MAX(id) FROM tokens GROUP BY user_id, platform)")
+        cur.execute("CREATE UNIQUE INDEX idx_tokens_user_platform ON tokens(user_id, platform)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_tokens_expires ON tokens(expires_at) WHERE refresh_token IS NOT NULL")
+    cur.execute("""CREATE TABLE IF NOT EXISTS posts(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        platform TEXT,
+        external_id TEXT,
+        title TEXT,
+        caption TEXT,
+        metrics TEXT,
+        created_at TEXT
+    )""")
+    add_column(cur, "posts", "user_id", "INTEGER")  # social.py's posts had none
+    add_column(cur, "posts", "external_id", "TEXT")
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_posts_external ON posts(user_id, platform, external_id)")
+    for m in _POST_METRICS: add_column(cur, "posts", m, _metric_column(m))
+    if not cur.execute("SELECT 1 FROM sqlite_master WHERE name='idx_posts_user_platform'").fetchone():
+        # sync used to store str.capitalize() labels ("Tiktok"); the feed filters on the canonical ones
+        for key, label in _LABELS.items():
+            cur.execute("UPDATE OR IGNORE posts SET platform=? WHERE lower(platform)=? AND platform<>?", (label, key, label))
+    for name, cols in [("idx_posts_user_id", "user_id, id"), ("idx_posts_user_platform", "user_id, platform, id"),
+                       ("idx_posts_user_created", "user_id, created_at, id")] + [(f"idx_posts_user_{m}", f"user_id, {m}, id") for m in _POST_METRICS]:
+        cur.execute(f"CREATE INDEX IF NOT EXISTS {name} ON posts({cols})")
+    cur.execute("""CREATE TABLE IF NOT EXISTS contacts(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT,email TEXT,company TEXT,phone TEXT,message TEXT,created_at TEXT
+    )""")
+    cur.execute("""CREATE TABLE IF NOT EXISTS accounts(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT,platform TEXT,external_id TEXT,monthly_spend REAL,target_roas REAL
+    )""")
+    cur.execute("""CREATE TABLE IF NOT EXISTS campaigns(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        account_id INTEGER,
+        name TEXT,
+        status TEXT,
+        spend REAL, cpa REAL, roas REAL, ctr REAL,
+        impressions INTEGER, clicks INTEGER, conversions INTEGER
+    )""")
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_campaigns_account_name ON campaigns(account_id, name)")
+    cur.execute("""CREATE TABLE IF NOT EXISTS campaign_stats(
+        campaign_id INTEGER NOT NULL,
+        day TEXT NOT NULL,
+        spend REAL, impressions INTEGER, clicks INTEGER, conversions INTEGER, revenue REAL,
+        PRIMARY KEY(campaign_id, day)
+    ) WITHOUT ROWID""")
+    cur.execute("""CREATE TABLE IF NOT EXISTS recommendations(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        campaign_id INTEGER NOT NULL,
+        account_id INTEGER,
+        kpi TEXT NOT NULL,
+        title TEXT, campaign_name TEXT, severity TEXT,
+        priority_score REAL, evidence TEXT, actions TEXT, expected_impact REAL,
+        created_at TEXT,
+        UNIQUE(campaign_id, kpi)
+    )""")
+    cur.execute("""CREATE TABLE IF NOT EXISTS cache_generations(
+        scope TEXT PRIMARY KEY,
+        gen INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID""")
+    cur.execute("""CREATE TABLE IF NOT EXISTS imports(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        fingerprint TEXT UNIQUE NOT NULL,
+        source TEXT,
+        byte_offset INTEGER DEFAULT 0,
+        rows INTEGER DEFAULT 0,
+        status TEXT,
+        started_at TEXT, finished_at TEXT
+    )""")
+    cur.execute("""CREATE TABLE IF NOT EXISTS import_campaigns(
+        import_id INTEGER NOT NULL,
+        campaign_id INTEGER NOT NULL,
+        PRIMARY KEY(import_id, campaign_id)
+    ) WITHOUT ROWID""")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_recommendations_priority ON recommendations(priority_score DESC)")
+    cur.execute("""CREATE TABLE IF NOT EXISTS campaign_scores(
+        campaign_id INTEGER PRIMARY KEY,
+        sig INTEGER,
+        scored_at TEXT
+    )""")
+    # time series (backend/timeseries.py): rollups kept by triggers on campaign_stats, post snapshots by triggers on posts
+    fresh = not cur.execute("SELECT 1 FROM sqlite_master WHERE name='campaign_weekly'").fetchone()
+    sums = ", ".join(f"{m} REAL NOT NULL DEFAULT 0" for m in _STATS)
+    cur.execute(f"CREATE TABLE IF NOT EXISTS stats_daily(day TEXT NOT NULL, account_id INTEGER NOT NULL, {sums}, PRIMARY KEY(day, account_id)) WITHOUT ROWID")
+    cur.execute(f"CREATE TABLE IF NOT EXISTS stats_weekly(week TEXT NOT NULL, account_id INTEGER NOT NULL, {sums}, PRIMARY KEY(week, account_id)) WITHOUT ROWID")
+    cur.execute(f"CREATE TABLE IF NOT EXISTS campaign_weekly(campaign_id INTEGER NOT NULL, week TEXT NOT NULL, {sums}, PRIMARY KEY(campaign_id, week)) WITHOUT ROWID")
+    cur.execute(f"""CREATE TABLE IF NOT EXISTS post_metrics(post_id INTEGER NOT NULL, day TEXT NOT NULL,
+                    {', '.join(f'{m} INTEGER' for m in _POST_METRICS)}, PRIMARY KEY(post_id, day)) WITHOUT ROWID""")
+    cur.execute("CREATE TABLE IF NOT EXISTS ts_state(key TEXT PRIMARY KEY, value) WITHOUT ROWID")
+    cur.execute("INSERT OR IGNORE INTO ts_state VALUES('pruning', 0)")
+    cur.execute(f"CREATE TRIGGER IF NOT EXISTS ts_stats_insert AFTER INSERT ON campaign_stats BEGIN {_rollup('NEW', '')} END")
+    cur.execute(f"CREATE TRIGGER IF NOT EXISTS ts_stats_update AFTER UPDATE ON campaign_stats BEGIN {_rollup('OLD', '-')} {_rollup('NEW', '')} END")
+    cur.execute(f"""CREATE TRIGGER IF NOT EXISTS ts_stats_delete AFTER DELETE ON campaign_stats
+                    WHEN (SELECT value FROM ts_state WHERE key='pruning') IS NOT 1 BEGIN {_rollup('OLD', '-')} END""")
+    cols, vals = ", ".join(_POST_METRICS), ", ".join(f"NEW.{m}" for m in _POST_METRICS)
+    snapshot = f"INSERT OR REPLACE INTO post_metrics(post_id, day, {cols}) VALUES(NEW.id, date('now'), {vals});"  # version 3 replaces these
+    cur.execute(f"CREATE TRIGGER IF NOT EXISTS ts_posts_insert AFTER INSERT ON posts BEGIN {snapshot} END")
+    cur.execute(f"CREATE TRIGGER IF NOT EXISTS ts_posts_update AFTER UPDATE OF metrics ON posts WHEN NEW.metrics IS NOT OLD.metrics BEGIN {snapshot} END")
+    cur.execute("CREATE TRIGGER IF NOT EXISTS ts_posts_delete AFTER DELETE ON posts BEGIN DELETE FROM post_metrics WHERE post_id=OLD.id; END")
+    if fresh:
+        src = "FROM campaign_stats s LEFT JOIN campaigns c ON c.id=s.campaign_id GROUP BY 1, 2"
+        sums, acct = ", ".join(f"SUM(COALESCE(s.{m}, 0))" for m in _STATS), "COALESCE(c.account_id, 0)"
+        cur.execute(f"INSERT INTO stats_daily(day, account_id, {', '.join(_STATS)}) SELECT s.day, {acct}, {sums} {src}")
+        cur.execute(f"INSERT INTO stats_weekly(week, account_id, {', '.join(_STATS)}) SELECT {_week('s.day')}, {acct}, {sums} {src}")
+        cur.execute(f"INSERT INTO campaign_weekly(campaign_id, week, {', '.join(_STATS)}) SELECT s.campaign_id, {_week('s.day')}, {sums} {src}")
+        cur.execute(f"INSERT OR IGNORE INTO post_metrics(post_id, day, {cols}) SELECT id, COALESCE(date(created_at), date('now')), {cols} FROM posts")
+    # full-text search (backend/search.py); version 6 adds the owner to posts_fts
+    _fts(cur, "posts_fts", "posts", ("title", "caption"))
+    _fts(cur, "contacts_fts", "contacts", ("name", "company", "message"))
+
+# ---------- online table rebuilds ----------
+BATCH = int(os.environ.get("MIGRATE_BATCH", 2000))
+PAUSE = float(os.environ.get("MIGRATE_PAUSE_MS", 10)) / 1000
+LEASE = 60  # seconds a batched step stays claimed without progress before another process may take it over
+
+@contextmanager
+def _write(con):
+    with_retry(con.execute, "BEGIN IMMEDIATE")
+    try:
+        yield con
+        con.commit()
+    except BaseException:
+        con.rollback(); raise
+
+def _columns(con, table, generated=True):
+    # table_xinfo hidden: 0 plain, 2/3 generated
+    return [r[1] for r in con.execute(f"PRAGMA table_xinfo({table})") if generated or r[6] == 0]
+
+def rebuild(con, table, ddl, key=("id",), keep="1", indexes=()):
+    """Move `table` onto a new definition without holding the write lock for long.
+
+    `ddl` creates `{table}__new`, and `indexes` are built on it up front so index
+    maintenance is spread over the copy. AFTER triggers mirror concurrent writes
+    into the copy while rows move over in key order, BATCH per short
+    transaction. `keep` is a filter over `src.<column>`: rows failing it (such
+    as orphans of a new foreign key) are deleted from the old table as their
+    batch comes up, so its triggers (search index, time series) see the delete.
+    The swap transaction renames the copy into place and moves the old table's
+    own triggers over; the old table is then dropped an index at a time. A
+    rerun after a crash starts the copy again (INSERT OR IGNORE).
+    """
+    new = f"{table}__new"
+    if con.execute("SELECT 1 FROM schema_rebuilds WHERE name=?", (table,)).fetchone(): return _drop(con, f"{table}__old")
+    with _write(con):
+        con.execute(ddl)
+        for sql in indexes: con.execute(sql)
+        cols = [c for c in _columns(con, new, generated=False) if c in _columns(con, table)]
+        c, new_vals = ", ".join(cols), ", ".join(f"new.{x}" for x in cols)
+        on_key = " AND ".join(f"{k}=old.{k}" for k in key)
+        mirror = keep.replace("src.", "new.")
+        con.execute(f"CREATE TRIGGER IF NOT EXISTS {table}__mirror_ai AFTER INSERT ON {table} WHEN {mirror} BEGIN INSERT OR REPLACE INTO {new}({c}) VALUES({new_vals}); END")
+        con.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}__mirror_au AFTER UPDATE ON {table} BEGIN DELETE FROM {new} WHERE {on_key};
+                        INSERT OR REPLACE INTO {new}({c}) SELECT {new_vals} WHERE {mirror}; END""")
+        con.execute(f"CREATE TRIGGER IF NOT EXISTS {table}__mirror_ad AFTER DELETE ON {table} BEGIN DELETE FROM {new} WHERE {on_key}; END")
+    k, marks = ", ".join(key), ", ".join("?" * len(key))
+    src_cols = ", ".join(f"src.{x}" for x in cols)
+    lo = None
+    while True:
+        t = time.perf_counter()
+        with _write(con):
+            con.execute("UPDATE schema_claims SET beat=? WHERE owner=?", (time.time(), os.getpid()))
+            after = f"({k}) > ({marks})" if lo else "1"
+            hi = con.execute(f"SELECT {k} FROM {table} WHERE {after} ORDER BY {k} LIMIT 1 OFFSET ?", (*(lo or ()), BATCH - 1)).fetchone()
+            upto = f"({k}) <= ({marks})" if hi else "1"
+            bounds = (*(lo or ()), *(hi or ()))
+            if keep != "1": con.execute(f"DELETE FROM {table} AS src WHERE {after} AND {upto} AND NOT ({keep})", bounds)
+            con.execute(f"INSERT OR IGNORE INTO {new}({c}) SELECT {src_cols} FROM {table} src WHERE {after} AND {upto}", bounds)
+        if hi is None: break
+        # stay off the lock at least as long as we held it: writers waiting in
+        # SQLite's busy handler poll with backoff and would starve on a short gap
+        lo = tuple(hi); time.sleep(max(PAUSE, time.perf_counter() - t))
+    with _write(con):
+        triggers = con.execute("SELECT name, sql FROM sqlite_master WHERE type='trigger' AND tbl_name=?", (table,)).fetchall()
+        for name, _ in triggers: con.execute(f"DROP TRIGGER {name}")
+        con.execute(f"ALTER TABLE {table} RENAME TO {table}__old")
+        con.execute(f"ALTER TABLE {new} RENAME TO {table}")
+        for name, sql in triggers:
+            if not name.startswith(f"{table}__mirror"): con.execute(sql)
+        con.execute("INSERT INTO schema_rebuilds(name) VALUES(?)", (table,))
+    _drop(con, f"{table}__old")
+
+def _drop(con, table):
+    # freeing pages costs about as much as writing them: one b-tree per transaction
+    for (name,) in con.execute("SELECT name FROM sqlite_master WHERE type='index' AND tbl_name=? AND sql IS NOT NULL", (table,)).fetchall():
+        with _write(con): con.execute(f"DROP INDEX {name}")
+        time.sleep(PAUSE)
+    with _write(con): con.execute(f"DROP TABLE IF EXISTS {table}")
+
+@migration
+def unify(con):
+    """One schema for app.py, auth.py and social.py, with foreign keys and covering indexes.
+
+    Batched: runs its own transactions (see rebuild()). Rows that would break
+    a new foreign key (tokens/posts of deleted users, stats of deleted
+    campaigns) are deleted. The legacy social.py `connections`
+    table becomes tokens rows (no access token yet) and is dropped.
+    """
+    with _write(con):
+        con.execute("CREATE TABLE IF NOT EXISTS schema_rebuilds(name TEXT PRIMARY KEY) WITHOUT ROWID")
+        con.execute("UPDATE users SET created_at=CURRENT_TIMESTAMP WHERE created_at IS NULL")
+        legacy = _columns(con, "connections") if con.execute("SELECT 1 FROM sqlite_master WHERE name='connections'").fetchone() else None
+        if legacy and {"user_id", "connected"} <= set(legacy):
+            con.execute("""INSERT OR IGNORE INTO tokens(user_id, platform, raw, created_at)
+                           SELECT user_id, lower(platform), '{"source":"connections"}', COALESCE(updated_at, created_at, CURRENT_TIMESTAMP)
+                           FROM connections WHERE connected=1 AND user_id IN (SELECT id FROM users) AND platform IS NOT NULL""")
+        if legacy is not None: con.execute("DROP TABLE connections")
+        con.execute("CREATE INDEX IF NOT EXISTS ix_accounts_name ON accounts(name)")
+    user = "EXISTS (SELECT 1 FROM users WHERE id=src.user_id)"
+    campaign = "EXISTS (SELECT 1 FROM campaigns WHERE id=src.campaign_id)"
+    account = "(src.account_id IS NULL OR EXISTS (SELECT 1 FROM accounts WHERE id=src.account_id))"
+    rebuild(con, "users", """CREATE TABLE IF NOT EXISTS users__new(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        email TEXT NOT NULL UNIQUE,
+        password_hash TEXT,
+        pw_hash TEXT,
+        created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )""", keep="src.email IS NOT NULL")
+    rebuild(con, "tokens", """CREATE TABLE IF NOT EXISTS tokens__new(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+        platform TEXT NOT NULL,
+        access_token TEXT,
+        refresh_token TEXT,
+        expires_at INTEGER,
+        raw TEXT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(user_id, platform)
+    )""", keep=f"{user} AND src.platform IS NOT NULL",
+        indexes=["CREATE INDEX IF NOT EXISTS ix_tokens_expires ON tokens__new(expires_at) WHERE refresh_token IS NOT NULL"])
+    generated = ",\n        ".join(f"{m} {_metric_column(m)}" for m in _POST_METRICS)
+    rebuild(con, "posts", f"""CREATE TABLE IF NOT EXISTS posts__new(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+        platform TEXT,
+        external_id TEXT,
+        title TEXT,
+        caption TEXT,
+        metrics TEXT,
+        created_at TEXT,
+        {generated}
+    )""", keep=user, indexes=["CREATE UNIQUE INDEX IF NOT EXISTS ix_posts_external ON posts__new(user_id, platform, external_id)"] +
+        [f"CREATE INDEX IF NOT EXISTS ix_posts_user_{name} ON posts__new(user_id, {cols}id)" for name, cols in
+         [("id", ""), ("platform", "platform, "), ("created", "created_at, ")] + [(m, f"{m}, ") for m in _POST_METRICS]])
+    rebuild(con, "campaigns", """CREATE TABLE IF NOT EXISTS campaigns__new(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        account_id INTEGER REFERENCES accounts(id) ON DELETE CASCADE,
+        name TEXT,
+        status TEXT,
+        spend REAL, cpa REAL, roas REAL, ctr REAL,
+        impressions INTEGER, clicks INTEGER, conversions INTEGER
+    )""", keep=account, indexes=["CREATE UNIQUE INDEX IF NOT EXISTS ix_campaigns_account_name ON campaigns__new(account_id, name)"])
+    rebuild(con, "campaign_stats", """CREATE TABLE IF NOT EXISTS campaign_stats__new(
+        campaign_id INTEGER NOT NULL REFERENCES campaigns(id) ON DELETE CASCADE,
+        day TEXT NOT NULL,
+        spend REAL, impressions INTEGER, clicks INTEGER, conversions INTEGER, revenue REAL,
+        PRIMARY KEY(campaign_id, day)
+    ) WITHOUT ROWID""", key=("campaign_id", "day"), keep=campaign)
+    rebuild(con, "recommendations", """CREATE TABLE IF NOT EXISTS recommendations__new(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        campaign_id INTEGER NOT NULL REFERENCES campaigns(id) ON DELETE CASCADE,
+        account_id INTEGER REFERENCES accounts(id) ON DELETE CASCADE,
+        kpi TEXT NOT NULL,
+        title TEXT, campaign_name TEXT, severity TEXT,
+        priority_score REAL, evidence TEXT, actions TEXT, expected_impact REAL,
+        created_at TEXT,
+        UNIQUE(campaign_id, kpi)
+    )""", keep=f"{campaign} AND {account}",
+        indexes=["CREATE INDEX IF NOT EXISTS ix_recommendations_priority ON recommendations__new(priority_score DESC)",
+                 "CREATE INDEX IF NOT EXISTS ix_recommendations_account ON recommendations__new(account_id)"])
+    rebuild(con, "campaign_scores", """CREATE TABLE IF NOT EXISTS campaign_scores__new(
+        campaign_id INTEGER PRIMARY KEY REFERENCES campaigns(id) ON DELETE CASCADE,
+        sig INTEGER,
+        scored_at TEXT
+    )""", key=("campaign_id",), keep=campaign)
+    rebuild(con, "import_campaigns", """CREATE TABLE IF NOT EXISTS import_campaigns__new(
+        import_id INTEGER NOT NULL REFERENCES imports(id) ON DELETE CASCADE,
+        campaign_id INTEGER NOT NULL REFERENCES campaigns(id) ON DELETE CASCADE,
+        PRIMARY KEY(import_id, campaign_id)
+    ) WITHOUT ROWID""", key=("import_id", "campaign_id"), keep=f"{campaign} AND EXISTS (SELECT 1 FROM imports WHERE id=src.import_id)",
+        indexes=["CREATE INDEX IF NOT EXISTS ix_import_campaigns_campaign ON import_campaigns__new(campaign_id)"])
+    rebuild(con, "post_metrics", """CREATE TABLE IF NOT EXISTS post_metrics__new(
+        post_id INTEGER NOT NULL REFERENCES posts(id) ON DELETE CASCADE,
+        day TEXT NOT NULL,
+        likes INTEGER, comments INTEGER, plays INTEGER, views INTEGER,
+        PRIMARY KEY(post_id, day)
+    ) WITHOUT ROWID""", key=("post_id", "day"), keep="EXISTS (SELECT 1 FROM posts WHERE id=src.post_id)")
+unify.batched = True
+
+@migration
+def snapshot_upsert(cur):
+    # the posts snapshot triggers used INSERT OR REPLACE, which an upsert on posts (sync) overrides
+    # with its own conflict handling: a second metrics change on the same day failed
+    for t in ("ts_posts_insert", "ts_posts_update"): cur.execute(f"DROP TRIGGER IF EXISTS {t}")
+    cols, vals = ", ".join(_POST_METRICS), ", ".join(f"NEW.{m}" for m in _POST_METRICS)
+    upd = ", ".join(f"{m}=excluded.{m}" for m in _POST_METRICS)
+    snapshot = f"INSERT INTO post_metrics(post_id, day, {cols}) VALUES(NEW.id, date('now'), {vals}) ON CONFLICT(post_id, day) DO UPDATE SET {upd};"
+    cur.execute(f"CREATE TRIGGER ts_posts_insert AFTER INSERT ON posts BEGIN {snapshot} END")
+    cur.execute(f"CREATE TRIGGER ts_posts_update AFTER UPDATE OF metrics ON posts WHEN NEW.metrics IS NOT OLD.metrics BEGIN {snapshot} END")
+
+@migration
+def job_queue(cur):
+    cur.execute("""CREATE TABLE IF NOT EXISTS jobs(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,
+        payload TEXT NOT NULL DEFAULT '{}',
+        key TEXT UNIQUE,
+        user_id INTEGER,
+        priority INTEGER NOT NULL DEFAULT 0,
+        status TEXT NOT NULL DEFAULT 'queued',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        max_attempts INTEGER NOT NULL DEFAULT 5,
+        timeout REAL NOT NULL DEFAULT 300,
+        run_at REAL NOT NULL,
+        owner TEXT, lease_until REAL,
+        result TEXT, error TEXT,
+        created_at REAL NOT NULL, started_at REAL, finished_at REAL,
+        wait_ms REAL, run_ms REAL
+    )""")
+    # claim order, and the leases recovery looks at; both only cover the rows they serve
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_jobs_ready ON jobs(priority DESC, run_at, id) WHERE status='queued'")
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_jobs_lease ON jobs(lease_until) WHERE status='running'")
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_jobs_finished ON jobs(finished_at) WHERE finished_at IS NOT NULL")
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_jobs_kind_status ON jobs(kind, status)")  # stats(): queue depth
+    add_column(cur, "contacts", "notified_at", "TEXT")
+
+@migration
+def import_claims(cur):
+    # the upload running an import holds it under a lease, renewed per chunk (ingest._claim)
+    add_column(cur, "imports", "owner", "TEXT")
+    add_column(cur, "imports", "lease_until", "REAL")
+
+@migration
+def posts_fts_owner(cur):
+    # index the owner with the text so a search filters by user inside FTS5 (a full rebuild:
+    # run it from the release step, not under traffic)
+    if "user_id" in [r[1] for r in cur.execute("PRAGMA table_info(posts_fts)")]: return
+    for t in ("ai", "ad", "au"): cur.execute(f"DROP TRIGGER IF EXISTS posts_fts_{t}")
+    cur.execute("DROP TABLE IF EXISTS posts_fts")
+    _fts(cur, "posts_fts", "posts", ("user_id", "title", "caption"))
+
+# ---------- runner ----------
+def version(con):
+    return con.execute("PRAGMA user_version").fetchone()[0]
+
+def latest():
+    return len(MIGRATIONS)
+
+def _claim(con, v):
+    """Claim batched step v for this process; False while another process is making progress on it."""
+    con.execute("CREATE TABLE IF NOT EXISTS schema_claims(version INTEGER PRIMARY KEY, owner INTEGER, beat REAL)")
+    row = con.execute("SELECT owner, beat FROM schema_claims WHERE version=?", (v,)).fetchone()
+    if row and row[0] != os.getpid() and row[1] > time.time() - LEASE: return False
+    con.execute("INSERT OR REPLACE INTO schema_claims VALUES(?,?,?)", (v, os.getpid(), time.time()))
+    return True
+
+def migrate(path=None, target=None):
+    """Apply pending migrations up to target (default: all). Returns the names applied.
+
+    Uses its own connection with foreign keys off (a rebuild drops and renames
+    parent tables) and legacy_alter_table on (so the rename leaves other
+    tables' triggers and references alone), and checks foreign keys at the end.
+    A batched step runs in one process at a time; others wait for it.
+    """
+    target = latest() if target is None else target
+    applied = []
+    con = connect(path)
+    con.execute("PRAGMA foreign_keys=OFF"); con.execute("PRAGMA legacy_alter_table=ON")
+    try:
+        while True:
+            with _write(con):
+                # re-read under the write lock: another process may have just migrated
+                v = version(con)
+                if v >= target: break
+                step = MIGRATIONS[v]
+                batched = getattr(step, "batched", False)
+                mine = batched and _claim(con, v)
+                if not batched:
+                    step(con.cursor()); con.execute(f"PRAGMA user_version={v + 1}")
+            if batched and not mine:
+                time.sleep(1); continue
+            if batched:
+                step(con)
+                with _write(con):
+                    if version(con) == v: con.execute(f"PRAGMA user_version={v + 1}")
+                    con.execute("DELETE FROM schema_claims WHERE version=?", (v,))
+            applied.append(step.__name__)
+        bad = con.execute("PRAGMA foreign_key_check").fetchall()
+        if bad: raise RuntimeError(f"foreign key violations after migrating: {[tuple(r) for r in bad[:10]]}")
+    finally:
+        con.close()
+    _checked.add((os.getpid(), path or DB_PATH))
+    return applied
+
+_checked = set()
+_lock = threading.Lock()
+
+def ensure(path=None):
+    """Make sure the database is at the latest version; one PRAGMA read per process and database."""
+    key = (os.getpid(), path or DB_PATH)
+    if key in _checked: return
+    with _lock:
+        if key in _checked: return
+        con = db(path)
+        try: v, empty = version(con), not con.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchone()
+        finally: con.close()
+        if v < latest():
+            # a new file has no data to migrate: it is simply created at the latest version
+            if not (AUTO_MIGRATE or empty):
+                raise SchemaOutOfDate(f"database is at schema {v}, code needs {latest()}; run python -m backend.scripts.migrate")
+            migrate(path)
+        _checked.add(key)
@@ -0,0 +1,88 @@
+"""AI answer service against a local mock completion server.
+
+    python -m backend.scripts.bench_ai [--clients 32] [--asks 8] [--questions 5] [--token-ms 20]
+
+The mock streams `--tokens` chunks `--token-ms` apart and counts calls. Clients
+ask a handful of questions in varying case/punctuation through /api/ai/stream
+and /api/ai/ask; the report shows how many upstream calls that cost and how
+soon the first token reached the browser compared with the full answer.
+"""
+import argparse, json, os, random, statistics, tempfile, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class MockCompletions(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    calls = 0; tokens = 40; delay = 0.02
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        MockCompletions.calls += 1
+        q = body["messages"][-1]["content"]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream"); self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i in range(self.tokens):
+            time.sleep(self.delay)
+            self._chunk(f"data: {json.dumps({'choices': [{'delta': {'content': f'{q[:8]}-{i} '}}]})}\n\n")
+        self._chunk("data: [DONE]\n\n"); self.wfile.write(b"0\r\n\r\n")
+
+    def _chunk(self, s):
+        b = s.encode(); self.wfile.write(b"%x\r\n%s\r\n" % (len(b), b)); self.wfile.flush()
+
+    def log_message(self, *a):
+        pass
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    def handle_error(self, request, client_address):
+        pass  # pooled keep-alive connections are simply dropped at exit
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clients", type=int, default=32)
+    ap.add_argument("--asks", type=int, default=8)
+    ap.add_argument("--questions", type=int, default=5)
+    ap.add_argument("--tokens", type=int, default=40)
+    ap.add_argument("--token-ms", type=float, default=20)
+    a = ap.parse_args()
+    MockCompletions.tokens, MockCompletions.delay = a.tokens, a.token_ms / 1000
+    srv = MockServer(("127.0.0.1", 0), MockCompletions)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    with tempfile.TemporaryDirectory() as d:
+        os.environ.update(DB_PATH=os.path.join(d, "bench.db"), OPENAI_API_KEY="test",
+                          OPENAI_BASE_URL=f"http://127.0.0.1:{srv.server_port}/v1")
+        from backend.app import app
+        from backend import ai
+        client = app.test_client()
+        questions = [f"How do I improve ROAS for campaign {i}" for i in range(a.questions)]
+        first, full, lock = [], [], threading.Lock()
+        def worker(n):
+            rnd = random.Random(n)
+            for _ in range(a.asks):
+                q = rnd.choice(questions); q = rnd.choice([q, q.upper(), q + "?", "  " + q.lower() + " !"])
+                t = time.perf_counter()
+                if rnd.random() < 0.5:
+                    r = client.get("/api/ai/stream", query_string={"q": q}, buffered=False)
+                    it = iter(r.response); next(it); ttfb = time.perf_counter() - t
+                    for _ in it: pass
+                else:
+                    assert client.post("/api/ai/ask", json={"q": q}).get_json()["ok"]; ttfb = None
+                with lock:
+                    full.append(time.perf_counter() - t)
+                    if ttfb is not None: first.append(ttfb)
+        t = time.perf_counter()
+        ts = [threading.Thread(target=worker, args=(i,)) for i in range(a.clients)]
+        for th in ts: th.start()
+        for th in ts: th.join()
+        wall = time.perf_counter() - t
+        s = ai.service().stats()
+        asks = a.clients * a.asks
+        print(f"asks {asks}  upstream calls {MockCompletions.calls}  wall {wall:.2f}s")
+        q = lambda xs: statistics.quantiles(xs, n=100)
+        print(f"stream first token p50/p95 {q(first)[49] * 1000:.1f}/{q(first)[94] * 1000:.1f} ms   "
+              f"full answer p50/p95 {q(full)[49] * 1000:.1f}/{q(full)[94] * 1000:.1f} ms")
+        print(json.dumps(s))
+    srv.shutdown()
+
+if __name__ == "__main__":
+    main()
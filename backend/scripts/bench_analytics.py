@@ -0,0 +1,71 @@
+"""Analytics endpoint latency on a synthetic campaign-day dataset.
+
+    python -m backend.scripts.bench_analytics [--rows 1000000] [--campaigns 20000] [--accounts 20]
+
+Writes a CSV export of generated campaign-day rows and loads it into a
+throwaway database through the real import path (so the rollups the frame
+and /api/trends read are built by their triggers), scores recommendations,
+then times the frame load and /api/kpis, /api/trends and /api/insights
+through the app with the response cache off, so each request renders.
+Exits 1 if an endpoint misses its latency target.
+"""
+import argparse, os, random, statistics, tempfile, time
+from datetime import date
+
+TARGETS_MS = {"/api/kpis": 5, "/api/trends": 25, "/api/insights": 10}
+
+def synth(path, rows, campaigns, accounts, seed=7):
+    """campaigns x days rows ending today, campaign c in account c % accounts."""
+    rnd = random.Random(seed)
+    days = max(1, rows // campaigns)
+    start = date.today().toordinal() - days + 1
+    with open(path, "w") as f:
+        f.write("account,name,date,spend,roas,impressions,clicks,conversions\n")
+        for i in range(rows):
+            c, d = i % campaigns, start + i // campaigns
+            spend = rnd.uniform(5, 200); imps = rnd.randint(500, 20000); clicks = int(imps * rnd.uniform(0.003, 0.03))
+            f.write(f"Account {c % accounts},Campaign {c},{date.fromordinal(d).isoformat()},{spend:.2f},"
+                    f"{rnd.uniform(0.3, 3.5):.2f},{imps},{clicks},{int(clicks * 0.02)}\n")
+
+def timeit(fn, n=20):
+    xs = []
+    for _ in range(n):
+        t = time.perf_counter(); fn(); xs.append((time.perf_counter() - t) * 1000)
+    return statistics.median(xs), max(xs)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--campaigns", type=int, default=20_000)
+    ap.add_argument("--accounts", type=int, default=20)
+    a = ap.parse_args()
+    with tempfile.TemporaryDirectory() as d:
+        os.environ.update(DB_PATH=os.path.join(d, "bench.db"), HASH_POOL="0", METRICS="0")
+        from backend import analytics, cache
+        from backend.app import create_app
+        from backend.ingest import import_csv
+        from backend.recommendations import build_recommendations
+        csv_path = os.path.join(d, "export.csv")
+        t = time.perf_counter(); synth(csv_path, a.rows, a.campaigns, a.accounts)
+        print(f"generate   {time.perf_counter() - t:8.2f} s  ({a.rows:,} rows, {a.campaigns:,} campaigns)")
+        app = create_app()
+        stats = import_csv(csv_path)
+        print(f"import     {stats['seconds']:8.2f} s  ({stats['rows_per_sec']:,} rows/s, {stats['skipped']} skipped)")
+        t = time.perf_counter(); build_recommendations()
+        print(f"score      {time.perf_counter() - t:8.2f} s")
+        analytics.invalidate()
+        t = time.perf_counter(); frame = analytics.engine()
+        print(f"frame load {time.perf_counter() - t:8.2f} s  ({frame.rows:,} campaigns)")
+        cache.lru = cache.LRU(0)  # every request renders
+        client = app.test_client()
+        failed = False
+        for path, target in TARGETS_MS.items():
+            r = client.get(path)
+            if r.status_code != 200: print(f"{path:14s} status {r.status_code}"); failed = True; continue
+            med, worst = timeit(lambda: client.get(path))
+            ok = med <= target; failed |= not ok
+            print(f"{path:14s} {med:8.2f} ms median {worst:8.2f} ms max  target {target} ms  {'ok' if ok else 'MISS'}")
+    raise SystemExit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Dashboard load bytes and latency: first visit vs repeat visit.
+
+    python -m backend.scripts.bench_cache [--rows 200000] [--loads 20]
+
+Replays the requests static/app.js makes on page load. A repeat visit behaves
+like a browser with a warm HTTP cache: versioned static assets are not
+requested at all and everything else is revalidated with If-None-Match.
+Runs against a throwaway database.
+"""
+import argparse, os, random, re, statistics, tempfile, time
+from datetime import date
+
+API = ["/api/me", "/health", "/api/kpis", "/api/trends", "/api/insights", "/api/posts"]
+
+def load(client, etags, warm):
+    sent = 0; t = time.perf_counter()
+    html = client.get("/", headers={"If-None-Match": f'"{etags["/"]}"'} if warm and "/" in etags else {})
+    etags["/"] = html.headers.get("ETag", "").strip('"'); sent += len(html.data)
+    if not warm:
+        page = html.data.decode()
+        for src in re.findall(r'"(/static/[^"]+)"', page):
+            sent += len(client.get(src).data)
+    for path in API:
+        h = {"If-None-Match": f'"{etags[path]}"'} if warm and etags.get(path) else {}
+        r = client.get(path, headers=h)
+        etags[path] = (r.headers.get("ETag") or "").strip('"'); sent += len(r.data)
+    return sent, (time.perf_counter() - t) * 1000
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=200_000)
+    ap.add_argument("--loads", type=int, default=20)
+    a = ap.parse_args()
+    with tempfile.TemporaryDirectory() as d:
+        os.environ["DB_PATH"] = os.path.join(d, "bench.db")
+        from backend.app import app, get_db
+        from backend.recommendations import build_recommendations
+        from backend import cache
+        con = get_db(); rnd = random.Random(1); campaigns = max(1, a.rows // 60); today = date.today().toordinal()
+        with con:
+            con.execute("INSERT INTO accounts(id,name) VALUES(1,'Bench')")
+            con.executemany("INSERT INTO campaigns(id,account_id,name,status) VALUES(?,1,?,'active')", ((i, f"Campaign {i}") for i in range(1, campaigns + 1)))
+            con.executemany("INSERT INTO campaign_stats VALUES(?,?,?,?,?,?,?)",
+                            ((i % campaigns + 1, date.fromordinal(today - i // campaigns).isoformat(), rnd.uniform(5, 200),
+                              rnd.randint(500, 20000), rnd.randint(5, 400), rnd.randint(0, 20), rnd.uniform(5, 400)) for i in range(a.rows)))
+            con.execute("UPDATE campaigns SET spend=100, roas=0.5, cpa=40, ctr=1, conversions=3")
+        build_recommendations(con)
+        client = app.test_client(); etags = {}
+        cold = [load(client, {}, False) for _ in range(3)]
+        load(client, etags, False)
+        warm = [load(client, etags, True) for _ in range(a.loads)]
+        cache.invalidate()  # e.g. a sync wrote new data
+        after_write = load(client, etags, True)
+        print(f"first visit   {statistics.mean(b for b, _ in cold):9.0f} bytes  {statistics.median(ms for _, ms in cold):7.1f} ms")
+        print(f"repeat visit  {statistics.mean(b for b, _ in warm):9.0f} bytes  {statistics.median(ms for _, ms in warm):7.1f} ms")
+        print(f"after write   {after_write[0]:9.0f} bytes  {after_write[1]:7.1f} ms")
+        print(f"cache         {cache.lru.stats()}")
+
+if __name__ == "__main__":
+    main()
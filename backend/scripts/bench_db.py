@@ -0,0 +1,54 @@
+"""Requests/sec through the Flask app with pooled vs per-request SQLite connections.
+
+    python -m backend.scripts.bench_db [--threads 8] [--seconds 5]
+
+Each mode runs in a fresh interpreter against a throwaway database so the
+DB_POOL switch is picked up at import time.
+"""
+import argparse, json, os, subprocess, sys, tempfile, threading, time
+
+def run_mode(threads, seconds):
+    from backend.app import app
+    setup = app.test_client()
+    setup.post("/api/register", json={"email": "bench@example.com", "password": "bench"})
+    clients = []
+    for _ in range(threads):
+        c = app.test_client()
+        c.post("/api/login", json={"email": "bench@example.com", "password": "bench"})
+        clients.append(c)
+    counts = [0] * threads
+    stop = time.perf_counter() + seconds
+    def worker(i):
+        c = clients[i]; n = 0
+        while time.perf_counter() < stop:
+            # read-heavy mix: 9 feed reads per write, every request runs load_user
+            if n % 10 == 9: c.post("/api/social/mock_pull")
+            else: c.get("/api/posts")
+            n += 1
+        counts[i] = n
+    ts = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in ts: t.start()
+    for t in ts: t.join()
+    return sum(counts) / seconds
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--threads", type=int, default=8)
+    ap.add_argument("--seconds", type=float, default=5)
+    ap.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    a = ap.parse_args()
+    if a.child:
+        print(json.dumps({"rps": run_mode(a.threads, a.seconds)})); return
+    results = {}
+    for label, pool in (("per-request", "0"), ("pooled", "1")):
+        with tempfile.TemporaryDirectory() as d:
+            env = dict(os.environ, DB_POOL=pool, DB_PATH=os.path.join(d, "bench.db"))
+            out = subprocess.run([sys.executable, "-m", "backend.scripts.bench_db", "--child",
+                                  "--threads", str(a.threads), "--seconds", str(a.seconds)],
+                                 env=env, capture_output=True, text=True, check=True).stdout
+            results[label] = json.loads(out.strip().splitlines()[-1])["rps"]
+        print(f"{label:12s} {results[label]:8.1f} req/s")
+    print(f"speedup      {results['pooled'] / results['per-request']:8.2f}x")
+
+if __name__ == "__main__":
+    main()
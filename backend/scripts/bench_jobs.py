@@ -0,0 +1,54 @@
+"""Job queue throughput by worker count.
+
+    python -m backend.scripts.bench_jobs [--jobs 2000] [--workers 1,2,4,8] [--io-ms 20]
+
+Runs against a throwaway database. Enqueues --jobs jobs one transaction each
+(the way request handlers do), then times a Pool of each size draining them,
+the same way `backend.scripts.worker --workers N` would. Two kinds of job:
+`noop` returns at once, so it measures the queue's own cost per job (claim +
+finish, two write transactions); `io` sleeps --io-ms, like a handler waiting
+on an upstream API, so it shows how far more threads help.
+"""
+import argparse, os, statistics, tempfile, time
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--jobs", type=int, default=2000)
+    ap.add_argument("--workers", default="1,2,4,8")
+    ap.add_argument("--io-ms", type=float, default=20)
+    a = ap.parse_args()
+    d = tempfile.mkdtemp()
+    os.environ.update(DB_PATH=os.path.join(d, "jobs.db"), HASH_POOL="0", METRICS="0", JOBS_POLL="0.05")
+    from backend import jobs
+    from backend.core import get_db
+    from backend.store import db, transaction
+
+    @jobs.handler("bench.noop")
+    def noop(p): return None
+
+    @jobs.handler("bench.io")
+    def io(p): time.sleep(a.io_ms / 1000)
+
+    get_db().close()
+    print(f"{a.jobs} jobs per run, io jobs sleep {a.io_ms:g} ms, {os.cpu_count()} CPUs")
+    print(f"{'kind':>6s}{'workers':>9s}{'enqueue/s':>11s}{'jobs/s':>9s}{'wait p50':>10s}{'wait p95':>10s}{'run p50':>9s}")
+    for kind in ("noop", "io"):
+        n = a.jobs if kind == "noop" else min(a.jobs, 500)
+        for w in [int(x) for x in a.workers.split(",")]:
+            with transaction() as con: con.execute("DELETE FROM jobs")
+            t = time.perf_counter()
+            for i in range(n): jobs.enqueue(f"bench.{kind}", {"i": i})
+            enq = n / (time.perf_counter() - t)
+            pool = jobs.Pool(w, kinds=[f"bench.{kind}"], periodic=False)
+            t = time.perf_counter(); pool.start()
+            while sum(pool.stats.values()) < n: time.sleep(0.005)
+            secs = time.perf_counter() - t; pool.stop()
+            con = db()
+            rows = con.execute("SELECT wait_ms, run_ms FROM jobs WHERE status='done'").fetchall(); con.close()
+            assert len(rows) == n, f"{len(rows)} of {n} jobs done"
+            waits, runs = sorted(r[0] for r in rows), [r[1] for r in rows]
+            print(f"{kind:>6s}{w:>9d}{enq:>11.0f}{n / secs:>9.0f}{statistics.median(waits):>10.0f}"
+                  f"{waits[int(n * 0.95)]:>10.0f}{statistics.median(runs):>9.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""p99 /health latency during a login storm, bcrypt inline vs in the hash pool.
+
+    python -m backend.scripts.bench_login [--storm 32] [--seconds 10] [--rounds 12]
+
+Each mode starts gunicorn the way the Procfile does on a throwaway database,
+hammers /api/login from `--storm` threads and samples /health meanwhile.
+"""
+import argparse, os, socket, statistics, subprocess, sys, tempfile, threading, time
+import requests
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0)); return s.getsockname()[1]
+
+def run(mode_env, a):
+    with tempfile.TemporaryDirectory() as d:
+        port = free_port()
+        env = dict(os.environ, DB_PATH=os.path.join(d, "bench.db"), BCRYPT_LOG_ROUNDS=str(a.rounds), **mode_env)
+        proc = subprocess.Popen([sys.executable, "-m", "gunicorn", "backend.app:app", "--preload", f"--workers={a.workers}",
+                                 f"--threads={a.threads}", f"--bind=127.0.0.1:{port}", "--log-level=warning"], env=env)
+        base = f"http://127.0.0.1:{port}"
+        try:
+            for _ in range(100):
+                try: requests.get(base + "/health", timeout=1); break
+                except requests.ConnectionError: time.sleep(0.1)
+            requests.post(base + "/api/register", json={"email": "storm@example.com", "password": "pw"}, timeout=60)
+            stop = time.perf_counter() + a.seconds
+            codes, health = {}, []
+            lock = threading.Lock()
+            def storm():
+                s = requests.Session()
+                while time.perf_counter() < stop:
+                    try: c = s.post(base + "/api/login", json={"email": "storm@example.com", "password": "pw"}, timeout=60).status_code
+                    except requests.RequestException: c = "error"
+                    with lock: codes[c] = codes.get(c, 0) + 1
+            def probe():
+                s = requests.Session()
+                while time.perf_counter() < stop:
+                    t = time.perf_counter()
+                    try: s.get(base + "/health", timeout=60)
+                    except requests.RequestException: pass
+                    health.append((time.perf_counter() - t) * 1000); time.sleep(0.02)
+            ts = [threading.Thread(target=storm) for _ in range(a.storm)] + [threading.Thread(target=probe)]
+            for t in ts: t.start()
+            for t in ts: t.join()
+        finally:
+            proc.terminate(); proc.wait()
+        q = statistics.quantiles(health, n=100) if len(health) > 1 else [health[0]] * 99
+        return {"health_p50_ms": round(q[49], 1), "health_p99_ms": round(q[98], 1), "logins": codes}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--storm", type=int, default=32)
+    ap.add_argument("--seconds", type=float, default=10)
+    ap.add_argument("--rounds", type=int, default=12)
+    ap.add_argument("--workers", type=int, default=2)
+    ap.add_argument("--threads", type=int, default=4)
+    a = ap.parse_args()
+    for label, env in (("inline", {"HASH_POOL": "0"}), ("pool", {"HASH_POOL": "1"})):
+        print(f"{label:7s}", run(env, a))
+
+if __name__ == "__main__":
+    main()
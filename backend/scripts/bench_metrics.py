@@ -0,0 +1,67 @@
+"""Instrumentation overhead.
+
+    python -m backend.scripts.bench_metrics [--requests 300] [--rounds 40]
+
+Runs the same request mix through the Flask test client in three long-lived
+processes: METRICS=0, METRICS=1, and METRICS=1 plus the slow-request profiler
+(PROFILE_SLOW_MS set high enough that nothing is written, so only the
+sampling is measured). The mix covers /health, /api/me, /api/kpis, a feed
+page and a search over a seeded throwaway database. The processes take turns
+for --rounds short rounds. The box's speed drifts by more than the effect
+being measured, so each round's instrumented runs are compared with that
+round's uninstrumented run and the median of those ratios is reported.
+Target: under 2% overhead.
+"""
+import argparse, json, os, random, statistics, subprocess, sys, tempfile, time
+
+CONFIGS = {"off": {"METRICS": "0"}, "metrics": {"METRICS": "1"},
+           "metrics+profiler": {"METRICS": "1", "PROFILE_SLOW_MS": "60000"}}
+MIX = ["/health", "/api/me", "/api/kpis", "/api/posts?limit=20", "/api/search?q=spring"]
+
+def child(a):
+    from backend.app import app, get_db
+    con = get_db(); rnd = random.Random(3); words = ["spring", "drop", "launch", "sale", "summer", "collab", "review", "unboxing"]
+    with con:
+        con.execute("INSERT OR IGNORE INTO users(id,email,password_hash,created_at) VALUES(1,'bench@example.com','x','now')")
+        if not con.execute("SELECT 1 FROM posts LIMIT 1").fetchone():
+            con.executemany("INSERT INTO posts(user_id,platform,title,caption,metrics,created_at) VALUES(1,'TikTok',?,?,'{}',?)",
+                            ((" ".join(rnd.choices(words, k=3)), " ".join(rnd.choices(words, k=12)), f"2024-01-01T00:{i % 60:02d}:{i % 59:02d}")
+                             for i in range(a.posts)))
+    client = app.test_client()
+    with client.session_transaction() as s: s["_user_id"] = "1"
+    for path in MIX * 20: assert client.get(path).status_code == 200, path
+    print("ready", flush=True)
+    for _ in sys.stdin:  # one round per line from the parent
+        t = time.process_time()  # whole-process CPU, so the sampler thread counts and other load on the box doesn't
+        for i in range(a.requests): client.get(MIX[i % len(MIX)])
+        print(json.dumps({"us": (time.process_time() - t) / a.requests * 1e6}), flush=True)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=300)
+    ap.add_argument("--rounds", type=int, default=40)
+    ap.add_argument("--posts", type=int, default=5000)
+    ap.add_argument("--child", action="store_true")
+    a = ap.parse_args()
+    if a.child: return child(a)
+    results = {name: [] for name in CONFIGS}
+    with tempfile.TemporaryDirectory() as d:
+        procs = {}
+        for name, env in CONFIGS.items():
+            env = dict(os.environ, DB_PATH=os.path.join(d, "bench.db"), METRICS_DIR="", **env)
+            procs[name] = p = subprocess.Popen([sys.executable, "-m", "backend.scripts.bench_metrics", "--child", f"--requests={a.requests}", f"--posts={a.posts}"],
+                                               env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+            assert p.stdout.readline().strip() == "ready"
+        for _ in range(a.rounds):
+            for name, p in procs.items():
+                p.stdin.write("go\n"); p.stdin.flush()
+                results[name].append(json.loads(p.stdout.readline()))
+        for p in procs.values(): p.stdin.close(); p.wait()
+    print(f"{'config':18s} {'req/s':>8s} {'us/req':>8s} {'overhead':>9s}")
+    for name, rs in results.items():
+        us = statistics.median(r["us"] for r in rs)
+        ratio = statistics.median(r["us"] / off["us"] for r, off in zip(rs, results["off"]))
+        print(f"{name:18s} {1e6 / us:8.0f} {us:8.0f} {(ratio - 1) * 100:8.2f}%")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Posts feed page latency for one user with a large history.
+
+    python -m backend.scripts.bench_posts [--posts 1000000] [--pages 20]
+
+Seeds a throwaway database, then walks `--pages` pages deep through
+/api/posts for each sort and filter, reporting first/deep page latency and
+the query plan the feed query uses.
+"""
+import argparse, json, os, random, statistics, tempfile, time
+from datetime import datetime, timedelta
+
+CASES = [("recent", {}), ("likes", {"sort": "likes"}), ("plays", {"sort": "plays"}), ("views", {"sort": "views"}),
+         ("tiktok", {"platform": "tiktok"}), ("tiktok+plays", {"platform": "tiktok", "sort": "plays"}),
+         ("last 30d", {"since": None})]
+
+def seed(con, n, uid=1):
+    rnd = random.Random(1); start = datetime(2019, 1, 1); step = (datetime(2025, 1, 1) - start) / n
+    plats = ["Instagram", "TikTok", "YouTube"]
+    def rows():
+        for i in range(n):
+            p = plats[i % 3]
+            m = {"likes": rnd.randint(0, 50000), "comments": rnd.randint(0, 900)}
+            if p == "TikTok": m["plays"] = rnd.randint(0, 2_000_000)
+            if p == "YouTube": m["views"] = rnd.randint(0, 500_000)
+            yield uid, p, f"ext{i}", f"Post {i}", "caption", json.dumps(m), (start + step * i).isoformat()
+    with con:
+        con.execute("INSERT INTO users(id,email,password_hash,created_at) VALUES(?,?,'x','now')", (uid, "feed@example.com"))
+        con.executemany("INSERT INTO posts(user_id,platform,external_id,title,caption,metrics,created_at) VALUES(?,?,?,?,?,?,?)", rows())
+    con.execute("ANALYZE")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--posts", type=int, default=1_000_000)
+    ap.add_argument("--pages", type=int, default=20)
+    ap.add_argument("--limit", type=int, default=50)
+    a = ap.parse_args()
+    with tempfile.TemporaryDirectory() as d:
+        os.environ["DB_PATH"] = os.path.join(d, "bench.db")
+        from backend.app import app, get_db
+        from backend import feed
+        con = get_db()
+        t = time.perf_counter(); seed(con, a.posts)
+        print(f"seeded {a.posts} posts in {time.perf_counter() - t:.1f}s")
+        client = app.test_client()
+        with client.session_transaction() as s: s["_user_id"] = "1"
+        last = con.execute("SELECT MAX(created_at) FROM posts").fetchone()[0]
+        since = (datetime.fromisoformat(last) - timedelta(days=30)).isoformat()
+        print(f"{'case':14s} {'page1 ms':>9s} {'deep ms':>9s} {'p50 ms':>8s}  plan")
+        for label, q in CASES:
+            q = dict(q, limit=a.limit, **({"since": since} if "since" in q else {}))
+            times, cursor, seen = [], None, set()
+            for _ in range(a.pages):
+                t = time.perf_counter()
+                body = client.get("/api/posts", query_string=dict(q, **({"cursor": cursor} if cursor else {}))).get_json()
+                times.append((time.perf_counter() - t) * 1000)
+                ids = [p["id"] for p in body["posts"]]
+                assert not seen.intersection(ids), "page overlap"
+                seen.update(ids); cursor = body["next_cursor"]
+                if not cursor: break
+            plan = plan_of(con, feed, q)
+            print(f"{label:14s} {times[0]:9.2f} {times[-1]:9.2f} {statistics.median(times):8.2f}  {plan}")
+
+def plan_of(con, feed, q):
+    sql, args = feed.query(1, platforms=[q["platform"]] if "platform" in q else None, since=q.get("since"),
+                           sort=q.get("sort", "recent"), limit=q["limit"])
+    return "; ".join(r[3] for r in con.execute("EXPLAIN QUERY PLAN " + sql, args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Full and incremental recommendation refresh on a synthetic account set.
+
+    python -m backend.scripts.bench_recommendations [--campaigns 200000] [--accounts 200] [--changed 0.01]
+
+Runs against a throwaway database: a cold build scores everything, then a
+fraction of campaigns is perturbed and the refresh re-scores only those.
+"""
+import argparse, os, random, resource, tempfile, time
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--campaigns", type=int, default=200_000)
+    ap.add_argument("--accounts", type=int, default=200)
+    ap.add_argument("--changed", type=float, default=0.01)
+    a = ap.parse_args()
+    with tempfile.TemporaryDirectory() as d:
+        os.environ["DB_PATH"] = os.path.join(d, "bench.db")
+        from backend.core import get_db
+        from backend.recommendations import build_recommendations, top_insights
+        con = get_db(); rnd = random.Random(3)
+        with con:
+            con.executemany("INSERT INTO accounts(name,platform,target_roas) VALUES(?,?,?)",
+                            ((f"Account {i}", "Meta", 1.0) for i in range(a.accounts)))
+            def mk(i):
+                spend = rnd.uniform(100, 2000); roas = rnd.uniform(0.3, 3.5); cpa = rnd.uniform(10, 120)
+                ctr = rnd.gauss(1.2, 0.4); imps = rnd.randint(5000, 200000); clicks = int(imps * max(ctr, 0.05) / 100)
+                return (i % a.accounts + 1, f"Campaign {i}", "active", spend, cpa, roas, ctr, imps, clicks, int(spend / cpa))
+            con.executemany("""INSERT INTO campaigns(account_id,name,status,spend,cpa,roas,ctr,impressions,clicks,conversions)
+                               VALUES(?,?,?,?,?,?,?,?,?,?)""", (mk(i) for i in range(a.campaigns)))
+        t = time.perf_counter(); r = build_recommendations(con)
+        print(f"cold build     {time.perf_counter() - t:7.2f} s  {r}")
+        n = int(a.campaigns * a.changed)
+        with con:
+            con.executemany("UPDATE campaigns SET roas=roas*0.5 WHERE id=?", ((rnd.randint(1, a.campaigns),) for _ in range(n)))
+        t = time.perf_counter(); r = build_recommendations(con)
+        print(f"incremental    {time.perf_counter() - t:7.2f} s  {r}")
+        t = time.perf_counter()
+        for _ in range(100): top_insights(con, limit=10)
+        print(f"top-10 read    {(time.perf_counter() - t) * 10:7.2f} ms")
+        print(f"peak RSS       {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:7.1f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+"""Load test of every API route, compared against a stored baseline.
+
+    python -m backend.scripts.bench_routes [--scale small] [--clients 8] [--seconds 6] [--rounds 3] [--routes posts,login]
+                                           [--out bench_routes.json] [--baseline PATH] [--threshold 0.35] [--save-baseline]
+
+Seeds a throwaway database with mock_data --scale, starts a local stub for
+the OpenAI completions and OAuth token endpoints (OPENAI_BASE_URL,
+OAUTH_TOKEN_URL; --upstream-ms of latency each), and runs gunicorn on it
+with gunicorn.conf.py. Job workers are off, so /api/social/sync and the
+import rebuild only enqueue, as the web tier does in production.
+
+Each route in ROUTES gets --clients concurrent clients for --seconds, split
+over --rounds interleaved passes whose medians are reported. Each client is
+logged in as a different seeded user; anonymous routes use a fresh session.
+Per route it records throughput, p50/p95/p99 latency of the expected
+responses, 429 rejections (bcrypt back-pressure; the client backs off
+100 ms), other failures, SQL statements per request (from the Server-Timing
+header) and the web workers' RSS afterwards. A table goes to stdout, the
+full results as JSON to --out. Routes the app serves but ROUTES doesn't
+cover are listed.
+
+With a baseline (default data/benchmarks/routes-<scale>.json) each route is
+compared: throughput down or p95 up by more than --threshold (and by more
+than --min-ms, on at least --min-samples requests), more SQL per request,
+or new errors count as regressions and exit 1. --save-baseline writes the run as the new baseline. Baselines
+are only comparable on the same hardware and settings; meta records both.
+"""
+import argparse, json, os, platform, re, socket, sqlite3, statistics, subprocess, sys, tempfile, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from datetime import date, timedelta
+import requests
+from backend.store import ROOT
+
+BASELINES = os.path.join(ROOT, "data", "benchmarks")
+WORDS = ("spring", "launch", "review", "haul", "tutorial", "pricing")
+
+# ---------- stub upstreams ----------
+class Upstream(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    delay, tokens, calls = 0.05, 20, {}
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        Upstream.calls[self.path] = Upstream.calls.get(self.path, 0) + 1
+        time.sleep(self.delay)
+        if self.path.endswith("/chat/completions"):
+            q = json.loads(body)["messages"][-1]["content"][:12]
+            out = "".join(f"data: {json.dumps({'choices': [{'delta': {'content': f'{q}-{i} '}}]})}\n\n" for i in range(self.tokens))
+            return self._send(200, (out + "data: [DONE]\n\n").encode(), "text/event-stream")
+        self._send(200, json.dumps({"access_token": f"acc-{time.time_ns()}", "refresh_token": "ref", "expires_in": 3600}).encode())
+
+    def _send(self, code, data, ctype="application/json"):
+        self.send_response(code); self.send_header("Content-Type", ctype); self.send_header("Content-Length", str(len(data)))
+        self.end_headers(); self.wfile.write(data)
+
+    def log_message(self, *a):
+        pass
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    def handle_error(self, request, client_address):
+        pass
+
+# ---------- routes ----------
+def csv_body(c, i):
+    day = (date(2024, 1, 1) + timedelta(days=i)).isoformat()
+    rows = "".join(f"Bench import {c['n']}-{n},active,{100 + n},{20 + n % 7},{1 + n % 3}.5,1.2,{5000 + n},{60 + n},{3 + n % 5},{day}\n"
+                   for n in range(50))
+    data = ("name,status,spend,cpa,roas,ctr,impressions,clicks,conversions,date\n" + rows).encode()
+    # campaigns per client and a day per request: every upload is a new file (fingerprint) with new rows
+    return {"data": {"account": f"Bench import {c['n']}"}, "files": {"file": ("c.csv", data, "text/csv")}}
+
+# (name, method, url rule, session, request builder (client, i) -> (path, requests kwargs), expected statuses)
+ROUTES = [
+    ("home", "GET", "/", "anon", lambda c, i: ("/", {}), (200,)),
+    ("health", "GET", "/health", "anon", lambda c, i: ("/health", {}), (200,)),
+    ("metrics", "GET", "/metrics", "anon", lambda c, i: ("/metrics", {}), (200,)),
+    ("me", "GET", "/api/me", "user", lambda c, i: ("/api/me", {}), (200,)),
+    ("login", "POST", "/api/login", "anon", lambda c, i: ("/api/login", {"json": {"email": c["email"], "password": c["password"]}}), (200,)),
+    ("register", "POST", "/api/register", "anon",
+     lambda c, i: ("/api/register", {"json": {"email": f"new-{c['run']}-{c['n']}-{i}@bench.example", "password": "pw-123456"}}), (200,)),
+    ("logout", "POST", "/api/logout", "anon", lambda c, i: ("/api/logout", {}), (200,)),
+    ("kpis", "GET", "/api/kpis", "user", lambda c, i: ("/api/kpis", {}), (200,)),
+    ("trends", "GET", "/api/trends", "user", lambda c, i: ("/api/trends", {}), (200,)),
+    ("insights", "GET", "/api/insights", "user", lambda c, i: ("/api/insights", {}), (200,)),
+    ("cache_stats", "GET", "/api/cache/stats", "user", lambda c, i: ("/api/cache/stats", {}), (200,)),
+    ("import", "POST", "/api/campaigns/import", "user", lambda c, i: ("/api/campaigns/import", csv_body(c, i)), (200,)),
+    ("playbook", "POST", "/api/playbook", "user", lambda c, i: ("/api/playbook", {"json": {"days": 7}}), (200,)),
+    ("search", "GET", "/api/search", "user", lambda c, i: (f"/api/search?q={WORDS[i % len(WORDS)]}", {}), (200,)),
+    ("search_contacts", "GET", "/api/search", "user", lambda c, i: ("/api/search?q=pricing&types=contacts", {}), (200,)),
+    ("oauth_start", "GET", "/api/oauth/<platform>", "user", lambda c, i: ("/api/oauth/tiktok", {}), (200,)),
+    ("oauth_callback", "GET", "/oauth/callback/<platform>", "user",
+     lambda c, i: (f"/oauth/callback/{('tiktok', 'youtube', 'linkedin')[i % 3]}?code=c{i}", {"allow_redirects": False}), (302,)),
+    ("connections", "GET", "/api/social/connections", "user", lambda c, i: ("/api/social/connections", {}), (200,)),
+    ("posts", "GET", "/api/posts", "user", lambda c, i: ("/api/posts", {}), (200,)),
+    ("posts_filtered", "GET", "/api/posts", "user", lambda c, i: ("/api/posts?sort=likes&platform=tiktok,instagram,youtube&limit=20", {}), (200,)),
+    ("posts_page", "GET", "/api/posts", "user", lambda c, i: (f"/api/posts?cursor={c['cursor']}", {}), (200,)),
+    ("post_metrics", "GET", "/api/posts/<int:post_id>/metrics", "user", lambda c, i: (f"/api/posts/{c['post']}/metrics", {}), (200,)),
+    ("mock_pull", "POST", "/api/social/mock_pull", "user", lambda c, i: ("/api/social/mock_pull", {}), (200,)),
+    ("sync", "POST", "/api/social/sync", "user", lambda c, i: ("/api/social/sync", {}), (202,)),
+    ("job", "GET", "/api/jobs/<int:job_id>", "user", lambda c, i: (f"/api/jobs/{c['job']}", {}), (200,)),
+    ("job_stats", "GET", "/api/jobs/stats", "user", lambda c, i: ("/api/jobs/stats", {}), (200,)),
+    ("ai_ask", "POST", "/api/ai/ask", "user", lambda c, i: ("/api/ai/ask", {"json": {"q": f"how to lift roas {c['n']} {i}"}}), (200,)),
+    ("ai_stream", "GET", "/api/ai/stream", "user", lambda c, i: (f"/api/ai/stream?q=best+hook+{c['n']}+{i}", {}), (200,)),
+    ("ai_stats", "GET", "/api/ai/stats", "user", lambda c, i: ("/api/ai/stats", {}), (200,)),
+    ("contact", "POST", "/api/contact", "anon", lambda c, i: ("/api/contact", {"json": {"name": "Bench", "email": "b@x.com", "message": f"hi {i}"}}), (200,)),
+]
+SQL = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries"')
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0)); return s.getsockname()[1]
+
+def rss_mb(master):
+    """Resident memory of each web worker (children of the gunicorn master), in MB."""
+    out = []
+    for tid in os.listdir(f"/proc/{master}/task"):
+        with open(f"/proc/{master}/task/{tid}/children") as f:
+            for pid in f.read().split():
+                try:
+                    with open(f"/proc/{pid}/status") as s: out += [int(l.split()[1]) / 1024 for l in s if l.startswith("VmRSS:")]
+                except FileNotFoundError: pass
+    return out
+
+def pct(xs, q):
+    return round(xs[min(len(xs) - 1, int(len(xs) * q))] * 1000, 2) if xs else None
+
+def clients(base, a, users):
+    """One logged-in session per client, with a post, a feed cursor and a job of its own."""
+    out = []
+    for n in range(a.clients):
+        uid = 1 + n % users
+        c = {"n": n, "run": os.getpid(), "email": f"user{uid}@bench.example", "password": a.password,
+             "user": requests.Session(), "anon": requests.Session()}
+        for _ in range(50):
+            r = c["user"].post(base + "/api/login", json={"email": c["email"], "password": c["password"]})
+            if r.status_code != 429: break
+            time.sleep(0.2)
+        assert r.status_code == 200, f"login as {c['email']}: {r.status_code} {r.text[:200]}"
+        feed = c["user"].get(base + "/api/posts?limit=5").json()
+        c["post"], c["cursor"] = feed["posts"][0]["id"], feed["next_cursor"]
+        c["job"] = c["user"].post(base + "/api/social/sync").json()["job"]
+        out.append(c)
+    return out
+
+def drive(base, route, cs, seconds):
+    name, method, rule, who, build, expect = route
+    lat, sql, statuses, lock = [], [], {}, threading.Lock()
+    stop = time.perf_counter() + seconds
+    def client(c):
+        s, i = c[who], 0
+        while time.perf_counter() < stop:
+            path, kw = build(c, i); i += 1
+            t = time.perf_counter()
+            try:
+                r = s.request(method, base + path, timeout=60, **kw); r.content
+                code, m = r.status_code, SQL.search(r.headers.get("Server-Timing", ""))
+            except requests.RequestException:
+                code, m = "conn", None
+            secs = time.perf_counter() - t
+            with lock:
+                statuses[str(code)] = statuses.get(str(code), 0) + 1
+                if code in expect: lat.append(secs); sql.append(int(m.group(1)) if m else 0)
+            if code == 429: time.sleep(0.1)  # back-pressure (bcrypt pool full): back off like a client would
+    ts = [threading.Thread(target=client, args=(c,)) for c in cs]
+    t = time.perf_counter()
+    for th in ts: th.start()
+    for th in ts: th.join()
+    wall = time.perf_counter() - t
+    lat.sort()
+    n, rejected = sum(statuses.values()), statuses.get("429", 0)
+    return {"requests": n, "rps": round(len(lat) / wall, 1), "p50_ms": pct(lat, 0.5), "p95_ms": pct(lat, 0.95), "p99_ms": pct(lat, 0.99),
+            "max_ms": pct(lat, 1), "rejected": rejected, "errors": n - len(lat) - rejected, "statuses": statuses,
+            "sql_per_req": round(statistics.mean(sql), 2) if sql else None}
+
+def merge(rounds):
+    """One route's rounds: medians of rates and percentiles, totals of counts."""
+    med = lambda k: statistics.median(r[k] for r in rounds) if all(r[k] is not None for r in rounds) else None
+    statuses = {}
+    for r in rounds:
+        for k, v in r["statuses"].items(): statuses[k] = statuses.get(k, 0) + v
+    return {"rounds": len(rounds), "requests": sum(r["requests"] for r in rounds), **{k: med(k) for k in ("rps", "p50_ms", "p95_ms", "p99_ms")},
+            "max_ms": max((r["max_ms"] for r in rounds if r["max_ms"] is not None), default=None),
+            "rejected": sum(r["rejected"] for r in rounds), "errors": sum(r["errors"] for r in rounds), "statuses": statuses,
+            "sql_per_req": med("sql_per_req"), "rss_mb": rounds[-1]["rss_mb"]}
+
+def ok(r):
+    return r["requests"] - r["rejected"] - r["errors"]
+
+def compare(cur, base, a):
+    """(route, metric, baseline, current) for every regression past the thresholds."""
+    out = []
+    for name, r in cur["routes"].items():
+        b = base["routes"].get(name)
+        if not b: continue
+        if r["errors"] and not b["errors"]: out.append((name, "errors", 0, r["errors"]))
+        if b["sql_per_req"] is not None and r["sql_per_req"] is not None and r["sql_per_req"] > b["sql_per_req"] + 0.5:
+            out.append((name, "sql_per_req", b["sql_per_req"], r["sql_per_req"]))
+        # a handful of bcrypt-bound logins say nothing about their rate
+        if min(ok(b), ok(r)) < a.min_samples: continue
+        if b["rps"] and r["rps"] < b["rps"] * (1 - a.threshold): out.append((name, "rps", b["rps"], r["rps"]))
+        if b["p95_ms"] and r["p95_ms"] and r["p95_ms"] > b["p95_ms"] * (1 + a.threshold) and r["p95_ms"] - b["p95_ms"] > a.min_ms:
+            out.append((name, "p95_ms", b["p95_ms"], r["p95_ms"]))
+    rb, rc = base["meta"]["peak_rss_mb"], cur["meta"]["peak_rss_mb"]
+    if rc > rb * (1 + a.threshold): out.append(("(server)", "peak_rss_mb", rb, rc))
+    return out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--scale", default="small", help="mock_data scale: small, medium or large")
+    ap.add_argument("--clients", type=int, default=8, help="concurrent clients per route")
+    ap.add_argument("--seconds", type=float, default=6, help="per route, split over the rounds")
+    ap.add_argument("--rounds", type=int, default=3, help="passes over the routes; each route reports the median")
+    ap.add_argument("--routes", help="comma-separated route names (default: all)")
+    ap.add_argument("--workers", type=int, default=2, help="gunicorn worker processes")
+    ap.add_argument("--upstream-ms", type=float, default=50, help="stub OpenAI/OAuth latency")
+    ap.add_argument("--password", default="bench-pass-1")
+    ap.add_argument("--out", default="bench_routes.json")
+    ap.add_argument("--baseline", help="default: data/benchmarks/routes-<scale>.json")
+    ap.add_argument("--threshold", type=float, default=0.35, help="allowed fractional drop in rps / rise in p95 and RSS")
+    ap.add_argument("--min-ms", type=float, default=2, help="ignore p95 rises smaller than this")
+    ap.add_argument("--min-samples", type=int, default=30, help="compare rps and p95 only for routes with this many successes")
+    ap.add_argument("--save-baseline", action="store_true")
+    a = ap.parse_args()
+    routes = [r for r in ROUTES if not a.routes or r[0] in a.routes.split(",")]
+    baseline = a.baseline or os.path.join(BASELINES, f"routes-{a.scale}.json")
+    Upstream.delay = a.upstream_ms / 1000
+    stub = StubServer(("127.0.0.1", 0), Upstream)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    upstream = f"http://127.0.0.1:{stub.server_port}"
+    with tempfile.TemporaryDirectory() as d:
+        env = dict(os.environ, DB_PATH=os.path.join(d, "bench.db"), WEB_CONCURRENCY=str(a.workers), JOBS_EMBEDDED="0",
+                   OPENAI_BASE_URL=upstream + "/v1", OPENAI_API_KEY="test", OAUTH_TOKEN_URL=upstream + "/oauth/token",
+                   METRICS="1", METRICS_DIR=os.path.join(d, "metrics"), SECRET_KEY="bench")
+        os.mkdir(env["METRICS_DIR"]); t = time.perf_counter()
+        seeded = json.loads(subprocess.run([sys.executable, "-m", "backend.scripts.mock_data", f"--scale={a.scale}", f"--password={a.password}"],
+                                           env=env, check=True, capture_output=True, text=True).stdout.splitlines()[-1])
+        print(f"seeded {a.scale} in {time.perf_counter() - t:.1f} s: {json.dumps(seeded)}", flush=True)
+        served = set(rules(env))
+        port = free_port(); base = f"http://127.0.0.1:{port}"
+        log = open(os.path.join(d, "gunicorn.log"), "w+")
+        proc = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", f"--bind=127.0.0.1:{port}",
+                                 "--log-level=warning", "--timeout=300"], env=env, stderr=log, cwd=ROOT)
+        results, peak = {}, 0
+        try:
+            for _ in range(200):
+                try: requests.get(base + "/health", timeout=1); break
+                except requests.ConnectionError: time.sleep(0.1)
+            cs = clients(base, a, seeded["users"])
+            print(f"{'route':>16s}{'rps':>9s}{'p50 ms':>9s}{'p95 ms':>9s}{'p99 ms':>9s}{'sql/req':>9s}{'429s':>7s}{'errors':>8s}{'rss MB':>8s}", flush=True)
+            runs = {}
+            # rounds interleave the routes, so a slow patch of the machine hits all of them alike
+            for _ in range(a.rounds):
+                for route in routes:
+                    r = drive(base, route, cs, a.seconds / a.rounds)
+                    rss = rss_mb(proc.pid); r["rss_mb"] = round(max(rss), 1) if rss else None; peak = max(peak, r["rss_mb"] or 0)
+                    runs.setdefault(route[0], []).append(r)
+            for route in routes:
+                r = results[route[0]] = merge(runs[route[0]])
+                print(f"{route[0]:>16s}{r['rps']:>9}{r['p50_ms']!s:>9s}{r['p95_ms']!s:>9s}{r['p99_ms']!s:>9s}{r['sql_per_req']!s:>9s}"
+                      f"{r['rejected']:>7}{r['errors']:>8}{r['rss_mb']!s:>8s}", flush=True)
+        finally:
+            proc.terminate(); proc.wait()
+            if any(r["errors"] for r in results.values()):
+                log.seek(0); print(log.read()[-3000:], file=sys.stderr)
+            log.close()
+    uncovered = sorted(served - {r[2] for r in ROUTES})
+    doc = {"meta": {"scale": a.scale, "seeded": seeded, "clients": a.clients, "seconds": a.seconds, "rounds": a.rounds, "workers": a.workers,
+                    "upstream_ms": a.upstream_ms, "cpus": os.cpu_count(), "python": platform.python_version(),
+                    "sqlite": sqlite3.sqlite_version, "commit": git_commit(), "at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                    "peak_rss_mb": peak, "upstream_calls": dict(Upstream.calls)},
+           "routes": results, "uncovered": uncovered}
+    stub.shutdown()
+    if uncovered: print(f"routes not benchmarked: {', '.join(uncovered)}")
+    with open(a.out, "w") as f: json.dump(doc, f, indent=1)
+    print(f"results: {a.out}")
+    if a.save_baseline:
+        os.makedirs(os.path.dirname(baseline), exist_ok=True)
+        with open(baseline, "w") as f: json.dump(doc, f, indent=1)
+        print(f"baseline saved: {baseline}"); return
+    if not os.path.exists(baseline):
+        print(f"no baseline at {baseline}; run with --save-baseline to create it"); return
+    with open(baseline) as f: base = json.load(f)
+    for k in ("scale", "clients", "seconds", "rounds", "workers", "upstream_ms", "cpus"):
+        if base["meta"].get(k) != doc["meta"][k]: print(f"note: baseline {k}={base['meta'].get(k)}, this run {doc['meta'][k]}")
+    bad = compare(doc, base, a)
+    for name, metric, was, now in bad: print(f"REGRESSION {name} {metric}: {was} -> {now}")
+    print(f"{len(bad)} regressions against {baseline} (threshold {a.threshold:.0%})")
+    sys.exit(1 if bad else 0)
+
+def rules(env):
+    """URL rules the app serves, from a child process with the bench environment."""
+    code = "from backend.app import create_app\nfor r in create_app().url_map.iter_rules():\n    if r.endpoint != 'static': print(r.rule)"
+    return subprocess.run([sys.executable, "-c", code], env=env, check=True, capture_output=True, text=True, cwd=ROOT).stdout.split()
+
+def git_commit():
+    try: return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip() or None
+    except OSError: return None
+
+if __name__ == "__main__":
+    main()
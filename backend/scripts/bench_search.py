@@ -0,0 +1,75 @@
+"""Full-text search latency and index build time.
+
+    python -m backend.scripts.bench_search [--posts 5000000] [--users 5]
+
+Seeds `--posts` posts with Zipf-distributed titles and captions (spread over
+`--users` users) into a throwaway database with the search triggers active,
+times a full reindex, then times /api/search for rare, common, multi-word,
+prefix and filtered queries, as user 1, and checks a page past
+MAX_PAGE is refused. "matches" counts every user's
+matching posts, "user 1" the ones the search ranks. One query is also run as
+a LIKE scan for comparison.
+"""
+import argparse, os, random, statistics, tempfile, time
+from datetime import datetime, timedelta
+
+def vocab(n=20000, seed=11):
+    rnd = random.Random(seed); letters = "abcdefghijklmnoprstuvwy"
+    words = {"".join(rnd.choice(letters) for _ in range(rnd.randint(3, 9))) for _ in range(n * 2)}
+    return sorted(words)[:n]
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--posts", type=int, default=5_000_000)
+    ap.add_argument("--users", type=int, default=5)
+    ap.add_argument("--batch", type=int, default=50_000)
+    a = ap.parse_args()
+    with tempfile.TemporaryDirectory() as d:
+        os.environ["DB_PATH"] = os.path.join(d, "bench.db")
+        from backend.app import app, get_db
+        from backend import search
+        con = get_db(); rnd = random.Random(2)
+        words = vocab(); weights = [1 / (i + 1) for i in range(len(words))]
+        plats = ["Instagram", "TikTok", "YouTube"]; start = datetime(2020, 1, 1); step = timedelta(minutes=1)
+        with con:
+            con.executemany("INSERT INTO users(id,email,password_hash,created_at) VALUES(?,?,'x','now')",
+                            ((u, f"user{u}@example.com") for u in range(1, a.users + 1)))
+        t = time.perf_counter()
+        for lo in range(0, a.posts, a.batch):
+            n = min(a.batch, a.posts - lo)
+            text = rnd.choices(words, weights, k=n * 20)
+            with con:
+                con.executemany("INSERT INTO posts(user_id,platform,title,caption,metrics,created_at) VALUES(?,?,?,?,'{}',?)",
+                                ((i % a.users + 1, plats[i % 3], " ".join(text[j * 20:j * 20 + 4]), " ".join(text[j * 20 + 4:j * 20 + 20]),
+                                  (start + step * i).isoformat()) for j, i in enumerate(range(lo, lo + n))))
+        secs = time.perf_counter() - t
+        print(f"seed      {a.posts:,} posts in {secs:.0f}s ({a.posts / secs:,.0f}/s incl. FTS, feed and time-series triggers)")
+        t = time.perf_counter(); search.reindex(con)
+        print(f"reindex   {time.perf_counter() - t:.1f}s (rebuild + optimize)")
+        print(f"db size   {os.path.getsize(os.environ['DB_PATH']) / 1e6:,.0f} MB")
+        client = app.test_client()
+        with client.session_transaction() as s: s["_user_id"] = "1"
+        rare, mid, common = words[15000], words[300], words[3]
+        mid_date = (start + step * (a.posts // 2)).isoformat()
+        cases = [("rare word", {"q": rare}), ("mid word", {"q": mid}), ("common word", {"q": common}),
+                 ("two words", {"q": f"{mid} {words[40]}"}), ("prefix", {"q": mid[:3]}),
+                 ("platform", {"q": mid, "platform": "tiktok"}), ("date range", {"q": mid, "since": mid_date}),
+                 ("page 5", {"q": mid, "page": 5})]
+        print(f"{'query':12s} {'matches':>9s} {'user 1':>9s} {'p50 ms':>9s} {'max ms':>9s}")
+        for label, qs in cases:
+            xs = []
+            for _ in range(5):
+                t = time.perf_counter(); body = client.get("/api/search", query_string=qs).get_json(); xs.append((time.perf_counter() - t) * 1000)
+            assert body["ok"], body
+            expr = search.match_query(qs["q"])
+            n = con.execute("SELECT COUNT(*) FROM posts_fts WHERE posts_fts MATCH ?", (expr,)).fetchone()[0]
+            mine = con.execute("SELECT COUNT(*) FROM posts_fts WHERE posts_fts MATCH ?", (f'user_id:"1" AND {{title caption}}: ({expr})',)).fetchone()[0]
+            print(f"{label:12s} {n:9,d} {mine:9,d} {statistics.median(xs):9.1f} {max(xs):9.1f}")
+        r = client.get("/api/search", query_string={"q": mid, "page": 10 ** 30})
+        assert r.status_code == 400, (r.status_code, r.get_json())
+        t = time.perf_counter()
+        con.execute("SELECT id FROM posts WHERE user_id=1 AND (title LIKE ? OR caption LIKE ?) LIMIT 21", (f"%{rare}%", f"%{rare}%")).fetchall()
+        print(f"{'LIKE scan':12s} {'':9s} {(time.perf_counter() - t) * 1000:9.1f}   (rare word, for comparison)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Serving modes under slow upstream calls.
+
+    python -m backend.scripts.bench_serving [--modes sync,gthread,gevent,uvicorn] [--slow 32] [--upstream-ms 2000]
+
+Starts a slow stub completion server, then for each mode runs gunicorn with
+gunicorn.conf.py (WEB_WORKER_CLASS=<mode>) on a throwaway database. It
+drives `--slow` clients asking distinct questions through /api/ai/ask, so
+every ask waits on the stub, while `--fast` clients hit /health and
+/api/kpis. The report compares completed slow asks with the ideal (every
+client always waiting on the stub) and shows what the waits did to
+fast-request throughput and tail latency. Modes whose worker
+package is not installed are skipped.
+"""
+import argparse, importlib.util, json, os, socket, statistics, subprocess, sys, tempfile, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+
+NEEDS = {"gevent": "gevent", "uvicorn": "uvicorn"}
+
+class SlowCompletions(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    delay = 2.0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        time.sleep(self.delay)
+        body = b'data: {"choices":[{"delta":{"content":"ok"}}]}\n\ndata: [DONE]\n\n'
+        self.send_response(200); self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Content-Length", str(len(body))); self.end_headers(); self.wfile.write(body)
+
+    def log_message(self, *a):
+        pass
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    def handle_error(self, request, client_address):
+        pass
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0)); return s.getsockname()[1]
+
+def pct(xs, p):
+    return round(statistics.quantiles(xs, n=100)[p - 1] * 1000, 1) if len(xs) > 1 else (round(xs[0] * 1000, 1) if xs else None)
+
+def run(mode, a, upstream):
+    with tempfile.TemporaryDirectory() as d:
+        port = free_port(); base = f"http://127.0.0.1:{port}"
+        env = dict(os.environ, DB_PATH=os.path.join(d, "bench.db"), WEB_WORKER_CLASS=mode, WEB_CONCURRENCY=str(a.workers),
+                   OPENAI_BASE_URL=upstream, OPENAI_API_KEY="test", AI_WORKERS="512", HTTP_POOL_SIZE="512")
+        log = open(os.path.join(d, "gunicorn.log"), "w+")
+        proc = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", f"--bind=127.0.0.1:{port}",
+                                 "--log-level=warning", "--timeout=300"], env=env, stderr=log)
+        try:
+            for _ in range(100):
+                try: requests.get(base + "/health", timeout=1); break
+                except requests.ConnectionError: time.sleep(0.1)
+            stop = time.perf_counter() + a.seconds
+            slow, fast, errors, lock = [], [], {"slow": 0, "fast": 0}, threading.Lock()
+            def slow_client(n):
+                s = requests.Session(); i = 0
+                while time.perf_counter() < stop:
+                    t = time.perf_counter(); i += 1
+                    try:
+                        r = s.post(base + "/api/ai/ask", json={"q": f"client {n} question {i}"}, timeout=a.seconds * 3)
+                        ok = r.status_code == 200
+                    except requests.RequestException: ok = False
+                    with lock:
+                        if ok: slow.append(time.perf_counter() - t)
+                        else: errors["slow"] += 1
+            def fast_client():
+                s = requests.Session()
+                while time.perf_counter() < stop:
+                    for path in ("/health", "/api/kpis"):
+                        t = time.perf_counter()
+                        try: ok = s.get(base + path, timeout=a.seconds * 3).status_code == 200
+                        except requests.RequestException: ok = False
+                        with lock:
+                            if ok: fast.append(time.perf_counter() - t)
+                            else: errors["fast"] += 1
+            ts = [threading.Thread(target=slow_client, args=(n,)) for n in range(a.slow)] + [threading.Thread(target=fast_client) for _ in range(a.fast)]
+            for t in ts: t.start()
+            for t in ts: t.join()
+        finally:
+            proc.terminate(); proc.wait()
+            if errors["slow"] or errors["fast"]:
+                log.seek(0); print(log.read()[-2000:], file=sys.stderr)
+            log.close()
+        # an ask can't finish in less than the upstream delay, so the best case is slow clients x seconds / delay
+        ideal = a.slow * a.seconds / (a.upstream_ms / 1000)
+        return {"slow_done": len(slow), "slow_ideal": int(ideal), "slow_p50_ms": pct(slow, 50), "slow_p99_ms": pct(slow, 99),
+                "fast_rps": round(len(fast) / a.seconds, 1), "fast_p50_ms": pct(fast, 50), "fast_p99_ms": pct(fast, 99), "errors": errors}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--modes", default="sync,gthread,gevent,uvicorn")
+    ap.add_argument("--slow", type=int, default=32, help="concurrent clients waiting on the upstream")
+    ap.add_argument("--fast", type=int, default=2, help="concurrent clients on cheap routes")
+    ap.add_argument("--seconds", type=float, default=10)
+    ap.add_argument("--upstream-ms", type=float, default=2000)
+    ap.add_argument("--workers", type=int, default=2)
+    a = ap.parse_args()
+    SlowCompletions.delay = a.upstream_ms / 1000
+    stub = StubServer(("127.0.0.1", 0), SlowCompletions)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    upstream = f"http://127.0.0.1:{stub.server_port}/v1"
+    for mode in a.modes.split(","):
+        if mode in NEEDS and importlib.util.find_spec(NEEDS[mode]) is None:
+            print(f"{mode:8s} skipped ({NEEDS[mode]} not installed)"); continue
+        print(f"{mode:8s} {json.dumps(run(mode, a, upstream))}", flush=True)
+    stub.shutdown()
+
+if __name__ == "__main__":
+    main()
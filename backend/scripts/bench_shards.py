@@ -0,0 +1,74 @@
+"""Concurrent write throughput, one database file vs N shards.
+
+    python -m backend.scripts.bench_shards [--shards 4] [--writers 4] [--seconds 5] [--rows 50]
+
+For each configuration (SHARDS=0, then SHARDS=--shards) a fresh database gets
+--users registered users. Then --writers processes (like gunicorn workers or
+sync jobs) upsert --rows posts per transaction for random users through
+shards.user_tx() for --seconds. The upsert is the one sync uses, so it fires
+the FTS and snapshot triggers. Reports committed transactions and rows per
+second, and transaction latency (lock wait included).
+"""
+import argparse, json, os, random, statistics, subprocess, sys, tempfile, time
+
+def child(a):
+    from backend import shards
+    from backend.store import with_retry
+    rnd = random.Random(os.getpid())
+    def upsert(uid, n):
+        with shards.user_tx(uid) as con:
+            con.executemany("""INSERT INTO posts(user_id,platform,external_id,title,caption,metrics,created_at) VALUES(?,?,?,?,?,?,?)
+                               ON CONFLICT(user_id,platform,external_id) DO UPDATE SET
+                                 title=excluded.title, caption=excluded.caption, metrics=excluded.metrics""",
+                            [(uid, "TikTok", f"p{rnd.randrange(1000)}", f"spring drop {n}", "launch review haul",
+                              json.dumps({"likes": n, "plays": n * 10}), "2024-03-01T00:00:00") for n in range(a.rows)])
+    for uid in range(1, a.users + 1): shards.user_db(uid).close()  # open and migrate outside the timed part
+    print("ready", flush=True); sys.stdin.readline()
+    lat, end = [], time.perf_counter() + a.seconds
+    while True:
+        t = time.perf_counter()
+        if t >= end: break
+        with_retry(upsert, rnd.randint(1, a.users), len(lat))
+        lat.append(time.perf_counter() - t)
+    print(json.dumps({"commits": len(lat), "lat": lat}), flush=True)
+
+def run(a, n):
+    with tempfile.TemporaryDirectory() as d:
+        env = dict(os.environ, DB_PATH=os.path.join(d, "bench.db"), SHARDS=str(n), SHARD_DIR=os.path.join(d, "shards"), HASH_POOL="0", METRICS="0")
+        setup = f"""
+from backend import shards
+from backend.core import get_db
+con = get_db()
+with con: con.executemany("INSERT INTO users(id,email,created_at) VALUES(?,?,'now')", [(i, f"u{{i}}@x.com") for i in range(1, {a.users} + 1)])
+for i in range(1, {a.users} + 1): shards.add_user(i, f"u{{i}}@x.com")
+"""
+        subprocess.run([sys.executable, "-c", setup], env=env, check=True)
+        args = [sys.executable, "-m", "backend.scripts.bench_shards", "--child", f"--users={a.users}", f"--seconds={a.seconds}", f"--rows={a.rows}"]
+        procs = [subprocess.Popen(args, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True) for _ in range(a.writers)]
+        for p in procs: assert p.stdout.readline().strip() == "ready"
+        for p in procs: p.stdin.write("go\n"); p.stdin.flush()
+        out = [json.loads(p.stdout.readline()) for p in procs]
+        for p in procs: p.wait()
+    lat = sorted(x for o in out for x in o["lat"])
+    commits = sum(o["commits"] for o in out)
+    return {"shards": n or 1, "tx/s": round(commits / a.seconds), "rows/s": round(commits * a.rows / a.seconds),
+            "p50 ms": round(statistics.median(lat) * 1000, 1), "p99 ms": round(lat[int(len(lat) * 0.99)] * 1000, 1),
+            "max ms": round(lat[-1] * 1000, 1)}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--shards", type=int, default=4)
+    ap.add_argument("--writers", type=int, default=4)
+    ap.add_argument("--seconds", type=float, default=5)
+    ap.add_argument("--rows", type=int, default=50, help="posts upserted per transaction")
+    ap.add_argument("--users", type=int, default=200)
+    ap.add_argument("--child", action="store_true")
+    a = ap.parse_args()
+    if a.child: return child(a)
+    print(f"{a.writers} writers, {a.rows} rows per transaction, {os.cpu_count()} CPUs")
+    rows = [run(a, 0), run(a, a.shards)]
+    print("".join(f"{k:>10s}" for k in rows[0]))
+    for r in rows: print("".join(f"{v:>10}" for v in r.values()))
+
+if __name__ == "__main__":
+    main()
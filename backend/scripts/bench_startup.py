@@ -0,0 +1,101 @@
+"""Cold start and first-request latency.
+
+    python -m backend.scripts.bench_startup [--baseline REF] [--runs 5]
+
+Every measurement runs in a fresh interpreter against a database that
+already has the current schema, which is the normal restart case:
+- script: import what a CLI script needs and open a connection. That is
+  backend.core, or backend.app in trees without it.
+- app: import the web app and build it.
+- first/second: the first and second test-client request to /health,
+  /api/kpis and / after that import.
+- gunicorn: launch with gunicorn.conf.py (2 workers) until /health answers,
+  then the first real request to /api/kpis.
+
+With --baseline REF the same numbers are taken from a git worktree of REF
+(e.g. the commit before the app factory), each tree on its own database.
+"""
+import argparse, json, os, socket, statistics, subprocess, sys, tempfile, time
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+ROUTES = ("/health", "/api/kpis", "/")
+
+SCRIPT = """
+import json, sys, time
+t = time.perf_counter()
+try: from backend.core import get_db
+except ImportError: from backend.app import get_db
+get_db().execute("SELECT 1")
+print(json.dumps({"ms": (time.perf_counter() - t) * 1000, "modules": len(sys.modules), "flask": "flask" in sys.modules}))
+"""
+APP = """
+import json, time
+t = time.perf_counter()
+from backend.app import app
+out = {"ms": (time.perf_counter() - t) * 1000}
+c = app.test_client()
+for path in %r:
+    t = time.perf_counter(); assert c.get(path).status_code == 200, path; out["first " + path] = (time.perf_counter() - t) * 1000
+    t = time.perf_counter(); c.get(path); out["second " + path] = (time.perf_counter() - t) * 1000
+print(json.dumps(out))
+""" % (ROUTES,)
+
+def child(tree, env, code):
+    out = subprocess.run([sys.executable, "-c", code], cwd=tree, env=env, check=True, capture_output=True, text=True).stdout
+    return json.loads(out.splitlines()[-1])
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0)); return s.getsockname()[1]
+
+def gunicorn(tree, env):
+    port = free_port(); base = f"http://127.0.0.1:{port}"
+    t = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", f"--bind=127.0.0.1:{port}", "--log-level=warning"],
+                            cwd=tree, env=env, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            try:
+                if requests.get(base + "/health", timeout=1).status_code == 200: break
+            except requests.ConnectionError: time.sleep(0.01)
+        ready = time.perf_counter() - t
+        t = time.perf_counter(); requests.get(base + "/api/kpis", timeout=10)
+        return {"ready_ms": ready * 1000, "first /api/kpis": (time.perf_counter() - t) * 1000}
+    finally:
+        proc.terminate(); proc.wait()
+
+def measure(tree, db, runs):
+    env = dict(os.environ, DB_PATH=db, PYTHONPATH=tree, HASH_POOL="0")
+    child(tree, env, SCRIPT)  # creates the schema; every timed run below is a restart
+    child(tree, env, APP)
+    res = {"script": [child(tree, env, SCRIPT) for _ in range(runs)], "app": [child(tree, env, APP) for _ in range(runs)],
+           "gunicorn": [gunicorn(tree, env) for _ in range(runs)]}
+    med = lambda rs, k: round(statistics.median(r[k] for r in rs), 1)
+    out = {"script_ms": med(res["script"], "ms"), "script_modules": res["script"][0]["modules"], "script_loads_flask": res["script"][0]["flask"],
+           "app_import_ms": med(res["app"], "ms")}
+    for p in ROUTES: out[f"first {p} ms"] = med(res["app"], "first " + p); out[f"second {p} ms"] = med(res["app"], "second " + p)
+    out["gunicorn_ready_ms"] = med(res["gunicorn"], "ready_ms"); out["gunicorn first /api/kpis ms"] = med(res["gunicorn"], "first /api/kpis")
+    return out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--baseline", help="git ref to compare against")
+    ap.add_argument("--runs", type=int, default=5)
+    a = ap.parse_args()
+    with tempfile.TemporaryDirectory() as d:
+        trees = {"current": ROOT}
+        if a.baseline:
+            trees["baseline"] = os.path.join(d, "baseline")
+            subprocess.run(["git", "worktree", "add", "--detach", trees["baseline"], a.baseline], cwd=ROOT, check=True, capture_output=True)
+        try:
+            results = {name: measure(tree, os.path.join(d, f"{name}.db"), a.runs) for name, tree in trees.items()}
+        finally:
+            if a.baseline: subprocess.run(["git", "worktree", "remove", "--force", trees["baseline"]], cwd=ROOT, check=True)
+    names = list(results)
+    print(f"{'':28s}" + "".join(f"{n:>12s}" for n in names))
+    for k in results["current"]:
+        print(f"{k:28s}" + "".join(f"{str(results[n][k]):>12s}" for n in names))
+
+if __name__ == "__main__":
+    main()
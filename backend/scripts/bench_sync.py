@@ -0,0 +1,111 @@
+"""Sync engine throughput against a local stub of the provider APIs.
+
+    python -m backend.scripts.bench_sync [--users 100] [--pages 5] [--latency-ms 40] [--error-rate 0.02]
+
+The stub serves provider-shaped paginated responses, sleeps to simulate API
+latency and answers a fraction of requests with 429 + Retry-After so backoff is
+exercised. YouTube search pages carry no statistics; the stub serves them from
+/videos as the real API does. The first `--bad-users` users get malformed
+payloads: their tasks must fail on their own without stopping the run. Runs
+against a throwaway database.
+"""
+import argparse, json, os, random, tempfile, threading, time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+PER_PAGE = 20
+
+def make_handler(pages, latency, error_rate, bad_users):
+    class Stub(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        def log_message(self, *a): pass
+
+        def _send(self, code, body, headers=()):
+            data = json.dumps(body).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json"); self.send_header("Content-Length", str(len(data)))
+            for k, v in headers: self.send_header(k, v)
+            self.end_headers(); self.wfile.write(data)
+
+        def _items(self, page):
+            tok = self.headers.get("Authorization", "").split()[-1]
+            return [f"{tok}-{page}-{i}" for i in range(PER_PAGE)]
+
+        def do_GET(self): self._route()
+        def do_POST(self): self._route()
+
+        def _route(self):
+            time.sleep(latency)
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            if random.random() < error_rate: return self._send(429, {"error": "rate_limited"}, [("Retry-After", "0")])
+            u = urlparse(self.path); q = {k: v[0] for k, v in parse_qs(u.query).items()}
+            provider = u.path.split("/")[1]
+            if int(self.headers.get("Authorization", "").split("-")[1]) <= bad_users: return self._send(200, ["malformed"])
+            if provider in ("instagram", "facebook"):
+                page = int(q.get("after", 0)); more = page + 1 < pages
+                nxt = f"http://{self.headers['Host']}{u.path}?after={page + 1}" if more else None
+                data = [{"id": i, "caption": f"Post {i}\nbody", "timestamp": "2025-10-01T00:00:00+0000", "like_count": 10} for i in self._items(page)]
+                return self._send(200, {"data": data, "paging": {"next": nxt} if nxt else {}})
+            if provider == "youtube" and u.path.endswith("/videos"):
+                items = [{"id": i, "statistics": {"viewCount": "1500", "likeCount": "75", "commentCount": "4"}} for i in q["id"].split(",")]
+                return self._send(200, {"items": items})
+            if provider == "youtube":
+                page = int(q.get("pageToken", 0))
+                items = [{"id": {"videoId": i}, "snippet": {"title": i, "description": "", "publishedAt": "2025-10-01T00:00:00Z"}} for i in self._items(page)]
+                return self._send(200, {"items": items, **({"nextPageToken": str(page + 1)} if page + 1 < pages else {})})
+            if provider == "tiktok":
+                page = int(body.get("cursor", 0))
+                vids = [{"id": i, "title": i, "create_time": 1727740800, "view_count": 900, "like_count": 60} for i in self._items(page)]
+                return self._send(200, {"data": {"videos": vids, "cursor": page + 1, "has_more": page + 1 < pages}})
+            if provider == "linkedin":
+                start = int(q.get("start", 0)); page = start // PER_PAGE
+                els = [{"id": i, "specificContent": {"com.linkedin.ugc.ShareContent": {"shareCommentary": {"text": i}}},
+                        "created": {"time": 1727740800000}} for i in self._items(page)]
+                return self._send(200, {"elements": els, "paging": {"start": start, "count": PER_PAGE, "total": pages * PER_PAGE}})
+            self._send(404, {"error": "unknown"})
+    return Stub
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=100)
+    ap.add_argument("--pages", type=int, default=5)
+    ap.add_argument("--workers", type=int, default=32)
+    ap.add_argument("--latency-ms", type=float, default=40)
+    ap.add_argument("--error-rate", type=float, default=0.02)
+    ap.add_argument("--bad-users", type=int, default=1)
+    a = ap.parse_args()
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(a.pages, a.latency_ms / 1000, a.error_rate, a.bad_users))
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    with tempfile.TemporaryDirectory() as d:
+        os.environ["DB_PATH"] = os.path.join(d, "bench.db")
+        os.environ["SYNC_API_BASE"] = f"http://127.0.0.1:{srv.server_port}"
+        from backend.core import get_db
+        from backend.sync import SyncEngine, PROVIDERS
+        con = get_db()
+        with con:
+            con.executemany("INSERT INTO users(id,email,password_hash,created_at) VALUES(?,?,'x','now')",
+                            [(u, f"user{u}@example.com") for u in range(1, a.users + 1)])
+            con.executemany("INSERT INTO tokens(user_id,platform,access_token,expires_at) VALUES(?,?,?,?)",
+                            [(u, p, f"tok-{u}-{p}", int(time.time()) + 3600) for u in range(1, a.users + 1) for p in PROVIDERS])
+        # generous limits: the stub is local, this measures engine overhead and concurrency
+        engine = SyncEngine(workers=a.workers, rates={p: (500, 500) for p in PROVIDERS})
+        report = engine.run()
+        total = con.execute("SELECT COUNT(*) FROM posts").fetchone()[0]
+        again = engine.run()
+        dupes = con.execute("SELECT COUNT(*) FROM posts").fetchone()[0] - total
+        yt, viewed = con.execute("SELECT COUNT(*), COUNT(views) FROM posts WHERE platform='YouTube'").fetchone()
+    srv.shutdown()
+    print(f"{'provider':10s} {'tasks':>6s} {'pages':>6s} {'posts':>7s} {'errors':>6s} {'posts/s':>9s}")
+    for p, r in sorted(report["providers"].items()):
+        print(f"{p:10s} {r['tasks']:6d} {r['pages']:6d} {r['posts']:7d} {r['errors']:6d} {r['posts_per_sec']:9.1f}")
+    print(f"wall {report['seconds']} s, {total} posts stored; re-sync {again['seconds']} s added {dupes} duplicates")
+    print(f"youtube    {viewed}/{yt} posts with view counts")
+    for p, r in sorted(report["providers"].items()):
+        for f in r["failures"][:2]: print(f"failed     {p}: {f}")
+    healthy = a.users - a.bad_users
+    ok = viewed == yt and all(r["tasks"] - r["errors"] >= healthy for r in report["providers"].values())
+    raise SystemExit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
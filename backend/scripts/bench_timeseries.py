@@ -0,0 +1,67 @@
+"""Time-series rollups on a year of daily data.
+
+    python -m backend.scripts.bench_timeseries [--campaigns 50000] [--days 365] [--accounts 50]
+
+Loads `--days` days for every campaign into a throwaway database one day at a
+time (as daily imports would, so the rollup triggers do the aggregation),
+then times trend windows from the rollups against the same query over raw
+rows, loads the analytics frame and applies retention.
+"""
+import argparse, os, random, statistics, tempfile, time
+from datetime import date, timedelta
+
+def timeit(fn, n=10):
+    xs = []
+    for _ in range(n):
+        t = time.perf_counter(); fn(); xs.append((time.perf_counter() - t) * 1000)
+    return statistics.median(xs)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--campaigns", type=int, default=50_000)
+    ap.add_argument("--days", type=int, default=365)
+    ap.add_argument("--accounts", type=int, default=50)
+    ap.add_argument("--raw-days", type=int, default=180, help="retention applied at the end")
+    a = ap.parse_args()
+    with tempfile.TemporaryDirectory() as d:
+        os.environ["DB_PATH"] = os.path.join(d, "bench.db")
+        from backend.core import get_db
+        from backend import analytics, timeseries
+        con = get_db(); rnd = random.Random(3)
+        with con:
+            con.executemany("INSERT INTO accounts(id,name) VALUES(?,?)", ((i, f"Account {i}") for i in range(1, a.accounts + 1)))
+            con.executemany("INSERT INTO campaigns(id,account_id,name,status) VALUES(?,?,?,'active')",
+                            ((i, i % a.accounts + 1, f"Campaign {i}") for i in range(1, a.campaigns + 1)))
+        today = date.today(); first = today - timedelta(days=a.days - 1)
+        t = time.perf_counter()
+        for n in range(a.days):
+            day = (first + timedelta(days=n)).isoformat()
+            with con:
+                con.executemany("INSERT INTO campaign_stats VALUES(?,?,?,?,?,?,?)",
+                                ((c, day, rnd.uniform(5, 200), rnd.randint(500, 20000), rnd.randint(5, 400), rnd.randint(0, 20), rnd.uniform(5, 400))
+                                 for c in range(1, a.campaigns + 1)))
+        secs = time.perf_counter() - t; rows = a.campaigns * a.days
+        print(f"ingest     {rows:,} raw rows in {secs:.1f}s ({rows / secs:,.0f} rows/s, rollups maintained by triggers)")
+        sizes = {t: con.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in ("stats_daily", "stats_weekly", "campaign_weekly")}
+        print(f"rollups    {sizes}")
+        cases = [("last 7 weeks", dict(grain="week", n=7)),
+                 ("last 52 weeks", dict(grain="week", n=52)),
+                 ("365 days", dict(grain="day", n=365)),
+                 ("30-day window", dict(grain="day", start=(today - timedelta(days=120)).isoformat(), end=(today - timedelta(days=90)).isoformat())),
+                 ("one account 52w", dict(grain="week", n=52, account_id=7))]
+        for label, kw in cases:
+            print(f"{label:18s} {timeit(lambda: timeseries.series(con, **kw)):8.2f} ms")
+        print(f"{'campaign 52w':18s} {timeit(lambda: timeseries.campaign_series(con, 123, n=52)):8.2f} ms")
+        start = (today - timedelta(days=120)).isoformat(); stop = (today - timedelta(days=90)).isoformat()
+        raw = timeit(lambda: con.execute("SELECT day, SUM(spend), SUM(revenue) FROM campaign_stats WHERE day BETWEEN ? AND ? GROUP BY day", (start, stop)).fetchall(), n=2)
+        print(f"{'30-day raw scan':18s} {raw:8.2f} ms  (same window over campaign_stats, for comparison)")
+        t = time.perf_counter(); frame = analytics.CampaignFrame.from_db(con)
+        print(f"frame load {time.perf_counter() - t:.2f}s ({frame.rows:,} campaigns from {sizes['campaign_weekly']:,} weekly rows)")
+        before = timeseries.series(con, grain="week", n=60)
+        t = time.perf_counter(); removed = timeseries.prune(con, raw_days=a.raw_days)
+        print(f"prune      {removed} in {time.perf_counter() - t:.1f}s")
+        assert timeseries.series(con, grain="week", n=60) == before, "weekly rollups changed by pruning"
+        print(f"db size    {os.path.getsize(os.environ['DB_PATH']) / 1e6:,.0f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Token refresher against a local fake OAuth server.
+
+    python -m backend.scripts.bench_tokens [--tokens 100000] [--due 0.05] [--dupes 2000] [--latency-ms 20]
+
+Seeds a throwaway database whose tokens table still holds duplicate
+(user, platform) rows, migrates it (which deduplicates them), then times the
+heap load, the query plan it uses, and refresh throughput for the due slice.
+Then the server issues tokens shorter-lived than the refresh lead: a pass must
+refresh each due token once and return, leaving the rest for the next pass.
+Exits 1 if it doesn't.
+"""
+import argparse, json, os, random, sqlite3, tempfile, threading, time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+PLATFORMS = ("instagram", "facebook", "youtube", "tiktok", "linkedin")
+
+def fake_oauth(latency, served, expires_in):
+    class Fake(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        def log_message(self, *a): pass
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            time.sleep(latency); served.append(1)
+            body = json.dumps({"access_token": f"acc-{random.getrandbits(64):x}", "expires_in": expires_in[0],
+                               "refresh_token": f"ref-{random.getrandbits(64):x}"}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json"); self.send_header("Content-Length", str(len(body)))
+            self.end_headers(); self.wfile.write(body)
+    return Fake
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tokens", type=int, default=100_000)
+    ap.add_argument("--due", type=float, default=0.05, help="fraction expiring inside the refresh lead")
+    ap.add_argument("--dupes", type=int, default=2000, help="extra duplicate rows from repeated callbacks")
+    ap.add_argument("--latency-ms", type=float, default=20)
+    a = ap.parse_args()
+    served, expires_in = [], [3600]
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), fake_oauth(a.latency_ms / 1000, served, expires_in)); srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    with tempfile.TemporaryDirectory() as d:
+        path = os.environ["DB_PATH"] = os.path.join(d, "bench.db")
+        os.environ["OAUTH_TOKEN_URL"] = f"http://127.0.0.1:{srv.server_port}/token"
+        now = int(time.time()); rnd = random.Random(5)
+        raw = sqlite3.connect(path)
+        raw.execute("""CREATE TABLE tokens(id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, platform TEXT,
+                       access_token TEXT, refresh_token TEXT, expires_at INTEGER, raw TEXT, created_at TEXT DEFAULT CURRENT_TIMESTAMP)""")
+        def exp(): return now + (rnd.randint(0, 500) if rnd.random() < a.due else rnd.randint(1200, 7 * 86400))
+        rows = [(i // len(PLATFORMS) + 1, PLATFORMS[i % len(PLATFORMS)], "a", "r", exp()) for i in range(a.tokens)]
+        dupes = [(u, p, "old", "r", now - 10) for u, p, *_ in rnd.sample(rows, min(a.dupes, len(rows)))]
+        raw.executemany("INSERT INTO tokens(user_id,platform,access_token,refresh_token,expires_at) VALUES(?,?,?,?,?)", dupes + rows)
+        raw.execute("CREATE TABLE users(id INTEGER PRIMARY KEY, email TEXT UNIQUE, pw_hash TEXT, created_at TEXT)")
+        raw.executemany("INSERT INTO users(id,email,created_at) VALUES(?,?,'now')", ((u, f"user{u}@example.com") for u in range(1, rows[-1][0] + 1)))
+        raw.commit(); raw.close()
+        t = time.perf_counter()
+        from backend import schema
+        from backend.core import get_db
+        from backend.tokens import TokenRefresher
+        schema.migrate()  # the release step: the legacy-shaped file isn't migrated on open
+        con = get_db()
+        left = con.execute("SELECT COUNT(*) FROM tokens").fetchone()[0]
+        print(f"dedupe      {time.perf_counter() - t:7.2f} s  {a.tokens + len(dupes)} -> {left} rows")
+        plan = con.execute("""EXPLAIN QUERY PLAN SELECT id, expires_at FROM tokens
+                              WHERE refresh_token IS NOT NULL AND expires_at > ? AND expires_at <= ?""", (0, 1)).fetchall()
+        print("load plan  ", "; ".join(r["detail"] for r in plan))
+        r = TokenRefresher()
+        t = time.perf_counter(); n = r.load()
+        print(f"heap load   {(time.perf_counter() - t) * 1000:7.1f} ms  {n} tokens inside horizon")
+        t = time.perf_counter(); done = r.run_once(); secs = time.perf_counter() - t
+        print(f"refresh     {secs:7.2f} s  {done} tokens, {done / secs if secs else 0:.0f} tokens/s  {r.stats}")
+        t = time.perf_counter(); again = r.run_once()
+        print(f"idle pass   {(time.perf_counter() - t) * 1000:7.1f} ms  {again} refreshed")
+        # short-lived tokens: every refresh comes back already inside the lead
+        expires_in[0] = r.lead // 2
+        with con: n = con.execute("UPDATE tokens SET expires_at=? WHERE id IN (SELECT id FROM tokens ORDER BY id LIMIT 50)", (now + 60,)).rowcount
+        short = TokenRefresher(); served.clear()
+        passes = [threading.Thread(target=short.run_once, daemon=True)]
+        passes[0].start(); passes[0].join(60)
+        ok = not passes[0].is_alive() and len(served) == n and len(short.deferred) == n
+        print(f"short expiry  {len(served)} requests for {n} due tokens, {len(short.deferred)} left for the next pass  {'ok' if ok else 'FAIL'}")
+    srv.shutdown()
+    raise SystemExit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
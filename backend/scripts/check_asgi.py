@@ -0,0 +1,61 @@
+"""WSGI-to-ASGI adapter check: the environ it builds and the routes it reaches.
+
+    python -m backend.scripts.check_asgi
+
+Builds environs for ASGI scopes the way uvicorn sends them (a decoded
+`path` next to the still-encoded `raw_path`) and checks PATH_INFO and
+SCRIPT_NAME follow PEP 3333: percent-decoded, UTF-8 bytes carried as
+latin-1, root_path stripped. Then drives the app through the adapter with
+percent-encoded paths and checks each gets the status the same path gets
+under WSGI. Runs against a throwaway database. Prints one line per check
+and exits 1 if any fails.
+"""
+import asyncio, io, os, sys, tempfile
+from urllib.parse import unquote
+
+def scope(raw, root=""):
+    raw_path, _, query = raw.partition("?")
+    return {"type": "http", "method": "GET", "path": unquote(raw_path), "raw_path": raw_path.encode(), "root_path": root,
+            "query_string": query.encode(), "headers": [(b"host", b"localhost")], "http_version": "1.1", "scheme": "http",
+            "server": ("localhost", 80), "client": ("127.0.0.1", 5000)}
+
+async def fetch(app, sc):
+    sent, got = [], {}
+    async def receive():
+        if not sent: sent.append(True); return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.sleep(3600)
+    async def send(msg):
+        if msg["type"] == "http.response.start": got["status"] = msg["status"]
+    await app(sc, receive, send)
+    return got.get("status")
+
+def main():
+    d = tempfile.mkdtemp()
+    os.environ.update(DB_PATH=os.path.join(d, "asgi.db"), HASH_POOL="0", METRICS="0")
+    from backend.asgi import WsgiToAsgi, environ
+    from backend.app import create_app
+    failures = []
+    def check(name, ok, detail=""):
+        print(f"{'PASS' if ok else 'FAIL'} {name}" + (f": {detail}" if detail and not ok else ""))
+        if not ok: failures.append(name)
+
+    for raw, root, path_info, script_name in [("/heal%74h", "", "/health", ""),
+                                              ("/api/oauth/face%62ook?next=%2F", "", "/api/oauth/facebook", ""),
+                                              ("/caf%C3%A9", "", "/cafÃ©", ""),
+                                              ("/app/heal%74h", "/app", "/health", "/app")]:
+        env = environ(scope(raw, root), io.BytesIO())
+        check(f"environ {raw}", (env["PATH_INFO"], env["SCRIPT_NAME"]) == (path_info, script_name),
+              f"PATH_INFO={env['PATH_INFO']!r} SCRIPT_NAME={env['SCRIPT_NAME']!r}")
+    check("query string kept encoded", environ(scope("/api/posts?next=%2F"), io.BytesIO())["QUERY_STRING"] == "next=%2F")
+
+    flask_app = create_app()
+    adapter, client = WsgiToAsgi(flask_app, threads=2), flask_app.test_client()
+    for raw in ("/heal%74h", "/api/oauth/face%62ook", "/api/kp%69s", "/%61pi/insights"):
+        want = client.get(unquote(raw)).status_code
+        got = asyncio.run(fetch(adapter, scope(raw)))
+        check(f"GET {raw} routed as under WSGI", got == want and got != 404, f"asgi {got}, wsgi {want}")
+    adapter.pool.shutdown()
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""CSV import identity check: which uploads count as the same import.
+
+    python -m backend.scripts.check_imports
+
+Imports a generated export larger than one read block into a throwaway
+database, then checks that re-uploading the same bytes is a no-op, that a
+corrected re-export of the same size with an edit near the end imports again,
+that a file with its own date column is the same import whatever default day
+it is uploaded with, and that a file missing required columns is rejected
+without leaving an import row behind. Prints one line per check and exits 1
+if any fails.
+"""
+import os, sys, tempfile
+
+def export(path, rows, roas="2.5"):
+    with open(path, "w") as f:
+        f.write("name,date,spend,roas,impressions,clicks,conversions\n")
+        for i in range(rows): f.write(f"Campaign {i % 50},2025-01-{i % 28 + 1:02d},10.00,{roas if i == rows - 1 else '2.5'},1000,20,2\n")
+
+def main():
+    d = tempfile.mkdtemp()
+    os.environ.update(DB_PATH=os.path.join(d, "imports.db"), HASH_POOL="0", METRICS="0")
+    from backend.core import get_db
+    from backend.ingest import import_csv, CSVImportError
+    con = get_db()
+    failures = []
+    def check(name, ok, detail=""):
+        print(f"{'PASS' if ok else 'FAIL'} {name}" + (f": {detail}" if detail and not ok else ""))
+        if not ok: failures.append(name)
+
+    first, fixed = os.path.join(d, "export.csv"), os.path.join(d, "export-fixed.csv")
+    export(first, 5000); export(fixed, 5000, roas="3.5")
+    check("corrected export same size", os.path.getsize(first) == os.path.getsize(fixed) > 1 << 16)
+    r = import_csv(first, day="2025-02-01", con=con)
+    check("first upload imports", r["status"] == "done" and r["rows"] == 5000, str(r))
+    r = import_csv(first, day="2025-02-01", con=con)
+    check("same bytes again already imported", r["status"] == "already_imported", str(r))
+    r = import_csv(first, day="2025-03-01", con=con)
+    check("dated file ignores the default day", r["status"] == "already_imported", str(r))
+    r = import_csv(fixed, day="2025-02-01", con=con)
+    check("edit past the first block imports again", r["status"] == "done" and r["rows"] == 5000, str(r))
+
+    bad = os.path.join(d, "bad.csv")
+    with open(bad, "w") as f: f.write("name,spend\nCampaign 0,10\n")
+    before = con.execute("SELECT COUNT(*) FROM imports").fetchone()[0]
+    try: import_csv(bad, con=con); rejected = False
+    except CSVImportError: rejected = True
+    after = con.execute("SELECT COUNT(*) FROM imports").fetchone()[0]
+    check("missing columns rejected", rejected)
+    check("rejected file leaves no import row", after == before, f"{before} -> {after} rows")
+    running = con.execute("SELECT COUNT(*) FROM imports WHERE status='running'").fetchone()[0]
+    check("no import stuck running", running == 0, f"{running} running")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
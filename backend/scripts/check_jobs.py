@@ -0,0 +1,135 @@
+"""Job queue regression check: crash recovery, retries, keys, priorities.
+
+    python -m backend.scripts.check_jobs
+
+Runs against a throwaway database with a 1 s lease. A worker process is
+killed with SIGKILL while it holds jobs; a second worker must requeue them
+once their leases run out and finish every job, none lost and none run
+after it was recorded done. Then, in this process: enqueueing a taken key
+returns the same job, enqueueing inside a transaction commits with the
+caller's rows, a failing job backs off and ends `failed` after its
+attempts, higher priorities are claimed first, a late finish from an
+expired attempt is discarded, and heartbeats stop at the job's timeout.
+Prints one line per check and exits 1 if any fails.
+"""
+import argparse, os, signal, subprocess, sys, tempfile, time
+
+def register():
+    from backend import jobs
+    from backend.store import transaction
+
+    @jobs.handler("check.slow")
+    def slow(p):
+        # a row per attempt, committed before the work, so the check can see what ran
+        with transaction() as con: con.execute("INSERT INTO check_runs(n, pid) VALUES(?,?)", (p["n"], os.getpid()))
+        time.sleep(p["secs"])
+        return p["n"]
+
+    @jobs.handler("check.fail", attempts=3)
+    def fail(p): raise RuntimeError("upstream down")
+
+    @jobs.handler("check.order")
+    def order(p): return p["name"]
+
+def child():
+    register()
+    from backend import jobs
+    jobs.Pool(2, kinds=["check.slow"], periodic=False).run_forever()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--child", action="store_true")
+    a = ap.parse_args()
+    if a.child: return child()
+    d = tempfile.mkdtemp()
+    os.environ.update(DB_PATH=os.path.join(d, "jobs.db"), HASH_POOL="0", METRICS="0",
+                      JOBS_LEASE="1", JOBS_POLL="0.05", JOBS_BACKOFF="0.05")
+    register()
+    from backend import jobs
+    from backend.core import get_db
+    from backend.store import db
+    con = get_db()
+    with con: con.execute("CREATE TABLE check_runs(n INTEGER, pid INTEGER)")
+    failures = []
+    def check(name, ok, detail=""):
+        print(f"{'PASS' if ok else 'FAIL'} {name}" + (f": {detail}" if detail and not ok else ""))
+        if not ok: failures.append(name)
+    q = lambda sql, *args: db().execute(sql, args).fetchall()
+
+    # ---------- crash recovery ----------
+    ids = [jobs.enqueue("check.slow", {"n": i, "secs": 0.3}) for i in range(20)]
+    worker = [sys.executable, "-m", "backend.scripts.check_jobs", "--child"]
+    p = subprocess.Popen(worker)
+    deadline = time.time() + 30
+    while time.time() < deadline and not (q("SELECT 1 FROM jobs WHERE status='done'") and q("SELECT 1 FROM jobs WHERE status='running'")):
+        time.sleep(0.02)
+    p.send_signal(signal.SIGKILL); p.wait()
+    inflight = {r[0] for r in q("SELECT id FROM jobs WHERE status='running'")}
+    done_before = {r[0] for r in q("SELECT id FROM jobs WHERE status='done'")}
+    check("worker killed mid-job", bool(inflight) and bool(done_before), f"running={len(inflight)} done={len(done_before)}")
+    p = subprocess.Popen(worker)
+    while time.time() < deadline and q("SELECT 1 FROM jobs WHERE kind='check.slow' AND status!='done'"): time.sleep(0.05)
+    p.send_signal(signal.SIGTERM); p.wait()
+    rows = {r["id"]: r for r in q("SELECT id, status, attempts, result, error FROM jobs WHERE kind='check.slow'")}
+    check("every job done after restart", all(rows[i]["status"] == "done" for i in ids),
+          str({i: rows[i]["status"] for i in ids if rows[i]["status"] != "done"}))
+    check("in-flight jobs re-ran", all(rows[i]["attempts"] == 2 for i in inflight),
+          str({i: rows[i]["attempts"] for i in inflight}))
+    check("finished jobs not re-run", all(rows[i]["attempts"] == 1 for i in done_before),
+          str({i: rows[i]["attempts"] for i in done_before if rows[i]["attempts"] != 1}))
+    runs = q("SELECT n, COUNT(*) c FROM check_runs GROUP BY n")
+    check("one run per attempt", sorted(r["n"] for r in runs) == list(range(20)) and
+          sum(r["c"] for r in runs) == sum(rows[i]["attempts"] for i in ids))
+    check("results recorded", [rows[i]["result"] for i in ids] == [str(n) for n in range(20)])
+
+    # ---------- idempotency keys ----------
+    k1 = jobs.enqueue("check.order", {"name": "x"}, key="once")
+    k2 = jobs.enqueue("check.order", {"name": "y"}, key="once")
+    check("taken key returns the same job", k1 == k2 and len(q("SELECT 1 FROM jobs WHERE key='once'")) == 1)
+    jobs.drain(["check.order"])
+
+    # ---------- transactional enqueue ----------
+    from backend import schema
+    from backend.store import transaction
+    schema._checked.clear()  # as in a freshly forked worker: the first enqueue would check the schema
+    with transaction() as tx:
+        tx.execute("INSERT INTO check_runs(n, pid) VALUES(-1, 0)")
+        t = jobs.enqueue("check.order", {"name": "tx"}, key="tx", con=tx)
+        c = db(); c.execute("SELECT 1"); c.close()  # a nested open/close of the pooled connection
+    check("enqueue in a transaction keeps the caller's rows", q("SELECT 1 FROM check_runs WHERE n=-1") and jobs.get(t) is not None)
+    jobs.drain(["check.order"])
+
+    # ---------- retries ----------
+    f = jobs.enqueue("check.fail")
+    deadline = time.time() + 10
+    while time.time() < deadline and jobs.get(f)["status"] != "failed":
+        jobs.drain(["check.fail"]); time.sleep(0.05)
+    j = jobs.get(f)
+    check("failing job retried then failed", j["status"] == "failed" and j["attempts"] == 3 and "upstream down" in (j["error"] or ""),
+          f"{j['status']} after {j['attempts']} attempts")
+
+    # ---------- priorities ----------
+    order = [jobs.enqueue("check.order", {"name": n}, priority=pr) for n, pr in (("low", 0), ("high", 9), ("mid", 5), ("low2", 0))]
+    jobs.drain(["check.order"])
+    got = [r["result"] for r in q(f"SELECT result FROM jobs WHERE id IN ({','.join(map(str, order))}) ORDER BY started_at")]
+    check("higher priority claimed first", got == ['"high"', '"mid"', '"low"', '"low2"'], str(got))
+
+    # ---------- fencing and timeouts ----------
+    s = jobs.enqueue("check.order", {"name": "fenced"}, timeout=2)
+    first = jobs.claim("a", ["check.order"])
+    jobs.heartbeat([first], now=time.time() + 30)
+    capped = q("SELECT lease_until - started_at FROM jobs WHERE id=?", s)[0][0]
+    check("heartbeat stops at the timeout", abs(capped - 2) < 0.01, f"lease ends {capped:.2f} s after start")
+    jobs.recover(now=time.time() + 60)
+    second = jobs.claim("b", ["check.order"], now=time.time() + 60)
+    late = jobs._finish(first, "stale", None, 1.0)
+    now = jobs._finish(second, "fresh", None, 1.0)
+    j = jobs.get(s)
+    check("late finish from an expired attempt discarded", late is None and now == "done" and j["result"] == "fresh" and j["attempts"] == 2,
+          f"late={late} result={j['result']}")
+
+    print(f"{len(failures)} failures")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Migration regression check: legacy database shapes up to the latest version.
+
+    python -m backend.scripts.check_migrations
+
+Builds throwaway databases in the shapes older code left behind: the tables
+app.py's init_db() created before versioning, and the ones auth.py and
+social.py created on their own (posts without user_id, a connections table).
+Each is migrated from version 0 to the latest, then compared with a new
+database: same tables, columns, indexes and triggers. Also checks that owned
+posts survive with their search index and metric columns, that duplicate
+tokens collapse to one and that the legacy connections table is gone.
+Prints one line per check and exits 1 if any fails.
+"""
+import os, sqlite3, sys, tempfile
+
+LEGACY = {
+    # backend/app.py init_db() before schema versioning
+    "app.py": ["""CREATE TABLE users(id INTEGER PRIMARY KEY AUTOINCREMENT, email TEXT UNIQUE NOT NULL,
+                  password_hash TEXT NOT NULL, created_at TEXT NOT NULL)""",
+               """CREATE TABLE tokens(id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, platform TEXT, access_token TEXT,
+                  refresh_token TEXT, expires_at INTEGER, raw TEXT, created_at TEXT DEFAULT CURRENT_TIMESTAMP)""",
+               """CREATE TABLE posts(id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, platform TEXT, title TEXT,
+                  caption TEXT, metrics TEXT, created_at TEXT)""",
+               """CREATE TABLE contacts(id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, email TEXT, company TEXT, phone TEXT,
+                  message TEXT, created_at TEXT)""",
+               "INSERT INTO users(email, password_hash, created_at) VALUES('a@example.com', 'x', '2024-01-01')",
+               "INSERT INTO tokens(user_id, platform, access_token) VALUES(1, 'tiktok', 'old'), (1, 'tiktok', 'new')",
+               """INSERT INTO posts(user_id, platform, title, caption, metrics, created_at)
+                  VALUES(1, 'Tiktok', 'Spring drop', 'new arrivals', '{"likes": 7}', '2024-02-01')"""],
+    # backend/auth.py users, then backend/social.py's posts and connections
+    "auth.py + social.py": ["CREATE TABLE users(id INTEGER PRIMARY KEY, email TEXT UNIQUE, pw_hash TEXT, created_at TEXT)",
+                            "CREATE TABLE posts(id INTEGER PRIMARY KEY, platform TEXT, title TEXT, caption TEXT, metrics TEXT, created_at TEXT)",
+                            "CREATE TABLE connections(id INTEGER PRIMARY KEY, platform TEXT, access_token TEXT, refresh_token TEXT, created_at TEXT)",
+                            "INSERT INTO users(email, pw_hash, created_at) VALUES('b@example.com', 'y', '2024-01-01')",
+                            """INSERT INTO posts(platform, title, caption, metrics, created_at)
+                               VALUES('Instagram', 'Spring drop', 'New arrivals', '{"likes": 420}', datetime('now'))""",
+                            "INSERT INTO connections(platform, access_token) VALUES('tiktok', 'demo')"],
+}
+
+def shape(path):
+    con = sqlite3.connect(path)
+    try:
+        objects = {(t, n) for t, n in con.execute("SELECT type, name FROM sqlite_master WHERE name NOT LIKE 'sqlite_%'")}
+        columns = {n: [r[1] for r in con.execute(f"PRAGMA table_xinfo({n})")] for t, n in objects if t == "table"}
+        return objects, columns
+    finally:
+        con.close()
+
+def main():
+    d = tempfile.mkdtemp()
+    os.environ.update(DB_PATH=os.path.join(d, "main.db"), HASH_POOL="0", METRICS="0")
+    from backend import schema
+    failures = []
+    def check(name, ok, detail=""):
+        print(f"{'PASS' if ok else 'FAIL'} {name}" + (f": {detail}" if detail and not ok else ""))
+        if not ok: failures.append(name)
+
+    fresh = os.path.join(d, "fresh.db")
+    schema.migrate(fresh)
+    want_objects, want_columns = shape(fresh)
+    for label, sql in LEGACY.items():
+        path = os.path.join(d, f"{label.replace(' ', '').replace('+', '_')}.db")
+        con = sqlite3.connect(path)
+        for s in sql: con.execute(s)
+        con.commit(); con.close()
+        try: applied = schema.migrate(path)
+        except Exception as e:
+            check(f"{label}: migrates", False, f"{type(e).__name__}: {e}"); continue
+        check(f"{label}: migrates", len(applied) == schema.latest(), str(applied))
+        objects, columns = shape(path)
+        check(f"{label}: same objects as a new database", objects == want_objects,
+              f"missing {sorted(want_objects - objects)}, extra {sorted(objects - want_objects)}")
+        check(f"{label}: same columns as a new database", columns == want_columns,
+              str({t: c for t, c in columns.items() if c != want_columns.get(t)}))
+        con = sqlite3.connect(path)
+        q = lambda sql, *args: con.execute(sql, args).fetchall()
+        check(f"{label}: users kept", len(q("SELECT id FROM users")) == 1)
+        check(f"{label}: no connections table", not q("SELECT 1 FROM sqlite_master WHERE name='connections'"))
+        if label == "app.py":
+            check(f"{label}: one token per user and platform", q("SELECT access_token FROM tokens") == [("new",)],
+                  str(q("SELECT access_token FROM tokens")))
+            check(f"{label}: platform label canonical", q("SELECT platform FROM posts") == [("TikTok",)], str(q("SELECT platform FROM posts")))
+            check(f"{label}: metric column", q("SELECT likes FROM posts") == [(7,)], str(q("SELECT likes FROM posts")))
+            hits = q("""SELECT rowid FROM posts_fts WHERE posts_fts MATCH 'user_id:"1" AND {title caption}: "spring"'""")
+            check(f"{label}: post searchable by owner", hits == [(1,)], str(hits))
+        else:
+            # posts with no owner break the new foreign key: unify() deletes them
+            check(f"{label}: unowned posts dropped", not q("SELECT id FROM posts"), str(q("SELECT id FROM posts")))
+        con.close()
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
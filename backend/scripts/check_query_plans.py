@@ -0,0 +1,154 @@
+"""Query-plan regression check: no hot query may fall back to a full table scan.
+
+    python -m backend.scripts.check_query_plans [--posts 2000] [-v]
+
+Migrates a throwaway database to the current schema, seeds it, then drives
+the web routes through the test client and runs the background jobs with
+every SQL statement traced. Each distinct statement is run through EXPLAIN
+QUERY PLAN and the check fails (exit 1) on any `SCAN <table>` line unless:
+- it is a constant row, a virtual table (FTS5 does its own indexing) or a
+  subquery result SQLite materialized itself,
+- it walks an index (`SCAN t USING [COVERING] INDEX`) in a statement with a
+  LIMIT, which is how keyset pages read in index order and stop early,
+- the statement matches ALLOWED, with the reason it is meant to read
+  everything.
+It also fails if a HOT lookup never shows up as an index SEARCH, or if a
+foreign key has no index on its child columns. Run it in CI after schema or
+query changes.
+"""
+import argparse, io, json, os, re, sqlite3, sys, tempfile, time
+
+# statements that read whole tables on purpose: (pattern over normalized SQL, reason)
+ALLOWED = [
+    (r"^SELECT id,name FROM campaigns ORDER BY id$|^SELECT id,spend,impressions,clicks,conversions,roas FROM campaigns$"
+     r"|^SELECT campaign_id,SUM\(.* FROM campaign_weekly GROUP BY campaign_id$", "analytics engine loads every campaign (cached until the next import)"),
+    (r"^SELECT c\.account_id, .* FROM campaigns c LEFT JOIN accounts a .* GROUP BY c\.account_id$", "per-account baselines for scoring, once per rebuild"),
+    (r"^DELETE FROM (campaign_stats|post_metrics) WHERE day<\?", "retention prune: periodic job that deletes by age"),
+    (r"^SELECT kind, status, COUNT\(\*\) n FROM jobs GROUP BY kind, status$", "queue depth for /api/jobs/stats: an index-only count of jobs kept JOBS_KEEP_DAYS"),
+]
+# (table, column) lookups that must be index SEARCHes
+HOT = [("users", "email"), ("tokens", "user_id"), ("posts", "user_id")]
+SKIP = re.compile(r"^\s*(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE|PRAGMA|CREATE|DROP|ALTER|ANALYZE|EXPLAIN|--|.*\bsqlite_master\b)", re.I)
+
+def normalize(sql):
+    sql = re.sub(r"'(?:[^']|'')*'", "?", sql)
+    sql = re.sub(r"\b-?\d+(?:\.\d+)?\b", "?", sql)
+    return re.sub(r"\s+", " ", sql).strip()
+
+def plan(con, sql):
+    return [r[3] for r in con.execute("EXPLAIN QUERY PLAN " + sql)]
+
+def problems(sql, lines):
+    norm = normalize(sql)
+    for pat, reason in ALLOWED:
+        if re.search(pat, norm, re.I): return [], reason
+    bad = []
+    # subquery results SQLite built itself are meant to be scanned
+    temp = {m.group(2) for m in (re.match(r"(MATERIALIZE|CO-ROUTINE) (\S+)", l) for l in lines) if m}
+    for line in lines:
+        m = re.match(r"SCAN (\S+)(.*)", line)
+        if not m or m.group(1) in temp or m.group(1) == "CONSTANT" or "VIRTUAL TABLE" in m.group(2): continue
+        if "INDEX" in m.group(2) and re.search(r"\bLIMIT\b", norm, re.I): continue
+        bad.append(line)
+    return bad, None
+
+def unindexed_foreign_keys(con):
+    """Child columns with no index starting with them: every parent delete would scan the child."""
+    out = []
+    for (table,) in con.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'").fetchall():
+        fks = {}
+        for r in con.execute(f"PRAGMA foreign_key_list({table})"): fks.setdefault(r[0], []).append(r[3])
+        heads = [[c[2] for c in con.execute(f"PRAGMA index_info({ix[1]})")] for ix in con.execute(f"PRAGMA index_list({table})")]
+        heads += [[c[1] for c in sorted(con.execute(f"PRAGMA table_info({table})"), key=lambda c: c[5]) if c[5]]]  # primary key
+        for cols in fks.values():
+            if not any(h[:len(cols)] == cols for h in heads): out.append(f"{table}({', '.join(cols)})")
+    return out
+
+def seed(con, posts):
+    from backend import feed
+    plats = list(feed.LABELS.values())
+    with con:
+        con.executemany("INSERT INTO posts(user_id,platform,external_id,title,caption,metrics,created_at) VALUES(?,?,?,?,?,?,?)",
+                        ((1 + i % 2, plats[i % len(plats)], f"x{i}", f"spring drop {i}", "launch review", json.dumps({"likes": i % 97, "views": i}),
+                          f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}T00:00:00") for i in range(posts)))
+        con.execute("INSERT INTO tokens(user_id,platform,access_token,refresh_token,expires_at) VALUES(1,'tiktok','a','r',?)", (int(time.time()) + 600,))
+        con.execute("INSERT INTO contacts(name,email,company,message,created_at) VALUES('Ann','ann@example.com','Acme','spring pricing','2024-01-01')")
+
+def register(c):
+    for email in ("plan@example.com", "other@example.com"):
+        assert c.post("/api/register", json={"email": email, "password": "pw-123456"}).status_code == 200; c.post("/api/logout")
+
+def drive(c, csv_path):
+    from backend import jobs, timeseries
+    from backend.recommendations import build_recommendations
+    from backend.tokens import TokenRefresher
+    assert c.post("/api/login", json={"email": "plan@example.com", "password": "pw-123456"}).status_code == 200
+    with open(csv_path, "rb") as f:
+        r = c.post("/api/campaigns/import", data={"file": (io.BytesIO(f.read()), "c.csv"), "date": "2024-03-04"})
+    assert r.status_code == 200
+    rebuild = r.get_json()["recommendations_job"]
+    gets = ["/health", "/api/me", "/api/kpis", "/api/trends", "/api/insights", "/api/social/connections",
+            "/api/posts", "/api/posts?platform=tiktok,instagram", "/api/posts?since=2024-03-01&until=2024-06-01",
+            "/api/search?q=spring", "/api/search?q=spring&platform=tiktok&since=2024-02-01", "/api/search?q=pricing&types=contacts"]
+    gets += [f"/api/posts?sort={s}" for s in ("recent", "likes", "comments", "plays", "views")]
+    for path in gets: assert c.get(path).status_code == 200, path
+    for sort in ("recent", "likes"):
+        cursor = c.get(f"/api/posts?sort={sort}&limit=5").get_json()["next_cursor"]
+        assert c.get(f"/api/posts?sort={sort}&limit=5&cursor={cursor}").status_code == 200
+    post_id = c.get("/api/posts?limit=1").get_json()["posts"][0]["id"]
+    assert c.get(f"/api/posts/{post_id}/metrics").status_code == 200
+    assert c.post("/api/social/mock_pull").status_code == 200
+    assert c.post("/api/playbook", json={"days": 7}).status_code == 200
+    assert c.post("/api/contact", json={"name": "Bo", "email": "bo@example.com", "message": "hi"}).status_code == 200
+    jobs.drain(["recs.rebuild"]); jobs.drain()
+    assert c.get(f"/api/jobs/{rebuild}").get_json()["job"]["status"] == "done"
+    assert c.get("/api/jobs/stats").status_code == 200
+    jobs.heartbeat([jobs.get(rebuild)]); jobs.recover(); jobs.schedule(); jobs.purge()
+    build_recommendations(full=True); build_recommendations()
+    TokenRefresher().load()
+    timeseries.prune()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--posts", type=int, default=2000)
+    ap.add_argument("-v", "--verbose", action="store_true", help="print every statement's plan")
+    a = ap.parse_args()
+    d = tempfile.mkdtemp()
+    os.environ.update(DB_PATH=os.path.join(d, "plans.db"), ADMIN_EMAILS="plan@example.com", HASH_POOL="0", METRICS="0")
+    from backend import store
+    traced, on = {}, [False]
+    connect = store.connect
+    def tracing_connect(path=None):
+        con = connect(path)
+        con.set_trace_callback(lambda sql: on[0] and not SKIP.match(sql) and traced.setdefault(normalize(sql), sql))
+        return con
+    store.connect = tracing_connect
+    from backend.app import create_app
+    from backend.core import get_db
+    app = create_app()
+    con, client = get_db(), app.test_client()
+    on[0] = True; register(client); on[0] = False
+    seed(con, a.posts)
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    on[0] = True
+    drive(client, os.path.join(root, "data", "sample_campaigns.csv"))
+    on[0] = False
+    failed, hot = 0, {h: False for h in HOT}
+    for norm, sql in sorted(traced.items()):
+        try: lines = plan(con, sql)
+        except sqlite3.Error as e: print(f"?? {norm}\n   {e}"); continue
+        for table, col in HOT:
+            if any(re.match(rf"SEARCH {table} USING .*INDEX .*\({col}=", l) for l in lines): hot[(table, col)] = True
+        bad, reason = problems(sql, lines)
+        if bad:
+            failed += 1; print(f"FAIL {norm}"); [print(f"     {l}") for l in lines]
+        elif a.verbose:
+            print(f"ok   {norm}" + (f"  [allowed: {reason}]" if reason else "")); [print(f"     {l}") for l in lines]
+    for fk in unindexed_foreign_keys(con): failed += 1; print(f"FAIL no index for foreign key {fk}")
+    for (table, col), seen in hot.items():
+        if not seen: failed += 1; print(f"FAIL no index search on {table}({col})")
+    print(f"{len(traced)} statements, {failed} problems")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
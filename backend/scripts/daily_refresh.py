@@ -1,4 +1,14 @@
-from backend.app import get_db, build_recommendations
-con=get_db()
-build_recommendations(con)
-print("Refreshed")
+"""Run today's daily refresh (recommendations, rollup pruning, job purge) now.
+
+    python -m backend.scripts.daily_refresh
+
+Running workers schedule the same job themselves once a day; its key is the
+day, so whichever of the two comes first does the work and the other finds it
+done.
+"""
+import json, time
+from backend import jobs
+
+job = jobs.enqueue("daily.refresh", key=f"daily.refresh@{int(time.time() // 86400)}")
+jobs.drain(["daily.refresh"])
+print(json.dumps(jobs.get(job)))
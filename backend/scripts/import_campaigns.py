@@ -0,0 +1,22 @@
+"""Stream a campaign metrics CSV export into the database.
+
+    python -m backend.scripts.import_campaigns export.csv [--account "Client A"] [--date 2025-10-01]
+
+Safe to re-run after a crash: the import resumes from the last committed chunk
+once the crashed run's claim has lapsed (IMPORT_LEASE seconds).
+"""
+import argparse
+from backend.core import get_db
+from backend.recommendations import build_recommendations
+from backend.ingest import import_csv, CHUNK
+
+ap = argparse.ArgumentParser()
+ap.add_argument("path")
+ap.add_argument("--account", default="Default", help="account for rows without an account column")
+ap.add_argument("--date", default=None, help="day for rows without a date column (default: today)")
+ap.add_argument("--chunk", type=int, default=CHUNK)
+a = ap.parse_args()
+con = get_db()
+stats = import_csv(a.path, account=a.account, day=a.date, chunk=a.chunk, con=con)
+print("Imported", stats)
+print("Refreshed", build_recommendations())
@@ -0,0 +1,26 @@
+"""Bring the database schema up to date.
+
+    python -m backend.scripts.migrate [--status] [--to N]
+
+Runs in the Procfile release phase, before new web workers start. Safe to
+re-run and to race with another migrator: each step re-checks the version
+under the write lock. With SHARDS set every shard file is migrated after
+DB_PATH, one JSON line per file.
+"""
+import argparse, json, os, time
+from backend import schema, shards
+from backend.store import db
+
+ap = argparse.ArgumentParser()
+ap.add_argument("--status", action="store_true", help="print the current and latest version and exit")
+ap.add_argument("--to", type=int, help="stop at this version")
+a = ap.parse_args()
+for k in [0] + (shards.shard_ids() if shards.enabled() else []):
+    path = shards.path(k); tag = {"db": path} if shards.enabled() else {}
+    if k and not a.status and not os.path.exists(path): shards.shard_db(k).close()  # new shards start at the latest version
+    con = db(path); v = schema.version(con); con.close()
+    if a.status:
+        print(json.dumps({**tag, "version": v, "latest": schema.latest(), "pending": [m.__name__ for m in schema.MIGRATIONS[v:]]}))
+    else:
+        t = time.perf_counter(); applied = schema.migrate(path, target=a.to)
+        print(json.dumps({**tag, "from": v, "to": v + len(applied), "applied": applied, "seconds": round(time.perf_counter() - t, 3)}))
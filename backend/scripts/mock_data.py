@@ -1,13 +1,41 @@
-import random
-from backend.app import get_db, build_recommendations, init_db
+"""Seed demo or synthetic data.
+
+    python -m backend.scripts.mock_data                    # one demo account with four campaigns
+    python -m backend.scripts.mock_data --scale small      # small | medium | large, see SCALES
+    python -m backend.scripts.mock_data --scale medium --posts 1000 --seed 7
+
+A scale adds users (all with the password --password, default
+"bench-pass-1", hashed once), OAuth tokens, posts with metrics, ad accounts
+with campaigns and a daily stats row per campaign for --days days, and
+contact messages. Rows go through the same shards, triggers and rollups as
+live writes, and recommendations are built at the end. The same --seed
+gives the same dataset; benchmarks (bench_routes) rely on that.
+"""
+import argparse, json, random, time
+from datetime import date, datetime, timedelta
+from backend import feed, passwords, shards
+from backend.core import get_db
+from backend.ingest import refresh_snapshots
+from backend.recommendations import build_recommendations
+from backend.store import transaction
+
+# per-user and per-account counts multiply out: large is 1M posts and 900k campaign days
+SCALES = {
+    "small": {"users": 20, "tokens": 3, "posts": 200, "accounts": 5, "campaigns": 20, "days": 60, "contacts": 200},
+    "medium": {"users": 200, "tokens": 3, "posts": 500, "accounts": 20, "campaigns": 25, "days": 90, "contacts": 2000},
+    "large": {"users": 2000, "tokens": 4, "posts": 500, "accounts": 100, "campaigns": 50, "days": 180, "contacts": 20000},
+}
+PASSWORD = "bench-pass-1"
+WORDS = ("spring drop", "launch", "review", "haul", "try-on", "behind the scenes", "unboxing", "tutorial",
+         "creator collab", "giveaway", "price anchor", "social proof", "hook test", "case study")
 
 def seed():
-    init_db()
     con=get_db(); cur=con.cursor()
     # Create a sample account
     cur.execute("INSERT INTO accounts(name,platform,external_id,monthly_spend) VALUES(?,?,?,?)",
                 ("Client A","Meta","meta_abc",45000))
     acc_id=cur.lastrowid
+    con.commit()
 
     def mk(name):
         spend=random.uniform(100,2000); roas=random.uniform(0.3,3.5); cpa=random.uniform(10,120)
@@ -15,12 +43,90 @@ def seed():
         clicks=int(imps*ctr/100); conv=int(clicks*0.02)
         return (acc_id,name,"active",spend,cpa,roas,ctr,imps,clicks,conv)
 
-    for n in ["Prospecting - Broad","Remarketing - 7d","Creators - UGC","Search - Brand"]:
-        cur.execute("""INSERT INTO campaigns(account_id,name,status,spend,cpa,roas,ctr,impressions,clicks,conversions)
-                       VALUES (?,?,?,?,?,?,?,?,?,?)""", mk(n))
-    con.commit()
-    build_recommendations(con)
+    # campaigns live in the account's shard (DB_PATH unless SHARDS is set)
+    with shards.account_tx(acc_id) as s:
+        shards.adopt_accounts(s, [(acc_id, "Client A")])
+        s.executemany("""INSERT INTO campaigns(account_id,name,status,spend,cpa,roas,ctr,impressions,clicks,conversions)
+                         VALUES (?,?,?,?,?,?,?,?,?,?)""", [mk(n) for n in ["Prospecting - Broad","Remarketing - 7d","Creators - UGC","Search - Brand"]])
+    build_recommendations()
     print("Seeded.")
 
+def seed_scale(users, tokens, posts, accounts, campaigns, days, contacts, password=PASSWORD, seed=1):
+    """Synthetic dataset; returns row counts and seconds per table group."""
+    rnd = random.Random(seed)
+    out, t = {}, time.perf_counter()
+    get_db().close()
+    now = datetime.utcnow().replace(microsecond=0)
+    ph = passwords.hash_password(password)
+    with transaction() as con:
+        base = con.execute("SELECT COALESCE(MAX(id), 0) FROM users").fetchone()[0]
+        rows = [(base + i, f"user{base + i}@bench.example", ph, (now - timedelta(days=rnd.randrange(365))).isoformat())
+                for i in range(1, users + 1)]
+        con.executemany("INSERT INTO users(id,email,password_hash,created_at) VALUES(?,?,?,?)", rows)
+    for uid, email, _, created in rows: shards.add_user(uid, email, created)
+    out["users"] = users
+
+    plats = list(feed.LABELS)
+    n_tok = n_posts = 0
+    for uid, *_ in rows:
+        mine = rnd.sample(plats, min(tokens, len(plats)))
+        with shards.user_tx(uid) as con:
+            con.executemany("INSERT INTO tokens(user_id,platform,access_token,refresh_token,expires_at) VALUES(?,?,?,?,?)",
+                            [(uid, p, f"acc-{uid}-{p}", f"ref-{uid}-{p}", int(time.time()) + rnd.randrange(60, 7 * 86400)) for p in mine])
+            con.executemany("INSERT INTO posts(user_id,platform,external_id,title,caption,metrics,created_at) VALUES(?,?,?,?,?,?,?)",
+                            [_post(rnd, uid, i, feed.LABELS[rnd.choice(mine or plats)], now) for i in range(posts)])
+        n_tok += len(mine); n_posts += posts
+    out.update(tokens=n_tok, posts=n_posts, users_seconds=round(time.perf_counter() - t, 2))
+
+    t = time.perf_counter()
+    with transaction() as con:
+        accts = [(con.execute("INSERT INTO accounts(name,platform,external_id,monthly_spend,target_roas) VALUES(?,?,?,?,?)",
+                              (f"Bench {a}", rnd.choice(("Meta", "Google", "TikTok")), f"bench_{a}", rnd.uniform(5e3, 1e5), 2.0)).lastrowid, f"Bench {a}")
+                 for a in range(accounts)]
+    start = date.today() - timedelta(days=days)
+    n_days = 0
+    for aid, name in accts:
+        with shards.account_tx(aid) as con:
+            shards.adopt_accounts(con, [(aid, name)])
+            ids = [con.execute("INSERT INTO campaigns(account_id,name,status) VALUES(?,?,?)",
+                               (aid, f"{rnd.choice(WORDS).title()} {c}", rnd.choice(("active", "active", "active", "paused")))).lastrowid
+                   for c in range(campaigns)]
+            stats = []
+            for cid in ids:
+                scale, roas = rnd.uniform(50, 2000), rnd.uniform(0.3, 4)
+                for d in range(days):
+                    spend = scale * rnd.uniform(0.6, 1.4); imps = int(spend * rnd.uniform(40, 120)); clicks = int(imps * rnd.uniform(0.003, 0.03))
+                    stats.append((cid, (start + timedelta(days=d)).isoformat(), spend, imps, clicks, int(clicks * rnd.uniform(0.01, 0.06)),
+                                  spend * roas * rnd.uniform(0.7, 1.3)))
+            con.executemany("INSERT INTO campaign_stats(campaign_id,day,spend,impressions,clicks,conversions,revenue) VALUES(?,?,?,?,?,?,?)", stats)
+            refresh_snapshots(con, ids)
+        n_days += len(stats)
+    out.update(accounts=accounts, campaigns=accounts * campaigns, campaign_days=n_days, campaigns_seconds=round(time.perf_counter() - t, 2))
+
+    t = time.perf_counter()
+    with transaction() as con:
+        con.executemany("INSERT INTO contacts(name,email,company,phone,message,created_at) VALUES(?,?,?,?,?,?)",
+                        [(f"Lead {i}", f"lead{i}@example.com", f"Company {i % 97}", None, f"Question about {rnd.choice(WORDS)} pricing",
+                          (now - timedelta(minutes=i)).isoformat()) for i in range(contacts)])
+    out["contacts"] = contacts
+    out["recommendations"] = build_recommendations(full=True)
+    out["finish_seconds"] = round(time.perf_counter() - t, 2)
+    return out
+
+def _post(rnd, uid, i, platform, now):
+    likes = int(rnd.paretovariate(1.2) * 50)
+    m = {"likes": likes, "comments": likes // rnd.randint(8, 40), "plays": likes * rnd.randint(5, 30), "views": likes * rnd.randint(10, 60)}
+    return (uid, platform, f"bench-{uid}-{i}", f"{rnd.choice(WORDS).title()} {i}", " ".join(rnd.sample(WORDS, 3)), json.dumps(m),
+            (now - timedelta(minutes=rnd.randrange(365 * 24 * 60))).isoformat())
+
 if __name__=="__main__":
-    seed()
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--scale", choices=SCALES)
+    for k in SCALES["small"]: ap.add_argument(f"--{k}", type=int, help="override the scale's count" + (" (per user)" if k in ("tokens", "posts") else " (per account)" if k in ("campaigns", "days") else ""))
+    ap.add_argument("--password", default=PASSWORD)
+    ap.add_argument("--seed", type=int, default=1)
+    a = ap.parse_args()
+    if not a.scale: seed()
+    else:
+        counts = {k: getattr(a, k) if getattr(a, k) is not None else v for k, v in SCALES[a.scale].items()}
+        print(json.dumps({"scale": a.scale, **seed_scale(**counts, password=a.password, seed=a.seed)}))
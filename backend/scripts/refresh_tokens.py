@@ -0,0 +1,17 @@
+"""Keep OAuth tokens fresh ahead of expiry.
+
+    python -m backend.scripts.refresh_tokens [--once]
+"""
+import argparse, json
+from backend.tokens import TokenRefresher
+from backend import schema
+
+ap = argparse.ArgumentParser()
+ap.add_argument("--once", action="store_true", help="refresh what is due now and exit")
+a = ap.parse_args()
+schema.ensure()
+r = TokenRefresher()
+if a.once:
+    r.run_once(); print(json.dumps(r.stats))
+else:
+    r.run_forever()
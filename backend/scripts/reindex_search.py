@@ -0,0 +1,21 @@
+"""Rebuild the full-text search indexes from posts and contacts.
+
+    python -m backend.scripts.reindex_search [--no-optimize]
+
+Triggers keep the indexes current; run this after bulk loads that bypassed
+them, after restoring a backup, or to merge index segments (optimize). With
+SHARDS set, DB_PATH (contacts) and every shard (posts) are reindexed.
+"""
+import argparse, time
+from backend import shards
+from backend.search import INDEXES, reindex
+
+ap = argparse.ArgumentParser()
+ap.add_argument("--no-optimize", action="store_true", help="skip merging index segments")
+a = ap.parse_args()
+for k in [0] + (shards.shard_ids() if shards.enabled() else []):
+    con = shards.shard_db(k)
+    t = time.perf_counter()
+    reindex(con, optimize=not a.no_optimize)
+    print("Reindexed", shards.path(k), {fts: con.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for fts, (table, _) in INDEXES.items()},
+          f"in {time.perf_counter() - t:.1f}s")
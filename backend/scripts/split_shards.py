@@ -0,0 +1,106 @@
+"""Split a single-file database into shards.
+
+    SHARDS=4 python -m backend.scripts.split_shards [--shard-dir DIR]
+
+Offline: stop the web workers and jobs first, and set the same SHARDS (and
+SHARD_ROUTER, if any) the app will run with. DB_PATH becomes the global
+database; its users, accounts, contacts, imports and cache generations stay
+where they are. Each user's tokens, posts and post snapshots and each
+account's campaigns, stats, rollups and recommendations are copied into
+SHARD_DIR/shard-NNN.db, with the user and account rows their foreign keys
+need. Row ids move into their shard's range (id + (k << 40)) along with the
+columns that reference them, so post and insight ids a client kept from
+before the split change. The tenant tables in DB_PATH are left as they were,
+as a fallback copy; nothing reads them once SHARDS is set.
+
+Refuses to write over existing shard files. Exits 1 if the copied rows don't
+add up to the source or a shard fails its foreign key check.
+"""
+import argparse, json, os, sys, time
+
+ap = argparse.ArgumentParser()
+ap.add_argument("--shard-dir", help="default: SHARD_DIR or <dir of DB_PATH>/shards")
+a = ap.parse_args()
+if a.shard_dir: os.environ["SHARD_DIR"] = a.shard_dir
+from backend import shards
+from backend.core import get_db
+from backend.store import DB_PATH
+
+# (table, join, owner expression, id remaps); owner is the user or account id the row routes by
+USER_TABLES = [
+    ("tokens", "", "t.user_id", {"id": "t.id"}),
+    ("posts", "", "t.user_id", {"id": "t.id"}),
+    ("post_metrics", "JOIN src.posts p ON p.id=t.post_id", "p.user_id", {"post_id": "t.post_id"}),
+]
+ACCOUNT_TABLES = [
+    ("campaigns", "", "t.account_id", {"id": "t.id"}),
+    ("campaign_stats", "JOIN src.campaigns c ON c.id=t.campaign_id", "c.account_id", {"campaign_id": "t.campaign_id"}),
+    ("stats_daily", "", "t.account_id", {}),
+    ("stats_weekly", "", "t.account_id", {}),
+    ("campaign_weekly", "JOIN src.campaigns c ON c.id=t.campaign_id", "c.account_id", {"campaign_id": "t.campaign_id"}),
+    ("recommendations", "JOIN src.campaigns c ON c.id=t.campaign_id", "c.account_id", {"id": "t.id", "campaign_id": "t.campaign_id"}),
+    ("campaign_scores", "JOIN src.campaigns c ON c.id=t.campaign_id", "c.account_id", {"campaign_id": "t.campaign_id"}),
+    ("import_campaigns", "JOIN src.campaigns c ON c.id=t.campaign_id", "c.account_id", {"campaign_id": "t.campaign_id"}),
+]
+# rebuilt by triggers while copying; replaced with the source's rows (which outlive pruned raw days) afterwards
+DERIVED = ("post_metrics", "stats_daily", "stats_weekly", "campaign_weekly")
+
+def columns(con, table):
+    # table_xinfo hidden: 0 plain, 2/3 generated
+    return [r[1] for r in con.execute(f"PRAGMA table_xinfo({table})") if r[6] == 0]
+
+def copy(con, table, join, owner, remap, route, k, only=None):
+    cols = only or columns(con, table)
+    off = k << shards.ID_BITS
+    exprs = [f"{remap[c]}+{off}" if c in remap else f"t.{c}" for c in cols]
+    if table in DERIVED: con.execute(f"DELETE FROM {table}")
+    return con.execute(f"INSERT INTO {table}({','.join(cols)}) SELECT {','.join(exprs)} FROM src.{table} t {join} WHERE {route}({owner})=?",
+                       (k,)).rowcount
+
+def split(k):
+    t = time.perf_counter()
+    con = shards.shard_db(k)
+    con.create_function("user_shard", 1, shards.user_shard, deterministic=True)
+    con.create_function("account_shard", 1, shards.account_shard, deterministic=True)
+    con.execute("ATTACH ? AS src", (DB_PATH,))
+    out = {}
+    try:
+        with con:
+            out["users"] = copy(con, "users", "", "t.id", {}, "user_shard", k, only=["id", "email", "created_at"])
+            for table, join, owner, remap in USER_TABLES: out[table] = copy(con, table, join, owner, remap, "user_shard", k)
+            out["accounts"] = copy(con, "accounts", "", "t.id", {}, "account_shard", k)
+            out["imports"] = con.execute("""INSERT INTO imports SELECT * FROM src.imports WHERE id IN (
+                                              SELECT ic.import_id FROM src.import_campaigns ic JOIN src.campaigns c ON c.id=ic.campaign_id
+                                              WHERE account_shard(c.account_id)=?)""", (k,)).rowcount
+            for table, join, owner, remap in ACCOUNT_TABLES: out[table] = copy(con, table, join, owner, remap, "account_shard", k)
+        fts = con.execute("SELECT (SELECT COUNT(*) FROM posts_fts), (SELECT COUNT(*) FROM posts)").fetchone()
+        bad = con.execute("PRAGMA foreign_key_check").fetchall()
+    finally:
+        con.execute("DETACH src"); con.close()
+    problems = [f"foreign key violations: {[tuple(r) for r in bad[:5]]}"] if bad else []
+    if fts[0] != fts[1]: problems.append(f"posts_fts has {fts[0]} rows for {fts[1]} posts")
+    return {"shard": k, "path": shards.path(k), "rows": out, "problems": problems, "seconds": round(time.perf_counter() - t, 2)}
+
+def main():
+    if not shards.enabled(): sys.exit("set SHARDS to the number of shards to split into")
+    existing = [shards.path(k) for k in shards.shard_ids() if os.path.exists(shards.path(k))]
+    if existing: sys.exit(f"shard files already exist: {', '.join(existing)}")
+    src = get_db()  # the source must be at the latest schema too
+    big = [t for t in ("tokens", "posts", "campaigns", "recommendations")
+           if (src.execute(f"SELECT MAX(id) FROM {t}").fetchone()[0] or 0) >> shards.ID_BITS]
+    if big: sys.exit(f"ids too large to move into a shard range: {', '.join(big)}")
+    want = {t: src.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+            for t in ["users", "accounts"] + [t[0] for t in USER_TABLES + ACCOUNT_TABLES]}
+    src.close()
+    results = [split(k) for k in shards.shard_ids()]
+    failed = 0
+    for r in results:
+        print(json.dumps(r)); failed += len(r["problems"])
+    for table, n in want.items():
+        got = sum(r["rows"][table] for r in results)
+        if got != n: failed += 1; print(f"FAIL {table}: {got} rows copied, {n} in {DB_PATH}")
+    print(json.dumps({"shards": len(results), "source": want, "problems": failed}))
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
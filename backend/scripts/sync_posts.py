@@ -0,0 +1,13 @@
+"""Pull posts for every connected user and platform.
+
+    python -m backend.scripts.sync_posts [--workers 16]
+"""
+import argparse, json
+from backend.sync import SyncEngine, WORKERS
+from backend import schema
+
+ap = argparse.ArgumentParser()
+ap.add_argument("--workers", type=int, default=WORKERS)
+a = ap.parse_args()
+schema.ensure()
+print(json.dumps(SyncEngine(workers=a.workers).run(), indent=2))
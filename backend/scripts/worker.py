@@ -0,0 +1,20 @@
+"""Run background jobs (backend/jobs.py) until interrupted.
+
+    python -m backend.scripts.worker [--workers N] [--kinds recs.rebuild,sync.user] [--drain]
+
+Any number of these can run against the same database; jobs are claimed
+atomically. --drain runs what is ready now in this thread and exits.
+"""
+import argparse, json
+from backend import jobs
+
+ap = argparse.ArgumentParser()
+ap.add_argument("--workers", type=int, default=jobs.WORKERS)
+ap.add_argument("--kinds", help="comma-separated job kinds to take (default: all)")
+ap.add_argument("--drain", action="store_true", help="run the ready jobs and exit")
+a = ap.parse_args()
+kinds = a.kinds.split(",") if a.kinds else None
+if a.drain:
+    print(json.dumps(jobs.drain(kinds)))
+else:
+    jobs.Pool(a.workers, kinds).run_forever()
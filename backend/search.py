@@ -0,0 +1,107 @@
+"""Full-text search over posts and contacts (SQLite FTS5).
+
+posts_fts(user_id, title, caption) and contacts_fts(name, company, message)
+are external-content indexes over their tables, kept in sync by triggers, so
+the text is stored once and every writer (sync, mock pull, contact form) is
+indexed in its own transaction. The owner is indexed as a token of its own
+column, so a post search matches `user_id:"<id>" AND {title caption}: (...)`
+inside the index and a common word only ranks the searching user's posts,
+not every user's.
+
+User input never reaches MATCH as syntax: it is split into word tokens,
+each quoted and ANDed, and the last one is a prefix match for search-as-you-type.
+Highlights are built with control-character markers, HTML-escaped, and
+only then wrapped in <mark>, so post text can't inject markup.
+"""
+import html, os, re
+from backend.feed import LABELS
+
+MAX_LIMIT = 50
+MAX_PAGE = 100  # deepest page served: each one ranks page * limit hits per source
+TYPES = ("posts", "contacts")
+# contact-form submissions aren't owned by a user; only these accounts may search them
+ADMIN_EMAILS = {e.strip().lower() for e in os.environ.get("ADMIN_EMAILS", "").split(",") if e.strip()}
+_OPEN, _CLOSE = "\x02", "\x03"
+
+INDEXES = {"posts_fts": ("posts", ("user_id", "title", "caption")),
+           "contacts_fts": ("contacts", ("name", "company", "message"))}
+
+class BadQuery(ValueError):
+    pass
+
+def create_schema(cur):
+    """FTS tables and sync triggers, as the code expects them now; builds the index once for existing rows.
+    Migrations don't call this; backend/schema.py keeps a frozen copy of each version."""
+    for fts, (table, cols) in INDEXES.items():
+        fresh = not cur.execute("SELECT 1 FROM sqlite_master WHERE name=?", (fts,)).fetchone()
+        c = ", ".join(cols); new = ", ".join(f"new.{x}" for x in cols); old = ", ".join(f"old.{x}" for x in cols)
+        cur.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({c}, content='{table}', content_rowid='id', tokenize='unicode61 remove_diacritics 2')")
+        cur.execute(f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN INSERT INTO {fts}(rowid, {c}) VALUES(new.id, {new}); END")
+        cur.execute(f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN INSERT INTO {fts}({fts}, rowid, {c}) VALUES('delete', old.id, {old}); END")
+        cur.execute(f"""CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {c} ON {table} BEGIN
+                          INSERT INTO {fts}({fts}, rowid, {c}) VALUES('delete', old.id, {old});
+                          INSERT INTO {fts}(rowid, {c}) VALUES(new.id, {new}); END""")
+        if fresh: cur.execute(f"INSERT INTO {fts}({fts}) VALUES('rebuild')")
+
+def reindex(con, optimize=True):
+    """Rebuild every FTS index from its content table (after bulk loads or a restore)."""
+    with con:
+        for fts in INDEXES:
+            con.execute(f"INSERT INTO {fts}({fts}) VALUES('rebuild')")
+            if optimize: con.execute(f"INSERT INTO {fts}({fts}) VALUES('optimize')")
+
+def match_query(q):
+    """Safe FTS5 expression for free text: 'spring dro' -> '"spring" "dro"*'."""
+    words = re.findall(r"\w+", q or "")
+    if not words: raise BadQuery("empty_query")
+    return " ".join([f'"{w}"' for w in words[:-1]] + [f'"{words[-1]}"*'])
+
+def _mark(s):
+    return html.escape(s or "").replace(_OPEN, "<mark>").replace(_CLOSE, "</mark>")
+
+def _hits(con, fts, table, extra, cols, expr, where, args, k, weights=""):
+    return con.execute(f"""SELECT t.id, t.created_at, {extra}, bm25({fts}{weights}) score, {cols} FROM {fts} JOIN {table} t ON t.id={fts}.rowid
+                           WHERE {fts} MATCH ? {''.join(' AND ' + w for w in where)} ORDER BY score LIMIT ?""",
+                       [expr] + args + [k]).fetchall()
+
+def _posts(con, expr, user_id, platforms, since, until, k):
+    # the owner filter runs in the index; the text only matches title and caption
+    expr = f'user_id:"{int(user_id)}" AND {{title caption}}: ({expr})'
+    where, args = [], []
+    if platforms:
+        labels = [LABELS.get(p.lower(), p) for p in platforms]
+        where.append(f"t.platform IN ({','.join('?' * len(labels))})"); args += labels
+    if since: where.append("t.created_at>=?"); args.append(since)
+    if until: where.append("t.created_at<?"); args.append(until)
+    rows = _hits(con, "posts_fts", "posts", "t.platform", f"highlight(posts_fts, 1, '{_OPEN}', '{_CLOSE}') hl_title, "
+                 f"snippet(posts_fts, 2, '{_OPEN}', '{_CLOSE}', '…', 16) hl_caption", expr, where, args, k,
+                 weights=", 0, 1, 1")  # the owner token is on every row searched: keep it out of the score
+    return [{"type": "post", "id": r["id"], "platform": r["platform"], "created_at": r["created_at"], "score": r["score"],
+             "title": _mark(r["hl_title"]), "snippet": _mark(r["hl_caption"])} for r in rows]
+
+def _contacts(con, expr, since, until, k):
+    where, args = [], []
+    if since: where.append("t.created_at>=?"); args.append(since)
+    if until: where.append("t.created_at<?"); args.append(until)
+    rows = _hits(con, "contacts_fts", "contacts", "t.email", f"highlight(contacts_fts, 0, '{_OPEN}', '{_CLOSE}') hl_name, "
+                 f"highlight(contacts_fts, 1, '{_OPEN}', '{_CLOSE}') hl_company, snippet(contacts_fts, 2, '{_OPEN}', '{_CLOSE}', '…', 16) hl_message",
+                 expr, where, args, k)
+    return [{"type": "contact", "id": r["id"], "email": r["email"], "created_at": r["created_at"], "score": r["score"],
+             "title": _mark(r["hl_name"]), "company": _mark(r["hl_company"]), "snippet": _mark(r["hl_message"])} for r in rows]
+
+def search(con, q, user_id, types=TYPES, platforms=None, since=None, until=None, page=1, limit=20, contacts_con=None):
+    """One page of bm25-ranked hits across the requested types (lower score = better).
+
+    `con` holds the user's posts; contacts are read from `contacts_con` when
+    they live elsewhere (the global database of a sharded store)."""
+    expr = match_query(q)
+    limit = max(1, min(int(limit), MAX_LIMIT)); page = max(1, int(page))
+    if page > MAX_PAGE: raise BadQuery("page_too_deep")
+    k = page * limit + 1  # enough of each source to fill this page after merging
+    hits = []
+    if "posts" in types: hits += _posts(con, expr, user_id, platforms, since, until, k)
+    if "contacts" in types and not platforms: hits += _contacts(contacts_con or con, expr, since, until, k)
+    hits.sort(key=lambda h: h["score"])
+    start = (page - 1) * limit
+    for h in hits: h["score"] = round(-h["score"], 4)
+    return hits[start:start + limit], len(hits) > start + limit
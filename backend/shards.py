@@ -0,0 +1,139 @@
+"""Tenant sharding of the SQLite store.
+
+With SHARDS unset (or 0) everything lives in DB_PATH, as before. With
+SHARDS=N, DB_PATH keeps what is looked up globally: users and their password
+hashes, the accounts directory, contacts, imports and cache generations.
+Tenant data moves into N files under SHARD_DIR, so tenants on different
+shards no longer queue on one writer lock:
+- a user's tokens, posts and post snapshots go to the user's shard;
+- an account's campaigns, daily stats, rollups and recommendations go to the
+  account's shard.
+
+A Router picks the shard. The default hashes the id; SHARD_ROUTER=module:Class
+plugs in another one, constructed with the shard count. Every shard has the
+full schema. Rows a shard's foreign keys point at (users, accounts, imports)
+are copied into it under the same id. AUTOINCREMENT ids in shard k start at
+k << ID_BITS, so ids are unique across shards and shard_of(id) names the
+shard holding any post, token, campaign or recommendation.
+
+Handlers use user_db()/user_tx() and account_db()/account_tx(). Queries over
+every tenant (analytics, insights, refresh jobs) go through fan_out().
+backend/scripts/split_shards.py moves an existing single-file database over.
+"""
+import importlib, os, threading, zlib
+from concurrent.futures import ThreadPoolExecutor
+from backend.store import DB_PATH, db, transaction
+
+SHARDS = int(os.environ.get("SHARDS", 0))
+SHARD_DIR = os.environ.get("SHARD_DIR") or os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), "shards")
+ID_BITS = 40
+# AUTOINCREMENT tables with tenant rows; their ids start at k << ID_BITS in shard k
+ID_TABLES = ("tokens", "posts", "campaigns", "recommendations")
+FAN_OUT_THREADS = int(os.environ.get("SHARD_THREADS", 8))
+
+class HashRouter:
+    """Shards 1..n by CRC32 of the tenant id (stable across processes and restarts)."""
+    def __init__(self, n): self.n = n
+    def user(self, user_id): return zlib.crc32(b"u%d" % int(user_id)) % self.n + 1
+    def account(self, account_id): return zlib.crc32(b"a%d" % int(account_id or 0)) % self.n + 1
+
+def _router():
+    spec = os.environ.get("SHARD_ROUTER")
+    if not spec: return HashRouter(SHARDS)
+    mod, _, cls = spec.partition(":")
+    return getattr(importlib.import_module(mod), cls)(SHARDS)
+
+router = _router() if SHARDS else None
+
+def enabled():
+    return SHARDS > 0
+
+def path(k):
+    """File of shard k; 0 is DB_PATH."""
+    return os.path.join(SHARD_DIR, f"shard-{k:03d}.db") if k else DB_PATH
+
+def shard_ids():
+    """Shards holding tenant data: 1..N, or just 0 when unsharded."""
+    return list(range(1, SHARDS + 1)) if SHARDS else [0]
+
+def shard_of(row_id):
+    return int(row_id) >> ID_BITS
+
+def user_shard(user_id):
+    return router.user(user_id) if SHARDS else 0
+
+def account_shard(account_id):
+    return router.account(account_id) if SHARDS else 0
+
+# ---------- connections ----------
+_ready = set()
+_lock = threading.Lock()
+
+def _ensure(k):
+    key = (os.getpid(), k)
+    if key in _ready: return
+    # k can come from a client-supplied id: never create a file outside the configured shards
+    if k != 0 and k not in shard_ids(): raise ValueError(f"no shard {k}")
+    from backend import schema  # schema imports the modules that import this one
+    with _lock:
+        if key in _ready: return
+        p = path(k)
+        if k and not os.path.exists(p):
+            # a new shard is created at the latest version, even with AUTO_MIGRATE off
+            os.makedirs(os.path.dirname(p), exist_ok=True); schema.migrate(p)
+        schema.ensure(p)
+        if k:
+            with transaction(p) as con:
+                for t in ID_TABLES:
+                    con.execute("UPDATE sqlite_sequence SET seq=MAX(seq, ?) WHERE name=?", (k << ID_BITS, t))
+                    con.execute("INSERT INTO sqlite_sequence(name, seq) SELECT ?, ? WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name=?)",
+                                (t, k << ID_BITS, t))
+        _ready.add(key)
+
+def shard_db(k):
+    """Pooled connection to shard k, migrated and id-seeded on first use in this process."""
+    _ensure(k); return db(path(k))
+
+def shard_tx(k):
+    _ensure(k); return transaction(path(k))
+
+def user_db(user_id): return shard_db(user_shard(user_id))
+def user_tx(user_id): return shard_tx(user_shard(user_id))
+def account_db(account_id): return shard_db(account_shard(account_id))
+def account_tx(account_id): return shard_tx(account_shard(account_id))
+
+# ---------- parent rows ----------
+def add_user(user_id, email, created_at=None):
+    """Copy a new user into its shard so tokens/posts there can reference it (no password hash)."""
+    if not SHARDS: return
+    with user_tx(user_id) as con:
+        con.execute("INSERT OR IGNORE INTO users(id,email,created_at) VALUES(?,?,COALESCE(?,CURRENT_TIMESTAMP))", (user_id, email, created_at))
+
+def adopt_accounts(con, accounts):
+    """Copy (id, name) directory rows into the shard behind `con` inside its transaction."""
+    if SHARDS: con.executemany("INSERT OR IGNORE INTO accounts(id,name) VALUES(?,?)", accounts)
+
+# ---------- fan-out ----------
+_pool, _pool_pid = None, None
+
+def fan_out(fn, ks=None):
+    """[fn(con) for each shard], run on a thread pool when there is more than one."""
+    global _pool, _pool_pid
+    ks = shard_ids() if ks is None else list(ks)
+    def run(k):
+        con = shard_db(k)
+        try: return fn(con)
+        finally: con.close()
+    if len(ks) <= 1: return [run(k) for k in ks]
+    if _pool is None or _pool_pid != os.getpid():
+        # threads don't survive a fork; each worker builds its own pool (and pooled connections)
+        _pool, _pool_pid = ThreadPoolExecutor(max_workers=FAN_OUT_THREADS, thread_name_prefix="shard"), os.getpid()
+    return list(_pool.map(run, ks))
+
+def group_by_shard(ids):
+    """{shard: [ids]} for row ids from any shard; ids naming no configured shard (forged, negative) are dropped."""
+    ks, out = set(shard_ids()), {}
+    for i in ids:
+        k = shard_of(i)
+        if k in ks: out.setdefault(k, []).append(i)
+    return out
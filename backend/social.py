@@ -1,13 +1,10 @@
-import os, json, sqlite3, time, requests
+import os, json, time, requests
 from urllib.parse import urlencode
-from flask import Blueprint, request, redirect
+from flask import Blueprint, request, redirect, session
+from backend import shards
 
 bp = Blueprint("social", __name__)
 
-def db():
-    con = sqlite3.connect(os.path.join(os.path.dirname(__file__), "..", "admind.db"))
-    con.row_factory = sqlite3.Row
-    return con
 
 # ---------- OAuth URL builders (need client IDs in .env) ----------
 BASE = {
@@ -59,12 +56,10 @@ def oauth_start(platform):
 @bp.get("/oauth/callback/<platform>")
 def oauth_cb(platform):
     code = request.args.get("code"); state = request.args.get("state","")
-    if not code: return redirect("/?oauth=error")
-    # Store the auth "connection" (demo)
-    con = db(); cur = con.cursor()
-    cur.execute("""CREATE TABLE IF NOT EXISTS connections(
-        id INTEGER PRIMARY KEY, platform TEXT, access_token TEXT, refresh_token TEXT, created_at TEXT)""")
-    con.commit()
+    uid = session.get("uid")
+    if not code or not uid: return redirect("/?oauth=error")
+    # Store the auth "connection" (demo) in the app's tokens table
+    con = shards.user_db(uid); cur = con.cursor()
 
     tok = None
     try:
@@ -75,17 +70,18 @@ def oauth_cb(platform):
     except Exception:
         tok = None
 
-    cur.execute("INSERT INTO connections(platform,access_token,refresh_token,created_at) VALUES(?,?,?,datetime('now'))",
-                (platform, (tok or {}).get("access_token","auth_code:"+code), (tok or {}).get("refresh_token")))
+    cur.execute("""INSERT INTO tokens(user_id,platform,access_token,refresh_token) VALUES(?,?,?,?)
+                   ON CONFLICT(user_id,platform) DO UPDATE SET access_token=excluded.access_token, refresh_token=excluded.refresh_token""",
+                (uid, platform.lower(), (tok or {}).get("access_token","auth_code:"+code), (tok or {}).get("refresh_token")))
     con.commit(); con.close()
     return redirect("/?oauth=ok")
 
 # ---------- Pull posts (demo makes real DB rows) ----------
 @bp.post("/api/social/mock_pull")
 def mock_pull():
-    con = db(); cur = con.cursor()
-    cur.execute("""CREATE TABLE IF NOT EXISTS posts(
-        id INTEGER PRIMARY KEY, platform TEXT, title TEXT, caption TEXT, metrics TEXT, created_at TEXT)""")
+    uid = session.get("uid")
+    if not uid: return {"ok": False, "error": "login required"}, 401
+    con = shards.user_db(uid); cur = con.cursor()
     now = int(time.time())
     rows = [
         ("Instagram","Spring Drop","New arrivals","{\"likes\":420,\"comments\":18}",now),
@@ -93,17 +89,15 @@ def mock_pull():
         ("YouTube","How we scaled ROAS","Case study","{\"views\":5400,\"likes\":210}",now),
     ]
     for r in rows:
-        cur.execute("INSERT INTO posts(platform,title,caption,metrics,created_at) VALUES(?,?,?,?,datetime('now'))",
-                    (r[0],r[1],r[2],r[3]))
+        cur.execute("INSERT INTO posts(user_id,platform,title,caption,metrics,created_at) VALUES(?,?,?,?,?,datetime('now'))",
+                    (uid,r[0],r[1],r[2],r[3]))
     con.commit(); con.close()
     return {"ok": True, "added": len(rows)}
 
 @bp.get("/api/social/connections")
 def connections():
-    con=db(); cur=con.cursor()
-    cur.execute("CREATE TABLE IF NOT EXISTS connections(id INTEGER PRIMARY KEY, platform TEXT, access_token TEXT, refresh_token TEXT, created_at TEXT)")
-    con.commit()
-    cur.execute("SELECT platform, access_token FROM connections ORDER BY created_at DESC")
+    con=shards.user_db(session.get("uid") or 0); cur=con.cursor()
+    cur.execute("SELECT platform, access_token FROM tokens WHERE user_id=? ORDER BY created_at DESC",(session.get("uid"),))
     out=[{"platform":r["platform"],"connected": bool(r["access_token"])} for r in cur.fetchall()]
     con.close()
     return {"ok": True, "connections": out}
@@ -0,0 +1,107 @@
+"""Shared SQLite access layer.
+
+One connection per thread (and per forked worker) is kept open for the life of
+the process instead of connecting on every request. Connections run in WAL mode
+with tuned pragmas, a busy timeout, and a large prepared-statement cache so hot
+queries are compiled once per worker.
+"""
+import os, random, sqlite3, threading, time
+from contextlib import contextmanager
+from backend import metrics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.environ.get("DB_PATH", os.path.join(ROOT, "admind.db"))
+
+POOL_ENABLED = os.environ.get("DB_POOL", "1") != "0"
+BUSY_TIMEOUT_MS = int(os.environ.get("DB_BUSY_TIMEOUT_MS", 5000))
+STATEMENT_CACHE = int(os.environ.get("DB_STATEMENT_CACHE", 256))
+RETRIES = int(os.environ.get("DB_RETRIES", 5))
+
+PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),       # durable across app crashes; WAL makes NORMAL safe
+    ("mmap_size", 256 * 1024 * 1024),
+    ("cache_size", -16000),          # 16 MB page cache per connection
+    ("temp_store", "MEMORY"),
+    ("busy_timeout", BUSY_TIMEOUT_MS),
+    ("foreign_keys", "ON"),          # per connection; the schema declares ON DELETE CASCADE
+)
+
+_local = threading.local()
+
+def connect(path=None):
+    """Open a new tuned connection. Callers own it and must close it."""
+    con = sqlite3.connect(path or DB_PATH, timeout=BUSY_TIMEOUT_MS / 1000, cached_statements=STATEMENT_CACHE,
+                          factory=metrics.Connection if metrics.ENABLED else sqlite3.Connection)
+    if metrics.ENABLED: metrics.count("admind_db_connections_opened_total")
+    con.row_factory = sqlite3.Row
+    for k, v in PRAGMAS: con.execute(f"PRAGMA {k}={v}")
+    return con
+
+class PooledConnection:
+    """Thin proxy over a pooled connection; close() hands it back instead of closing.
+
+    close() rolls back a transaction left open, except while a transaction()
+    holds the connection (depth > 0): code called inside it that opens and
+    closes db() shares the connection and must not end the caller's writes."""
+    __slots__ = ("_con", "depth")
+    def __init__(self, con): self._con = con; self.depth = 0
+    def __getattr__(self, name): return getattr(self._con, name)
+    def __enter__(self): return self._con.__enter__()
+    def __exit__(self, *exc): return self._con.__exit__(*exc)
+    def close(self):
+        if not self.depth and self._con.in_transaction: self._con.rollback()
+
+def _pooled(path):
+    pool = getattr(_local, "pool", None)
+    if pool is None or _local.pid != os.getpid():
+        # after a fork (gunicorn --preload) the parent's connections must not be reused
+        pool = _local.pool = {}; _local.pid = os.getpid()
+    con = pool.get(path)
+    if con is None: con = pool[path] = PooledConnection(connect(path))
+    return con
+
+def db(path=None):
+    """Connection for the current thread. close() is cheap and safe to call."""
+    path = path or DB_PATH
+    if not POOL_ENABLED: return connect(path)
+    return _pooled(path)
+
+def close_all():
+    for con in (getattr(_local, "pool", None) or {}).values(): con._con.close()
+    _local.pool = None
+
+def is_locked(e):
+    return isinstance(e, sqlite3.OperationalError) and ("locked" in str(e) or "busy" in str(e))
+
+def with_retry(fn, *a, retries=None, **k):
+    """Call fn, retrying with jittered backoff while the database is locked."""
+    retries = RETRIES if retries is None else retries
+    for attempt in range(retries + 1):
+        try: return fn(*a, **k)
+        except sqlite3.OperationalError as e:
+            if not is_locked(e) or attempt == retries: raise
+            time.sleep(min(0.05 * 2 ** attempt, 1.0) * (0.5 + random.random()))
+
+@contextmanager
+def transaction(path=None):
+    """Write transaction taking the RESERVED lock up front (BEGIN IMMEDIATE).
+
+    Acquiring the lock at BEGIN means writers queue on busy_timeout instead of
+    failing mid-transaction on lock upgrade; acquisition itself is retried.
+    """
+    con = db(path)
+    with_retry(con.execute, "BEGIN IMMEDIATE")
+    # reload the schema now if another connection changed it (a migration):
+    # reprepare of a write that fires the FTS5 triggers fails with "no such table"
+    con.execute("SELECT 1 FROM sqlite_master LIMIT 1")
+    pooled = isinstance(con, PooledConnection)
+    if pooled: con.depth += 1
+    try:
+        yield con
+        con.commit()
+    except BaseException:
+        con.rollback(); raise
+    finally:
+        if pooled: con.depth -= 1
+        con.close()
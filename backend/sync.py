@@ -0,0 +1,225 @@
+"""Concurrent post sync from connected social platforms.
+
+Each (user, platform) pair with a stored token becomes one task on a thread
+pool. Tasks share the pooled HTTP session, wait on a per-provider token bucket
+before every request, back off on 429/5xx (honouring Retry-After), follow each
+provider's pagination, and upsert every page into `posts` with one executemany.
+A provider whose list endpoint omits the counters (YouTube search returns
+snippets only) gets one batched details request per page. A task that fails,
+for whatever reason, counts as an error in its provider's report and the
+others carry on.
+"""
+import json, os, random, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import requests
+from backend import cache, shards
+from backend.feed import LABELS
+from backend.httpclient import session, TIMEOUT
+from backend.oauth_providers import OAUTH
+from backend.store import with_retry
+
+WORKERS = int(os.environ.get("SYNC_WORKERS", 16))
+MAX_PAGES = int(os.environ.get("SYNC_MAX_PAGES", 20))
+RETRIES = int(os.environ.get("SYNC_RETRIES", 4))
+# requests/second and burst per provider; override with e.g. SYNC_RATE_TIKTOK=2
+RATES = {"instagram": (5, 10), "facebook": (5, 10), "youtube": (10, 20), "tiktok": (3, 6), "linkedin": (2, 4)}
+
+class RateLimiter:
+    """Thread-safe token bucket."""
+    def __init__(self, rate, burst):
+        self.rate, self.burst = float(rate), float(burst)
+        self.tokens, self.at = float(burst), time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.at) * self.rate); self.at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1; return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class SyncError(Exception):
+    pass
+
+def _ts(v):
+    if isinstance(v, (int, float)): return datetime.fromtimestamp(v, timezone.utc).isoformat()
+    return v
+
+# ---------- provider adapters: first request, items, next request, row mapping ----------
+def _graph_first(base, tok):
+    fields = "id,caption,message,timestamp,created_time,like_count,comments_count"
+    path = "/me/media" if tok["platform"] == "instagram" else "/me/posts"
+    return "GET", f"{base}{path}", {"fields": fields, "access_token": tok["access_token"], "limit": 50}, None
+
+def _graph_next(page, prev):
+    nxt = (page.get("paging") or {}).get("next")
+    return ("GET", nxt, None, None) if nxt else None
+
+def _graph_row(it):
+    text = it.get("caption") or it.get("message") or ""
+    metrics = {k: it[v] for k, v in (("likes", "like_count"), ("comments", "comments_count")) if v in it}
+    return it["id"], text.split("\n")[0][:120], text, metrics, it.get("timestamp") or it.get("created_time")
+
+def _yt_first(base, tok):
+    return "GET", f"{base}/search", {"part": "snippet", "forMine": "true", "type": "video", "maxResults": 50}, None
+
+def _yt_next(page, prev):
+    t = page.get("nextPageToken")
+    return (prev[0], prev[1], dict(prev[2], pageToken=t), None) if t else None
+
+def _yt_id(it):
+    return (it.get("id") or {}).get("videoId") if isinstance(it.get("id"), dict) else it.get("id")
+
+def _yt_stats(base, its):
+    """One videos.list call for a search page's ids: search results carry no statistics."""
+    ids = [v for v in map(_yt_id, its) if v]
+    return ("GET", f"{base}/videos", {"part": "statistics", "id": ",".join(ids), "maxResults": 50}, None) if ids else None
+
+def _yt_merge(its, page):
+    stats = {v.get("id"): v.get("statistics") or {} for v in page.get("items") or []}
+    for it in its: it["statistics"] = stats.get(_yt_id(it), {})
+
+def _yt_row(it):
+    sn = it.get("snippet") or {}
+    stats = it.get("statistics") or {}
+    metrics = {k: int(stats[v]) for k, v in (("views", "viewCount"), ("likes", "likeCount"), ("comments", "commentCount")) if v in stats}
+    return _yt_id(it), sn.get("title", ""), sn.get("description", ""), metrics, sn.get("publishedAt")
+
+def _tt_first(base, tok):
+    fields = "id,title,video_description,create_time,like_count,view_count"
+    return "POST", f"{base}/video/list/?fields={fields}", None, {"max_count": 20}
+
+def _tt_next(page, prev):
+    d = page.get("data") or {}
+    return (prev[0], prev[1], None, dict(prev[3], cursor=d["cursor"])) if d.get("has_more") else None
+
+def _tt_row(it):
+    metrics = {k: it[v] for k, v in (("plays", "view_count"), ("likes", "like_count")) if v in it}
+    return it["id"], it.get("title", ""), it.get("video_description", ""), metrics, _ts(it.get("create_time"))
+
+def _li_first(base, tok):
+    return "GET", f"{base}/ugcPosts", {"q": "authors", "count": 50, "start": 0}, None
+
+def _li_next(page, prev):
+    p = page.get("paging") or {}
+    start, count, total = p.get("start", 0), p.get("count", 0), p.get("total", 0)
+    return (prev[0], prev[1], dict(prev[2], start=start + count), None) if count and start + count < total else None
+
+def _li_row(it):
+    content = ((it.get("specificContent") or {}).get("com.linkedin.ugc.ShareContent") or {})
+    text = (content.get("shareCommentary") or {}).get("text", "")
+    return it["id"], text.split("\n")[0][:120], text, {}, _ts((it.get("created") or {}).get("time", 0) / 1000 or None)
+
+# first request, items, next request, row mapping, and (details request, merge) for a page's counters
+PROVIDERS = {
+    "instagram": (_graph_first, lambda p: p.get("data") or [], _graph_next, _graph_row, None),
+    "facebook": (_graph_first, lambda p: p.get("data") or [], _graph_next, _graph_row, None),
+    "youtube": (_yt_first, lambda p: p.get("items") or [], _yt_next, _yt_row, (_yt_stats, _yt_merge)),
+    "tiktok": (_tt_first, lambda p: (p.get("data") or {}).get("videos") or [], _tt_next, _tt_row, None),
+    "linkedin": (_li_first, lambda p: p.get("elements") or [], _li_next, _li_row, None),
+}
+
+class SyncEngine:
+    """Fan out post pulls across users and platforms.
+
+    `api_bases` overrides OAUTH[...]["api_base"] per provider (SYNC_API_BASE
+    redirects all of them, e.g. to a local stub server).
+    """
+    def __init__(self, workers=WORKERS, api_bases=None, rates=None, max_pages=MAX_PAGES):
+        stub = os.environ.get("SYNC_API_BASE")
+        self.api_bases = {p: (stub.rstrip("/") + "/" + p if stub else OAUTH[p]["api_base"]) for p in PROVIDERS}
+        self.api_bases.update(api_bases or {})
+        rates = dict(RATES, **(rates or {}))
+        for p in rates:
+            env = os.environ.get(f"SYNC_RATE_{p.upper()}")
+            if env: rates[p] = (float(env), max(1.0, float(env) * 2))
+        self.limiters = {p: RateLimiter(*rates[p]) for p in PROVIDERS}
+        self.workers, self.max_pages = workers, max_pages
+        self.stats_lock = threading.Lock()
+
+    def tokens(self, user_id=None):
+        """One token per (user, platform); tokens(user_id, platform) is unique."""
+        q = "SELECT user_id, platform, access_token FROM tokens WHERE access_token IS NOT NULL"
+        if user_id is None: rows = [r for part in shards.fan_out(lambda con: con.execute(q).fetchall()) for r in part]
+        else:
+            con = shards.user_db(user_id)
+            rows = con.execute(q + " AND user_id=?", (user_id,)).fetchall(); con.close()
+        return [dict(r) for r in rows if r["platform"] in PROVIDERS]
+
+    def run(self, user_id=None):
+        """Sync every connected (user, platform); returns per-provider throughput."""
+        toks = self.tokens(user_id)
+        report = {p: {"tasks": 0, "pages": 0, "posts": 0, "errors": 0, "failures": [], "first": None, "last": 0.0}
+                  for p in {t["platform"] for t in toks}}
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for _ in pool.map(lambda t: self._sync_one(t, report), toks): pass
+        elapsed = time.perf_counter() - t0
+        for r in report.values():
+            # wall time from the provider's first request to its last page
+            secs = r.pop("last") - r.pop("first")
+            r["seconds"] = round(secs, 2)
+            r["posts_per_sec"] = round(r["posts"] / secs, 1) if secs else 0.0
+        return {"providers": report, "seconds": round(elapsed, 2)}
+
+    def _sync_one(self, tok, report):
+        p = tok["platform"]
+        first, items, nxt, row, details = PROVIDERS[p]
+        t0 = time.perf_counter(); pages = posts = 0; failure = None
+        try:
+            req = first(self.api_bases[p], tok)
+            while req and pages < self.max_pages:
+                page = self._fetch(p, tok, req)
+                its = items(page)
+                extra = details and its and details[0](self.api_bases[p], its)
+                if extra: details[1](its, self._fetch(p, tok, extra))
+                rows = [row(it) for it in its]
+                if rows: with_retry(self._upsert, tok["user_id"], p, rows)
+                pages += 1; posts += len(rows)
+                req = nxt(page, req)
+        except Exception as e:
+            # one bad token or payload must not take the rest of the run down with it
+            failure = f"user {tok['user_id']}: {type(e).__name__}: {e}"
+        if posts: cache.invalidate(tok["user_id"])
+        with self.stats_lock:
+            r = report[p]
+            r["tasks"] += 1; r["pages"] += pages; r["posts"] += posts
+            if failure:
+                r["errors"] += 1
+                if len(r["failures"]) < 10: r["failures"].append(failure)
+            r["first"] = t0 if r["first"] is None else min(r["first"], t0)
+            r["last"] = max(r["last"], time.perf_counter())
+
+    def _fetch(self, platform, tok, req):
+        method, url, params, body = req
+        headers = {"Authorization": f"Bearer {tok['access_token']}", "Accept": "application/json"}
+        for attempt in range(RETRIES + 1):
+            self.limiters[platform].acquire()
+            try:
+                r = session().request(method, url, params=params, json=body, headers=headers, timeout=TIMEOUT)
+            except requests.ConnectionError:
+                if attempt == RETRIES: raise
+                time.sleep(_backoff(attempt)); continue
+            if r.status_code == 429 or r.status_code >= 500:
+                if attempt == RETRIES: raise SyncError(f"{platform} {r.status_code}")
+                retry_after = r.headers.get("Retry-After")
+                time.sleep(float(retry_after) if retry_after and retry_after.isdigit() else _backoff(attempt)); continue
+            if r.status_code >= 400: raise SyncError(f"{platform} {r.status_code}")
+            return r.json()
+
+    def _upsert(self, user_id, platform, rows):
+        label = LABELS.get(platform, platform.capitalize())
+        with shards.user_tx(user_id) as con:
+            con.executemany("""INSERT INTO posts(user_id,platform,external_id,title,caption,metrics,created_at)
+                               VALUES(?,?,?,?,?,?,?)
+                               ON CONFLICT(user_id,platform,external_id) DO UPDATE SET
+                                 title=excluded.title, caption=excluded.caption, metrics=excluded.metrics""",
+                            [(user_id, label, ext, title, caption, json.dumps(metrics), created)
+                             for ext, title, caption, metrics, created in rows])
+
+def _backoff(attempt):
+    return min(0.25 * 2 ** attempt, 8.0) * (0.5 + random.random())
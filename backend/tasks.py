@@ -0,0 +1,67 @@
+"""Background job handlers (run by backend.jobs workers).
+
+Each handler takes the job's payload dict and returns a JSON-serializable
+result. Jobs are delivered at least once, so every handler here is safe to
+run twice: rebuilds and syncs converge on the same rows, and a contact that
+is already marked notified isn't mailed again.
+"""
+import os, smtplib, threading
+from datetime import datetime
+from email.message import EmailMessage
+from backend import jobs
+from backend.store import db, transaction
+
+SMTP_HOST = os.environ.get("SMTP_HOST")
+SMTP_PORT = int(os.environ.get("SMTP_PORT", 587))
+SMTP_USER = os.environ.get("SMTP_USER")
+SMTP_PASSWORD = os.environ.get("SMTP_PASSWORD")
+SMTP_FROM = os.environ.get("SMTP_FROM", "noreply@admind.local")
+CONTACT_NOTIFY_TO = os.environ.get("CONTACT_NOTIFY_TO")
+
+@jobs.handler("recs.rebuild", priority=10, timeout=600)
+def rebuild_recommendations(p):
+    from backend.recommendations import build_recommendations
+    return build_recommendations(full=bool(p.get("full")))
+
+_engine, _engine_pid = None, None
+_engine_lock = threading.Lock()
+
+def _sync_engine():
+    """The process's SyncEngine: concurrent sync jobs share its per-provider rate limiters."""
+    global _engine, _engine_pid
+    with _engine_lock:
+        if _engine is None or _engine_pid != os.getpid():
+            from backend.sync import SyncEngine
+            _engine, _engine_pid = SyncEngine(), os.getpid()
+        return _engine
+
+@jobs.handler("sync.user", priority=5, attempts=3, timeout=900)
+def sync_user(p):
+    return _sync_engine().run(user_id=p["user_id"])
+
+@jobs.handler("contact.notify", attempts=8)
+def notify_contact(p):
+    if not (SMTP_HOST and CONTACT_NOTIFY_TO): return {"emailed": False}
+    con = db()
+    c = con.execute("SELECT * FROM contacts WHERE id=?", (p["contact_id"],)).fetchone()
+    con.close()
+    if c is None or c["notified_at"]: return {"emailed": False}
+    msg = EmailMessage()
+    msg["Subject"] = f"Contact form: {c['name'] or c['email'] or 'anonymous'}"
+    msg["From"], msg["To"] = SMTP_FROM, CONTACT_NOTIFY_TO
+    if c["email"]: msg["Reply-To"] = c["email"]
+    msg.set_content("\n".join(f"{k}: {c[k] or ''}" for k in ("name", "email", "company", "phone", "created_at")) + f"\n\n{c['message'] or ''}")
+    with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=30) as s:
+        if SMTP_PORT != 25: s.starttls()
+        if SMTP_USER: s.login(SMTP_USER, SMTP_PASSWORD or "")
+        s.send_message(msg)
+    # a crash between send and this write mails the contact again on retry; never zero times
+    with transaction() as con:
+        con.execute("UPDATE contacts SET notified_at=? WHERE id=?", (datetime.utcnow().isoformat(), c["id"]))
+    return {"emailed": True}
+
+@jobs.handler("daily.refresh", priority=1, timeout=3600, every=86400)
+def daily_refresh(p):
+    from backend.recommendations import build_recommendations
+    from backend.timeseries import prune
+    return {"recommendations": build_recommendations(), "pruned": prune(), "jobs_purged": jobs.purge()}
@@ -0,0 +1,182 @@
+"""Time-series store for campaign and post metrics.
+
+Raw points:
+- campaign_stats(campaign_id, day): one row per campaign per day (CSV import).
+- post_metrics(post_id, day): the day's last snapshot of a post's counters,
+  written by a trigger whenever posts.metrics changes.
+
+Rollups are kept current by triggers on campaign_stats, so every writer
+(import, sync, scripts) updates them in the same transaction as the raw row
+and no query ever rescans raw days:
+- stats_daily(day, account_id) and stats_weekly(week, account_id), keyed by
+  time first so a window is one primary-key range scan;
+- campaign_weekly(campaign_id, week), which the analytics frame loads.
+Weeks are keyed by their Monday.
+
+prune() applies retention: raw campaign days older than RAW_DAYS and daily
+rollups older than DAILY_DAYS are dropped (the weekly rollups keep them), and
+post snapshots older than RAW_DAYS are thinned to the last one of each week.
+"""
+import os
+from datetime import date, timedelta
+from backend import shards
+from backend.store import with_retry
+
+METRICS = ("spend", "impressions", "clicks", "conversions", "revenue")
+POST_METRICS = ("likes", "comments", "plays", "views")
+RAW_DAYS = int(os.environ.get("TS_RAW_DAYS", 400))
+DAILY_DAYS = int(os.environ.get("TS_DAILY_DAYS", 800))
+GRAINS = ("day", "week")
+# most buckets one query returns: the daily rollups' retention, and ~15 years of weeks
+MAX_BUCKETS = int(os.environ.get("TS_MAX_BUCKETS", DAILY_DAYS))
+
+def _week(expr):
+    return f"date({expr}, 'weekday 0', '-6 days')"
+
+def monday(d):
+    return d - timedelta(days=d.weekday())
+
+# ---------- schema ----------
+def _apply(row, sign):
+    acct = f"COALESCE((SELECT account_id FROM campaigns WHERE id={row}.campaign_id), 0)"
+    vals = ", ".join(f"{sign}COALESCE({row}.{m}, 0)" for m in METRICS)
+    cols, upd = ", ".join(METRICS), ", ".join(f"{m}={m}+excluded.{m}" for m in METRICS)
+    for table, key, keyvals in (("stats_daily", "day, account_id", f"{row}.day, {acct}"),
+                                ("stats_weekly", "week, account_id", f"{_week(row + '.day')}, {acct}"),
+                                ("campaign_weekly", "campaign_id, week", f"{row}.campaign_id, {_week(row + '.day')}")):
+        yield f"INSERT INTO {table}({key}, {cols}) VALUES({keyvals}, {vals}) ON CONFLICT({key}) DO UPDATE SET {upd};"
+
+def _snapshot():
+    cols, vals = ", ".join(POST_METRICS), ", ".join(f"NEW.{m}" for m in POST_METRICS)
+    # an explicit upsert: OR REPLACE inside a trigger gives way to the outer statement's conflict handling
+    upd = ", ".join(f"{m}=excluded.{m}" for m in POST_METRICS)
+    return f"INSERT INTO post_metrics(post_id, day, {cols}) VALUES(NEW.id, date('now'), {vals}) ON CONFLICT(post_id, day) DO UPDATE SET {upd};"
+
+def create_schema(cur):
+    """Tables, triggers and a one-time backfill of rollups for existing data, as the code expects them now.
+    Migrations don't call this; backend/schema.py keeps a frozen copy of each version."""
+    fresh = not cur.execute("SELECT 1 FROM sqlite_master WHERE name='campaign_weekly'").fetchone()
+    sums = ", ".join(f"{m} REAL NOT NULL DEFAULT 0" for m in METRICS)
+    cur.execute(f"CREATE TABLE IF NOT EXISTS stats_daily(day TEXT NOT NULL, account_id INTEGER NOT NULL, {sums}, PRIMARY KEY(day, account_id)) WITHOUT ROWID")
+    cur.execute(f"CREATE TABLE IF NOT EXISTS stats_weekly(week TEXT NOT NULL, account_id INTEGER NOT NULL, {sums}, PRIMARY KEY(week, account_id)) WITHOUT ROWID")
+    cur.execute(f"CREATE TABLE IF NOT EXISTS campaign_weekly(campaign_id INTEGER NOT NULL, week TEXT NOT NULL, {sums}, PRIMARY KEY(campaign_id, week)) WITHOUT ROWID")
+    cur.execute(f"""CREATE TABLE IF NOT EXISTS post_metrics(post_id INTEGER NOT NULL, day TEXT NOT NULL,
+                    {', '.join(f'{m} INTEGER' for m in POST_METRICS)}, PRIMARY KEY(post_id, day)) WITHOUT ROWID""")
+    # pruning flips this inside its own transaction so deleting raw days leaves the rollups alone
+    cur.execute("CREATE TABLE IF NOT EXISTS ts_state(key TEXT PRIMARY KEY, value) WITHOUT ROWID")
+    cur.execute("INSERT OR IGNORE INTO ts_state VALUES('pruning', 0)")
+    cur.execute(f"CREATE TRIGGER IF NOT EXISTS ts_stats_insert AFTER INSERT ON campaign_stats BEGIN {' '.join(_apply('NEW', ''))} END")
+    cur.execute(f"CREATE TRIGGER IF NOT EXISTS ts_stats_update AFTER UPDATE ON campaign_stats BEGIN {' '.join(_apply('OLD', '-'))} {' '.join(_apply('NEW', ''))} END")
+    cur.execute(f"""CREATE TRIGGER IF NOT EXISTS ts_stats_delete AFTER DELETE ON campaign_stats
+                    WHEN (SELECT value FROM ts_state WHERE key='pruning') IS NOT 1 BEGIN {' '.join(_apply('OLD', '-'))} END""")
+    cur.execute(f"CREATE TRIGGER IF NOT EXISTS ts_posts_insert AFTER INSERT ON posts BEGIN {_snapshot()} END")
+    cur.execute(f"CREATE TRIGGER IF NOT EXISTS ts_posts_update AFTER UPDATE OF metrics ON posts WHEN NEW.metrics IS NOT OLD.metrics BEGIN {_snapshot()} END")
+    cur.execute("CREATE TRIGGER IF NOT EXISTS ts_posts_delete AFTER DELETE ON posts BEGIN DELETE FROM post_metrics WHERE post_id=OLD.id; END")
+    if fresh: backfill(cur)
+
+def backfill(cur):
+    """Rebuild every rollup from the raw rows (first run, or after a manual repair)."""
+    sums = ", ".join(f"SUM(COALESCE(s.{m}, 0))" for m in METRICS); cols = ", ".join(METRICS)
+    acct = "COALESCE(c.account_id, 0)"
+    src = "FROM campaign_stats s LEFT JOIN campaigns c ON c.id=s.campaign_id"
+    for table in ("stats_daily", "stats_weekly", "campaign_weekly"): cur.execute(f"DELETE FROM {table}")
+    cur.execute(f"INSERT INTO stats_daily(day, account_id, {cols}) SELECT s.day, {acct}, {sums} {src} GROUP BY 1, 2")
+    cur.execute(f"INSERT INTO stats_weekly(week, account_id, {cols}) SELECT {_week('s.day')}, {acct}, {sums} {src} GROUP BY 1, 2")
+    cur.execute(f"INSERT INTO campaign_weekly(campaign_id, week, {cols}) SELECT s.campaign_id, {_week('s.day')}, {sums} {src} GROUP BY 1, 2")
+    cur.execute(f"""INSERT OR IGNORE INTO post_metrics(post_id, day, {', '.join(POST_METRICS)})
+                    SELECT id, COALESCE(date(created_at), date('now')), {', '.join(POST_METRICS)} FROM posts""")
+
+# ---------- queries ----------
+def _buckets(start, end, grain):
+    step = timedelta(days=7 if grain == "week" else 1)
+    out, d = [], start
+    while d <= end: out.append(d.isoformat()); d += step
+    return out
+
+def _window(con, table, key, grain, start, end, n, where="", args=()):
+    """Resolve [start, end] as dates; end defaults to the latest bucket with data, start to n buckets before it.
+    Windows are capped at MAX_BUCKETS buckets ending at `end`."""
+    n = max(1, min(int(n), MAX_BUCKETS))
+    if end is None:
+        last = con.execute(f"SELECT MAX({key}) FROM {table} {where}", args).fetchone()[0]
+        if last is None: return None, None
+        end = date.fromisoformat(last)
+    end = date.fromisoformat(end) if isinstance(end, str) else end
+    start = date.fromisoformat(start) if isinstance(start, str) else start
+    if grain == "week":
+        end = monday(end); start = monday(start) if start else end - timedelta(weeks=n - 1)
+    elif start is None:
+        start = end - timedelta(days=n - 1)
+    step = timedelta(weeks=1) if grain == "week" else timedelta(days=1)
+    if (end - start) // step >= MAX_BUCKETS: start = end - step * (MAX_BUCKETS - 1)
+    return start, end
+
+def _shape(labels, rows):
+    got = {r[0]: r[1:] for r in rows}
+    zero = (0,) * len(METRICS)
+    cols = dict(zip(METRICS, zip(*[got.get(l, zero) for l in labels]))) if labels else {m: () for m in METRICS}
+    return {"labels": labels,
+            "series": {"spend": [round(s) for s in cols["spend"]],
+                       "roas": [round(r / s, 2) if s else 0 for s, r in zip(cols["spend"], cols["revenue"])],
+                       "clicks": [int(c) for c in cols["clicks"]],
+                       "conversions": [int(c) for c in cols["conversions"]]}}
+
+def series(con=None, start=None, end=None, grain="week", n=7, account_id=None):
+    """Account-wide (or one account's) metrics per day/week, zero-filled, from the rollups.
+
+    Without `con` every shard holding the data is read and the buckets summed."""
+    if grain not in GRAINS: raise ValueError("bad_grain")
+    table, key = ("stats_daily", "day") if grain == "day" else ("stats_weekly", "week")
+    ks = [shards.account_shard(account_id)] if account_id is not None else None
+    each = (lambda fn: [fn(con)]) if con is not None else (lambda fn: shards.fan_out(fn, ks))
+    if end is None:
+        end = max(filter(None, each(lambda c: c.execute(f"SELECT MAX({key}) FROM {table}").fetchone()[0])), default=None)
+        if end is None: return _shape([], [])
+    start, end = _window(con, table, key, grain, start, end, n)
+    if start > end: return _shape([], [])
+    acct, args = ("AND account_id=?", [account_id]) if account_id is not None else ("", [])
+    sql = f"""SELECT {key}, {', '.join(f'SUM({m})' for m in METRICS)} FROM {table}
+              WHERE {key} BETWEEN ? AND ? {acct} GROUP BY {key}"""
+    got = {}
+    for part in each(lambda c: c.execute(sql, [start.isoformat(), end.isoformat()] + args).fetchall()):
+        for k, *vals in part: got[k] = [a + (b or 0) for a, b in zip(got.get(k, (0,) * len(METRICS)), vals)]
+    return _shape(_buckets(start, end, grain), [(k, *v) for k, v in got.items()])
+
+def campaign_series(con, campaign_id, start=None, end=None, grain="week", n=7):
+    """One campaign's metrics per day (raw rows, within retention) or week (rollup)."""
+    if grain not in GRAINS: raise ValueError("bad_grain")
+    table, key = ("campaign_stats", "day") if grain == "day" else ("campaign_weekly", "week")
+    start, end = _window(con, table, key, grain, start, end, n, "WHERE campaign_id=?", (campaign_id,))
+    if start is None or start > end: return _shape([], [])
+    rows = con.execute(f"""SELECT {key}, {', '.join(f'COALESCE({m}, 0)' for m in METRICS)} FROM {table}
+                           WHERE campaign_id=? AND {key} BETWEEN ? AND ?""", (campaign_id, start.isoformat(), end.isoformat()))
+    return _shape(_buckets(start, end, grain), rows)
+
+def post_series(con, post_id, start=None, end=None):
+    """A post's counter snapshots, oldest first (weekly beyond the raw window)."""
+    q, args = f"SELECT day, {', '.join(POST_METRICS)} FROM post_metrics WHERE post_id=?", [post_id]
+    if start: q += " AND day>=?"; args.append(start)
+    if end: q += " AND day<=?"; args.append(end)
+    rows = con.execute(q + " ORDER BY day", args).fetchall()
+    return {"labels": [r[0] for r in rows], "series": {m: [r[i + 1] or 0 for r in rows] for i, m in enumerate(POST_METRICS)}}
+
+# ---------- retention ----------
+def prune(con=None, today=None, raw_days=RAW_DAYS, daily_days=DAILY_DAYS):
+    """Drop raw and daily points past retention; returns rows removed per table (summed over shards)."""
+    if con is None:
+        parts = shards.fan_out(lambda c: prune(c, today, raw_days, daily_days))
+        return {t: sum(p[t] for p in parts) for t in parts[0]}
+    today = today or date.today()
+    raw_cut = monday(today - timedelta(days=raw_days)).isoformat()  # whole weeks, so weekly rollups stay exact
+    daily_cut = (today - timedelta(days=daily_days)).isoformat()
+    def run():
+        with con:
+            con.execute("UPDATE ts_state SET value=1 WHERE key='pruning'")
+            raw = con.execute("DELETE FROM campaign_stats WHERE day<?", (raw_cut,)).rowcount
+            con.execute("UPDATE ts_state SET value=0 WHERE key='pruning'")
+            daily = con.execute("DELETE FROM stats_daily WHERE day<?", (daily_cut,)).rowcount
+            posts = con.execute(f"""DELETE FROM post_metrics WHERE day<? AND EXISTS (
+                                      SELECT 1 FROM post_metrics n WHERE n.post_id=post_metrics.post_id AND n.day>post_metrics.day
+                                        AND {_week('n.day')}={_week('post_metrics.day')})""", (raw_cut,)).rowcount
+        return {"campaign_stats": raw, "stats_daily": daily, "post_metrics": posts}
+    return with_retry(run)
@@ -0,0 +1,160 @@
+"""Background OAuth token refresh.
+
+The refresher keeps a min-heap of upcoming expirations. It only loads tokens
+expiring within HORIZON seconds, using an indexed range scan on
+tokens(expires_at), and reloads that window every HORIZON/2 seconds. Tokens due
+within LEAD seconds are refreshed in batches on a thread pool through each
+provider's token_url over the shared HTTP session, and their new expirations go
+back on the heap. A pass only refreshes what was due when it started: a new
+expiry already inside LEAD (a provider issuing short-lived tokens) waits for
+the next pass instead of being refreshed again at once. With a sharded store
+every shard's window is read; token ids are unique across shards and name the
+shard to write back to.
+"""
+import heapq, json, os, threading, time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from backend import shards
+from backend.httpclient import session, TIMEOUT
+from backend.oauth_providers import OAUTH
+from backend.store import with_retry
+
+LEAD = int(os.environ.get("TOKEN_REFRESH_LEAD", 600))          # refresh this long before expiry
+HORIZON = int(os.environ.get("TOKEN_REFRESH_HORIZON", 3600))   # how far ahead the heap looks
+BATCH = int(os.environ.get("TOKEN_REFRESH_BATCH", 200))
+WORKERS = int(os.environ.get("TOKEN_REFRESH_WORKERS", 16))
+RETRY_DELAY = int(os.environ.get("TOKEN_REFRESH_RETRY", 300))
+MAX_ATTEMPTS = int(os.environ.get("TOKEN_REFRESH_ATTEMPTS", 5))
+STALE_AFTER = 7 * 86400   # expired longer than this: leave for the user to reconnect
+
+class TokenRefresher:
+    """Heap-driven scheduler; `token_urls` overrides OAUTH[...]["token_url"]
+    (OAUTH_TOKEN_URL in backend/oauth_providers.py redirects every provider)."""
+
+    def __init__(self, lead=LEAD, horizon=HORIZON, batch=BATCH, workers=WORKERS, token_urls=None):
+        self.token_urls = {p: cfg["token_url"] for p, cfg in OAUTH.items()}
+        self.token_urls.update(token_urls or {})
+        self.lead, self.horizon, self.batch, self.workers = lead, horizon, batch, workers
+        self.heap, self.queued = [], {}      # queued: token id -> expires_at currently on the heap
+        self.deferred = []                   # (id, expires_at) refreshed this pass but due again already
+        self.loaded_until = 0
+        self.attempts = {}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.stats = {"refreshed": 0, "failed": 0, "stale": 0}
+
+    # ---------- heap maintenance ----------
+    def push(self, token_id, expires_at):
+        with self.lock:
+            if self.queued.get(token_id) == expires_at: return
+            self.queued[token_id] = expires_at
+            heapq.heappush(self.heap, (expires_at, token_id))
+
+    def load(self, now=None):
+        """Queue tokens expiring before now + horizon (index range scan on expires_at).
+
+        The whole window is re-read each time so rows written by other processes
+        (OAuth callbacks in web workers) are picked up; push() skips entries
+        already queued with the same expiry.
+        """
+        now = int(now or time.time())
+        until = now + self.horizon
+        rows = [r for part in shards.fan_out(lambda con: con.execute("""SELECT id, expires_at FROM tokens
+                    WHERE refresh_token IS NOT NULL AND expires_at > ? AND expires_at <= ?""", (now - STALE_AFTER, until)).fetchall())
+                for r in part]
+        for r in rows:
+            if self.attempts.get(r["id"], 0) < MAX_ATTEMPTS: self.push(r["id"], r["expires_at"])
+        self.loaded_until = until
+        return len(rows)
+
+    def due(self, now=None):
+        """Pop up to `batch` token ids whose refresh window has opened."""
+        now = now or time.time()
+        out = []
+        with self.lock:
+            while self.heap and self.heap[0][0] - self.lead <= now and len(out) < self.batch:
+                exp, tid = heapq.heappop(self.heap)
+                if self.queued.get(tid) != exp: continue   # superseded entry
+                del self.queued[tid]
+                out.append((tid, exp))
+        return out
+
+    # ---------- refresh ----------
+    def refresh_batch(self, due):
+        if not due: return 0
+        rows = {}
+        for k, ids in shards.group_by_shard(t for t, _ in due).items():
+            con = shards.shard_db(k)
+            rows.update((r["id"], r) for r in con.execute(
+                f"SELECT id, platform, refresh_token, expires_at FROM tokens WHERE id IN ({','.join('?' * len(ids))})", ids))
+            con.close()
+        work, now = [], time.time()
+        for tid, exp in due:
+            r = rows.get(tid)
+            if not r or not r["refresh_token"] or r["platform"] not in self.token_urls: continue
+            if r["expires_at"] - self.lead > now:
+                # refreshed elsewhere (e.g. a new OAuth callback); reschedule on the current value
+                self.stats["stale"] += 1; self.push(tid, r["expires_at"]); continue
+            work.append(r)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            results = list(pool.map(self._exchange, work))
+        now = int(time.time())
+        updates = []
+        for r, tok in zip(work, results):
+            if tok and tok.get("access_token"):
+                exp = now + int(tok.get("expires_in", 3600))
+                updates.append((tok["access_token"], tok.get("refresh_token"), exp, json.dumps(tok), r["id"]))
+                self.attempts.pop(r["id"], None); self.stats["refreshed"] += 1
+                if exp - self.lead > now: self.push(r["id"], exp)
+                else: self.deferred.append((r["id"], exp))
+            else:
+                self.stats["failed"] += 1
+                n = self.attempts[r["id"]] = self.attempts.get(r["id"], 0) + 1
+                # retry later by pretending it expires a little after the retry delay
+                if n < MAX_ATTEMPTS: self.push(r["id"], now + RETRY_DELAY + self.lead)
+        parts = {}
+        for u in updates: parts.setdefault(shards.shard_of(u[-1]), []).append(u)
+        for k, part in parts.items(): with_retry(self._save, k, part)
+        return len(updates)
+
+    def _exchange(self, row):
+        cfg = OAUTH[row["platform"]]
+        data = {"grant_type": "refresh_token", "refresh_token": row["refresh_token"],
+                "client_id": cfg["client_id"], "client_secret": cfg["client_secret"]}
+        try:
+            r = session().post(self.token_urls[row["platform"]], data=data, headers={"Accept": "application/json"}, timeout=TIMEOUT)
+            return r.json() if r.status_code < 400 else None
+        except (requests.RequestException, ValueError):
+            return None
+
+    def _save(self, shard, updates):
+        with shards.shard_tx(shard) as con:
+            con.executemany("""UPDATE tokens SET access_token=?, refresh_token=COALESCE(?, refresh_token),
+                                 expires_at=?, raw=? WHERE id=?""", updates)
+
+    # ---------- loop ----------
+    def run_once(self, now=None):
+        """One pass over the tokens due at `now`, in batches; returns how many were refreshed."""
+        now = now or time.time()
+        deferred, self.deferred = self.deferred, []
+        for tid, exp in deferred: self.push(tid, exp)
+        if now + self.horizon / 2 >= self.loaded_until: self.load(now)
+        todo = []
+        while True:
+            batch = self.due(now)
+            if not batch: break
+            todo += batch
+        return sum(self.refresh_batch(todo[i:i + self.batch]) for i in range(0, len(todo), self.batch))
+
+    def next_wakeup(self):
+        with self.lock:
+            nxt = self.heap[0][0] - self.lead if self.heap else float("inf")
+        return min(nxt, self.loaded_until - self.horizon / 2)
+
+    def run_forever(self, max_sleep=60):
+        while not self.stop_event.is_set():
+            self.run_once()
+            self.stop_event.wait(max(1.0, min(max_sleep, self.next_wakeup() - time.time())))
+
+    def stop(self):
+        self.stop_event.set()
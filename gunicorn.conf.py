@@ -0,0 +1,50 @@
+"""Gunicorn settings for the web process; the serving mode comes from the environment.
+
+    WEB_WORKER_CLASS  gthread (default) | sync | gevent | uvicorn
+    WEB_CONCURRENCY   worker processes (default 2)
+    WEB_THREADS       threads per gthread worker (default 4)
+    WEB_CONNECTIONS   concurrent requests per gevent worker (default 200)
+    ASGI_THREADS      request threads per uvicorn worker (default 64, see backend/asgi.py)
+    METRICS_DIR       where workers leave snapshots for /metrics (default: a fresh temp dir)
+    JOBS_EMBEDDED     background job threads per web worker (default 0: the Procfile worker runs them)
+
+sync and gthread hold a worker or thread for every request waiting on an
+upstream. gevent and uvicorn park those requests cheaply, so a slow OAuth,
+AI or platform call no longer starves the rest of the site.
+"""
+import glob, os, tempfile
+
+# workers inherit this, so /metrics in any of them can merge all of them (backend/metrics.py)
+os.environ.setdefault("METRICS_DIR", tempfile.mkdtemp(prefix="admind-metrics-"))
+
+mode = os.environ.get("WEB_WORKER_CLASS", "gthread")
+if mode == "gevent":
+    # patch before the app is preloaded so its sockets, locks and HTTP session cooperate
+    from gevent import monkey
+    monkey.patch_all()
+
+worker_class = {"sync": "sync", "gthread": "gthread", "gevent": "gevent",
+                "uvicorn": "uvicorn.workers.UvicornWorker"}[mode]
+wsgi_app = "backend.asgi:app" if mode == "uvicorn" else "backend.app:create_app()"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+threads = int(os.environ.get("WEB_THREADS", 4)) if mode == "gthread" else 1  # threads > 1 turns sync into gthread
+worker_connections = int(os.environ.get("WEB_CONNECTIONS", 200))
+preload_app = True  # create_app() runs once in the master: schema check, imports, warm-up (backend/app.py)
+timeout = 120
+
+def on_starting(server):
+    # counters restart with the server; drop snapshots left by a previous run
+    for path in glob.glob(os.path.join(os.environ["METRICS_DIR"], "*.json")): os.remove(path)
+
+def child_exit(server, worker):
+    # a replaced worker's totals would otherwise be merged into /metrics for the rest of the run
+    from backend import metrics
+    metrics.forget(worker.pid)
+
+def post_fork(server, worker):
+    # bcrypt's process pool can't be inherited; start it now instead of on the first login
+    import threading
+    from backend import passwords
+    threading.Thread(target=passwords.warm_up, daemon=True).start()
+    from backend import jobs
+    jobs.start_embedded()